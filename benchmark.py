@@ -0,0 +1,894 @@
+#!/usr/bin/env python3
+"""
+Stealth Scraper Benchmarks
+Measures parser backends, extraction, the crawl path, the CLI and the API
+against synthetic pages served by a local mock HTTP server, so runs are
+repeatable and never touch real sites.
+
+Every command can write its rows with -o; ``compare`` diffs two such
+files and exits non-zero on regressions.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+from extraction import get_extraction_plan
+from parsers import PARSER_BACKENDS, parse_document
+from stealth_crawler import StealthCrawler
+
+REPO_DIR = Path(__file__).resolve().parent
+
+BENCHMARK_SELECTORS = {
+    'title': 'title',
+    'description': 'meta[name="description"]::attr(content)',
+    'h1': 'h1',
+    'h2': 'h2:first-of-type',
+    'content': 'p, div.content, main, article',
+    'nav': 'nav ul li a',
+    'nav_links': {'css': 'nav a::attr(href)', 'all': True},
+    'missing': 'section.does-not-exist'
+}
+
+
+def generate_page(size_bytes: int, seed: int = 0) -> bytes:
+    """Build a synthetic HTML page of roughly ``size_bytes``"""
+    rng = random.Random(seed)
+    words = ['scraper', 'stealth', 'crawler', 'parser', 'latency', 'throughput',
+             'selector', 'document', 'market', 'travel', 'flight', 'price']
+
+    def sentence(n: int) -> str:
+        return ' '.join(rng.choice(words) for _ in range(n))
+
+    head = (
+        '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">'
+        f'<title>{sentence(6)}</title>'
+        f'<meta name="description" content="{sentence(12)}">'
+        '<style>body { font-family: sans-serif; }</style>'
+        '<script>window.dataLayer = window.dataLayer || [];</script>'
+        '</head><body>'
+        '<nav><ul>' + ''.join(f'<li><a href="/section/{i}">{sentence(2)}</a></li>' for i in range(10)) +
+        f'</ul></nav><main><h1>{sentence(5)}</h1>'
+    )
+    tail = '</main><footer><a href="https://example.org/about">About</a></footer></body></html>'
+
+    parts = [head]
+    size = len(head) + len(tail)
+    index = 0
+    while size < size_bytes:
+        block = (
+            f'<article id="a{index}"><h2>{sentence(4)}</h2>'
+            f'<!-- block {index} --><div class="content"><p>{sentence(40)}</p>'
+            f'<p>{sentence(25)} <b>{sentence(3)}</b> {sentence(10)}</p>'
+            f'<a href="/article/{index}?ref=list">{sentence(3)}</a>'
+            f'<img src="/img/{index}.png" alt="{sentence(2)}"></div></article>'
+        )
+        parts.append(block)
+        size += len(block)
+        index += 1
+    parts.append(tail)
+    return ''.join(parts).encode('utf-8')
+
+
+def _percentile(samples: List[float], percent: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _rss_bytes() -> Optional[int]:
+    """Current resident set size (Linux only)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ResourceMonitor:
+    """CPU seconds and peak RSS of this process over a ``with`` block"""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.cpu_s: Optional[float] = None
+        self.peak_rss: Optional[int] = None
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            rss = _rss_bytes()
+            if rss is not None:
+                self.peak_rss = max(self.peak_rss or 0, rss)
+
+    def __enter__(self) -> 'ResourceMonitor':
+        self.peak_rss = _rss_bytes()
+        self._cpu_start = time.process_time()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.cpu_s = time.process_time() - self._cpu_start
+
+
+def _mb(size: Optional[int]) -> Optional[float]:
+    return round(size / (1024 * 1024), 1) if size is not None else None
+
+
+def summarize(latencies: List[float], elapsed: float, errors: int = 0,
+              cpu_s: Optional[float] = None, peak_rss: Optional[int] = None,
+              requests: Optional[int] = None) -> Dict[str, Any]:
+    """The common metrics of a load run.
+
+    ``latencies`` are the successful requests' in seconds; ``requests``
+    defaults to those plus ``errors``.
+    """
+    if requests is None:
+        requests = len(latencies) + errors
+    return {
+        'requests': requests,
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'rps': round(requests / elapsed, 1) if elapsed else None,
+        'latency_ms_p50': _percentile(latencies, 50) * 1000 if latencies else None,
+        'latency_ms_p95': _percentile(latencies, 95) * 1000 if latencies else None,
+        'latency_ms_p99': _percentile(latencies, 99) * 1000 if latencies else None,
+        'cpu_s': round(cpu_s, 3) if cpu_s is not None else None,
+        'peak_rss_mb': _mb(peak_rss)
+    }
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like the sites being scraped
+    protocol_version = 'HTTP/1.1'
+    server: '_MockServer'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        match = re.fullmatch(r'/page/(\d+)', self.path.split('?', 1)[0])
+        if match is None:
+            self._send(404, b'not found', 'text/plain')
+            return
+
+        index = int(match.group(1))
+        if self.server.latency_ms:
+            time.sleep(self.server.latency_ms / 1000)
+        # Decided per URL, so retries of a failing page fail again
+        if random.Random(index).random() < self.server.error_rate:
+            self._send(503, b'unavailable', 'text/plain')
+            return
+        pages = self.server.pages
+        self._send(200, pages[index % len(pages)], 'text/html; charset=utf-8')
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, page_bytes: int, latency_ms: float, error_rate: float, variants: int):
+        super().__init__(address, _MockHandler)
+        self.pages = [generate_page(page_bytes, seed) for seed in range(variants)]
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive connections (e.g. after a 503) aren't errors
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def _serve_mock_site(port: int, page_bytes: int, latency_ms: float, error_rate: float,
+                     variants: int, ready=None):
+    server = _MockServer(('127.0.0.1', port), page_bytes, latency_ms, error_rate, variants)
+    if ready is not None:
+        ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+class MockSite:
+    """Synthetic pages at ``/page/<n>`` from a separate process.
+
+    Each page is about ``page_bytes`` long (``variants`` distinct pages
+    are cycled), answered after ``latency_ms`` milliseconds; a fixed
+    ``error_rate`` share of URLs answer 503. Running in its own process
+    keeps the server's CPU out of the numbers being measured.
+    """
+
+    def __init__(self, page_bytes: int = 50000, latency_ms: float = 0, error_rate: float = 0.0,
+                 variants: int = 8, port: int = 0):
+        self.page_bytes = page_bytes
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.variants = variants
+        self.port = port
+        self._process = None
+
+    def start(self) -> 'MockSite':
+        context = multiprocessing.get_context('spawn')
+        ready = context.Queue()
+        self._process = context.Process(
+            target=_serve_mock_site,
+            args=(self.port, self.page_bytes, self.latency_ms, self.error_rate, self.variants, ready),
+            daemon=True
+        )
+        self._process.start()
+        self.port = ready.get(timeout=60)
+        return self
+
+    def url(self, index: int) -> str:
+        return f'http://127.0.0.1:{self.port}/page/{index}'
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+    def __enter__(self) -> 'MockSite':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def describe(self) -> Dict[str, Any]:
+        return {'page_bytes': self.page_bytes, 'latency_ms': self.latency_ms, 'error_rate': self.error_rate}
+
+
+def benchmark_parsers(sizes: List[int], backends: List[str], repeat: int = 10) -> List[Dict]:
+    """Time parse and extraction per backend and check output against html.parser"""
+    crawler = StealthCrawler(delay_range=(0, 0))
+    base_url = 'https://bench.example.com/page'
+    results = []
+
+    try:
+        for size in sizes:
+            page = generate_page(size)
+            reference = parse_document(page, 'html.parser')
+            expected = (crawler.extract_data(reference, BENCHMARK_SELECTORS),
+                        crawler.get_links(reference, base_url))
+
+            for backend in backends:
+                parse_times = []
+                extract_times = []
+                identical = True
+                with ResourceMonitor() as monitor:
+                    for _ in range(repeat):
+                        started = time.perf_counter()
+                        document = parse_document(page, backend)
+                        parsed = time.perf_counter()
+                        output = (crawler.extract_data(document, BENCHMARK_SELECTORS),
+                                  crawler.get_links(document, base_url))
+                        extracted = time.perf_counter()
+
+                        parse_times.append(parsed - started)
+                        extract_times.append(extracted - parsed)
+                        identical = identical and output == expected
+
+                totals = [p + e for p, e in zip(parse_times, extract_times)]
+                results.append({
+                    'benchmark': 'parser',
+                    'backend': backend,
+                    'page_bytes': len(page),
+                    'repeat': repeat,
+                    'parse_ms_median': statistics.median(parse_times) * 1000,
+                    'parse_ms_p95': _percentile(parse_times, 95) * 1000,
+                    'extract_ms_median': statistics.median(extract_times) * 1000,
+                    'total_ms_median': statistics.median(totals) * 1000,
+                    **summarize(totals, sum(totals), cpu_s=monitor.cpu_s, peak_rss=monitor.peak_rss),
+                    'identical_to_html_parser': identical
+                })
+    finally:
+        crawler.close()
+
+    return results
+
+
+def benchmark_selectors(selector_counts: List[int], backends: List[str], size: int,
+                        repeat: int = 10) -> List[Dict]:
+    """Compare select_text per selector with a compiled extraction plan.
+
+    On html.parser the plan finds every first match in one walk of the
+    tree; lxml and selectolax run each compiled query in turn.
+    """
+    page = generate_page(size)
+    pool = ['title', 'meta[name="description"]', 'h1', 'h2:first-of-type', 'nav ul li a',
+            'article p b', 'footer a', 'img[alt]', 'div.content p', 'main h2',
+            'a[href^="/article/"]', 'li:nth-child(3) a', 'section.does-not-exist']
+    results = []
+
+    for backend in backends:
+        document = parse_document(page, backend)
+        for count in selector_counts:
+            selectors = {f'field_{i}': pool[i % len(pool)] for i in range(count)}
+            plan = get_extraction_plan(selectors)
+
+            naive_times = []
+            plan_times = []
+            identical = True
+            for _ in range(repeat):
+                started = time.perf_counter()
+                naive = {key: document.select_text(selector) or "" for key, selector in selectors.items()}
+                middle = time.perf_counter()
+                planned = plan.extract(document)
+                finished = time.perf_counter()
+
+                naive_times.append(middle - started)
+                plan_times.append(finished - middle)
+                identical = identical and naive == planned
+
+            results.append({
+                'benchmark': 'selectors',
+                'backend': backend,
+                'page_bytes': len(page),
+                'selectors': count,
+                'repeat': repeat,
+                'per_selector_ms_median': statistics.median(naive_times) * 1000,
+                'plan_ms_median': statistics.median(plan_times) * 1000,
+                'identical': identical
+            })
+
+    return results
+
+
+def _timed_crawl(crawler: StealthCrawler, url: str, parser: str):
+    started = time.perf_counter()
+    result = crawler.crawl_url(url, BENCHMARK_SELECTORS, parser=parser)
+    return time.perf_counter() - started, result.get('status') == 'success'
+
+
+async def _crawl_async(crawler: StealthCrawler, urls: List[str], parser: str, concurrency: int):
+    # The CLI's setup: fetches on the event loop, parsing in threads
+    executor = ThreadPoolExecutor(max_workers=min(concurrency, 8))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def crawl(url: str):
+        async with semaphore:
+            started = time.perf_counter()
+            result = await crawler.async_crawl_url(url, BENCHMARK_SELECTORS, executor, parser=parser)
+            return time.perf_counter() - started, result.get('status') == 'success'
+
+    try:
+        return await asyncio.gather(*(crawl(url) for url in urls))
+    finally:
+        await crawler.aclose()
+        executor.shutdown(wait=True)
+
+
+def _split_outcomes(outcomes) -> tuple:
+    latencies = [latency for latency, ok in outcomes if ok]
+    return latencies, len(outcomes) - len(latencies)
+
+
+def benchmark_crawl(site: MockSite, count: int, concurrency: int, backends: List[str],
+                    modes: List[str], first_page: int = 0) -> List[Dict]:
+    """Throughput of crawl_url (threads) and async_crawl_url (event loop) in this process"""
+    results = []
+    for backend in backends:
+        for mode in modes:
+            # Fresh URLs per run, so nothing is coalesced or deduplicated
+            urls = [site.url(first_page + i) for i in range(count)]
+            first_page += count
+            crawler = StealthCrawler(delay_range=(0, 0), max_retries=1, parser=backend,
+                                     connector_limit=max(concurrency, 10),
+                                     pool_maxsize=max(concurrency, 10))
+            try:
+                with ResourceMonitor() as monitor:
+                    started = time.perf_counter()
+                    if mode == 'sync':
+                        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                            outcomes = list(pool.map(lambda url: _timed_crawl(crawler, url, backend), urls))
+                    else:
+                        outcomes = asyncio.run(_crawl_async(crawler, urls, backend, concurrency))
+                    elapsed = time.perf_counter() - started
+            finally:
+                crawler.close()
+
+            latencies, errors = _split_outcomes(outcomes)
+            results.append({
+                'benchmark': 'crawl',
+                'mode': mode,
+                'backend': backend,
+                'concurrency': concurrency,
+                **site.describe(),
+                **summarize(latencies, elapsed, errors, monitor.cpu_s, monitor.peak_rss)
+            })
+    return results
+
+
+def _wait_with_usage(proc: subprocess.Popen, timeout: float = 30) -> tuple:
+    """Reap ``proc``: exit code, CPU seconds and peak RSS (None where unsupported)"""
+    if not hasattr(os, 'wait4'):
+        return proc.wait(timeout), None, None
+    deadline = time.monotonic() + timeout
+    while True:
+        pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+        if pid:
+            break
+        if time.monotonic() > deadline:
+            proc.kill()
+            _, status, usage = os.wait4(proc.pid, 0)
+            break
+        time.sleep(0.05)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    return proc.returncode, usage.ru_utime + usage.ru_stime, rss
+
+
+def benchmark_cli(site: MockSite, count: int, concurrency: int, backends: List[str],
+                  workers: List[int], first_page: int = 0) -> List[Dict]:
+    """End-to-end scraper_cli.py runs; CPU and peak RSS of the CLI process.
+
+    Per-URL latency isn't visible from outside, so only throughput is
+    reported. With several workers CPU includes them and peak RSS is
+    that of the largest process.
+    """
+    results = []
+    for backend in backends:
+        for worker_count in workers:
+            with tempfile.TemporaryDirectory() as tmp:
+                url_file = os.path.join(tmp, 'urls.txt')
+                output = os.path.join(tmp, 'results.jsonl')
+                with open(url_file, 'w') as f:
+                    f.writelines(site.url(first_page + i) + '\n' for i in range(count))
+                first_page += count
+
+                command = [
+                    sys.executable, str(REPO_DIR / 'scraper_cli.py'),
+                    '-f', url_file, '-o', output, '--format', 'jsonl',
+                    '--no-delay', '--retries', '1',
+                    '--concurrency', str(concurrency), '--workers', str(worker_count),
+                    '--parser', backend,
+                    # No config file: log to the temporary directory only
+                    '--config', os.path.join(tmp, 'none.json')
+                ]
+                started = time.perf_counter()
+                proc = subprocess.Popen(command, cwd=tmp, stdout=subprocess.DEVNULL,
+                                        stderr=subprocess.DEVNULL)
+                returncode, cpu_s, peak_rss = _wait_with_usage(proc, timeout=3600)
+                elapsed = time.perf_counter() - started
+
+                successful = 0
+                if os.path.exists(output):
+                    with open(output, encoding='utf-8') as f:
+                        successful = sum(json.loads(line).get('status') == 'success' for line in f)
+
+            results.append({
+                'benchmark': 'cli',
+                'backend': backend,
+                'concurrency': concurrency,
+                'workers': worker_count,
+                **site.describe(),
+                **summarize([], elapsed, count - successful, cpu_s, peak_rss, requests=count),
+                'returncode': returncode
+            })
+    return results
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _process_cpu_s(pid: int) -> Optional[float]:
+    """CPU seconds used so far by ``pid`` (Linux only)"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _process_peak_rss(pid: int) -> Optional[int]:
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+async def _wait_for_api(base_url: str, proc: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"API server exited with code {proc.returncode}")
+            try:
+                async with session.get(f'{base_url}/health') as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("API server did not start in time")
+
+
+async def _load_api(base_url: str, endpoint: str, bodies: List[Dict], concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    timeout = aiohttp.ClientTimeout(total=300)
+
+    async with aiohttp.ClientSession(timeout=timeout,
+                                     connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        async def post(body: Dict):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    async with session.post(base_url + endpoint, json=body) as response:
+                        payload = await response.json()
+                        ok = response.status == 200
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                    return time.perf_counter() - started, False, 0
+                latency = time.perf_counter() - started
+                if endpoint == '/stealth-scrape':
+                    pages = int(ok and payload.get('data', {}).get('status') == 'success')
+                    return latency, bool(pages), pages
+                pages = sum(r.get('status') == 'success' for r in payload.get('results', [])) if ok else 0
+                return latency, ok, pages
+
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(post(body) for body in bodies))
+        return outcomes, time.perf_counter() - started
+
+
+def benchmark_api(site: MockSite, count: int, concurrency: int, backends: List[str],
+                  endpoints: List[str], batch_size: int = 10, parse_workers: int = 0,
+                  first_page: int = 0) -> List[Dict]:
+    """Load /stealth-scrape and /batch-scrape on a uvicorn server started per case.
+
+    ``count`` is the number of pages; /batch-scrape sends them in
+    batches of ``batch_size``. CPU and peak RSS are the server's and
+    need Linux's /proc; startup is excluded from CPU.
+    """
+    results = []
+    for backend in backends:
+        for endpoint in endpoints:
+            urls = [site.url(first_page + i) for i in range(count)]
+            first_page += count
+            if endpoint == '/stealth-scrape':
+                bodies = [{'url': url, 'parser': backend} for url in urls]
+            else:
+                bodies = [{'urls': urls[i:i + batch_size], 'parser': backend}
+                          for i in range(0, len(urls), batch_size)]
+
+            port = _free_port()
+            base_url = f'http://127.0.0.1:{port}'
+            with tempfile.TemporaryDirectory() as tmp:
+                env = dict(
+                    os.environ,
+                    CRAWL_DELAY_MIN='0',
+                    CRAWL_DELAY_MAX='0',
+                    PARSE_WORKERS=str(parse_workers),
+                    MAX_CONCURRENCY=str(max(concurrency, batch_size)),
+                    JOBS_DB=os.path.join(tmp, 'jobs.db'),
+                    CRAWLEE_STORAGE_DIR=os.path.join(tmp, 'storage'),
+                    LOG_CONFIG=os.path.join(tmp, 'none.json')
+                )
+                proc = subprocess.Popen(
+                    [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1',
+                     '--port', str(port), '--log-level', 'warning'],
+                    cwd=REPO_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+                )
+                try:
+                    asyncio.run(_wait_for_api(base_url, proc))
+                    cpu_before = _process_cpu_s(proc.pid)
+                    outcomes, elapsed = asyncio.run(_load_api(base_url, endpoint, bodies, concurrency))
+                    cpu_after = _process_cpu_s(proc.pid)
+                    peak_rss = _process_peak_rss(proc.pid)
+                finally:
+                    proc.send_signal(signal.SIGINT)
+                    _wait_with_usage(proc)
+
+            latencies = [latency for latency, ok, _ in outcomes if ok]
+            pages = sum(pages for _, _, pages in outcomes)
+            cpu_s = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+            row = {
+                'benchmark': 'api',
+                'endpoint': endpoint,
+                'backend': backend,
+                'concurrency': concurrency,
+                **site.describe(),
+                **summarize(latencies, elapsed, len(outcomes) - len(latencies), cpu_s, peak_rss),
+                'pages': pages,
+                'pages_per_sec': round(pages / elapsed, 1)
+            }
+            if endpoint == '/batch-scrape':
+                row['batch_size'] = batch_size
+            results.append(row)
+    return results
+
+
+# Columns that identify a result row across runs
+IDENTITY_KEYS = ('benchmark', 'mode', 'endpoint', 'backend', 'page_bytes', 'selectors',
+                 'concurrency', 'workers', 'batch_size', 'latency_ms', 'error_rate')
+# Compared metrics; True where higher is better
+COMPARED_METRICS = {
+    'rps': True,
+    'pages_per_sec': True,
+    'latency_ms_p50': False,
+    'latency_ms_p95': False,
+    'latency_ms_p99': False,
+    'total_ms_median': False,
+    'plan_ms_median': False,
+    'cpu_s': False,
+    'peak_rss_mb': False
+}
+
+
+def load_results(path: str) -> List[Dict]:
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    # Older files hold just the list of rows
+    return data['results'] if isinstance(data, dict) else data
+
+
+def _case(row: Dict) -> str:
+    return ' '.join(f'{key}={row[key]}' for key in IDENTITY_KEYS if key in row)
+
+
+def compare_results(baseline: List[Dict], current: List[Dict], threshold: float = 10.0) -> List[Dict]:
+    """Metric changes between matching rows; worse by more than ``threshold`` % is a regression"""
+    before = {_case(row): row for row in baseline}
+    changes = []
+    for row in current:
+        case = _case(row)
+        if case not in before:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = before[case].get(metric), row.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            worse = -change if higher_is_better else change
+            changes.append({
+                'case': case,
+                'metric': metric,
+                'baseline': old,
+                'current': new,
+                'change_pct': round(change, 1),
+                'regression': worse > threshold
+            })
+    return changes
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path: str, command: str, results: List[Dict]):
+    payload = {
+        'meta': {
+            'command': command,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'results': results
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2)
+    print(f"Results saved to {path}")
+
+
+def print_table(results: List[Dict]):
+    print(f"{'backend':<12} {'page KB':>9} {'parse ms':>10} {'p95 ms':>9} "
+          f"{'extract ms':>11} {'total ms':>9}  identical")
+    for row in results:
+        print(f"{row['backend']:<12} {row['page_bytes'] / 1024:>9.0f} "
+              f"{row['parse_ms_median']:>10.2f} {row['parse_ms_p95']:>9.2f} "
+              f"{row['extract_ms_median']:>11.2f} {row['total_ms_median']:>9.2f}  "
+              f"{'yes' if row['identical_to_html_parser'] else 'NO'}")
+
+
+def print_selector_table(results: List[Dict]):
+    print(f"{'backend':<12} {'selectors':>9} {'per-selector ms':>16} {'plan ms':>9}  identical")
+    for row in results:
+        print(f"{row['backend']:<12} {row['selectors']:>9} {row['per_selector_ms_median']:>16.2f} "
+              f"{row['plan_ms_median']:>9.2f}  {'yes' if row['identical'] else 'NO'}")
+
+
+def _fmt(value, width: int, digits: int = 1) -> str:
+    return f'{value:>{width}.{digits}f}' if value is not None else '-'.rjust(width)
+
+
+def print_load_table(results: List[Dict], labels: List[str]):
+    """Throughput, latency and resources, one row per case"""
+    print(' '.join(f'{label:<15}' for label in labels) +
+          f" {'requests':>8} {'errors':>6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+          f" {'cpu s':>7} {'rss MB':>7}")
+    for row in results:
+        print(' '.join(f"{str(row.get(label, '-')):<15}" for label in labels) +
+              f" {row['requests']:>8} {row['errors']:>6} {_fmt(row['rps'], 8)}"
+              f" {_fmt(row['latency_ms_p50'], 8)} {_fmt(row['latency_ms_p95'], 8)}"
+              f" {_fmt(row['latency_ms_p99'], 8)} {_fmt(row['cpu_s'], 7, 2)}"
+              f" {_fmt(row['peak_rss_mb'], 7)}")
+
+
+def print_comparison(changes: List[Dict], threshold: float):
+    """Changes larger than ``threshold`` %, then a one-line summary"""
+    for change in changes:
+        if abs(change['change_pct']) < threshold:
+            continue
+        flag = '  REGRESSION' if change['regression'] else ''
+        print(f"{change['case']}  {change['metric']}: {change['baseline']:g} -> "
+              f"{change['current']:g} ({change['change_pct']:+.1f}%){flag}")
+    regressions = sum(change['regression'] for change in changes)
+    print(f"{len(changes)} metrics compared, {regressions} regressed by more than {threshold:g}%")
+
+
+def _mock_site(args: argparse.Namespace) -> MockSite:
+    return MockSite(page_bytes=args.page_bytes, latency_ms=args.latency_ms, error_rate=args.error_rate)
+
+
+def run_load_command(args: argparse.Namespace) -> List[Dict]:
+    """Run the crawl, cli and api benchmarks (all of them for ``suite``)"""
+    results = []
+    with _mock_site(args) as site:
+        # Each benchmark numbers its pages from its own offset, so no URL repeats
+        if args.command in ('crawl', 'suite'):
+            rows = benchmark_crawl(site, args.requests, args.concurrency, args.backends, args.modes)
+            print_load_table(rows, ['mode', 'backend'])
+            results.extend(rows)
+        if args.command in ('cli', 'suite'):
+            rows = benchmark_cli(site, args.requests, args.concurrency, args.backends,
+                                 args.workers, first_page=10 ** 8)
+            print_load_table(rows, ['backend', 'workers'])
+            results.extend(rows)
+        if args.command in ('api', 'suite'):
+            rows = benchmark_api(site, args.requests, args.concurrency, args.backends, args.endpoints,
+                                 batch_size=args.batch_size, parse_workers=args.parse_workers,
+                                 first_page=2 * 10 ** 8)
+            print_load_table(rows, ['endpoint', 'backend'])
+            results.extend(rows)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stealth scraper benchmarks")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    parsers_cmd = subparsers.add_parser('parsers', help='Compare HTML parser backends')
+    parsers_cmd.add_argument('--sizes', nargs='+', type=int, default=[20000, 200000, 1000000],
+                             help='Synthetic page sizes in bytes (default: 20000 200000 1000000)')
+    parsers_cmd.add_argument('--backends', nargs='+', choices=PARSER_BACKENDS,
+                             default=list(PARSER_BACKENDS), help='Backends to compare (default: all)')
+    parsers_cmd.add_argument('--repeat', type=int, default=10,
+                             help='Iterations per backend and size (default: 10)')
+    parsers_cmd.add_argument('-o', '--output', help='Write machine-readable results to this JSON file')
+
+    selectors_cmd = subparsers.add_parser('selectors', help='Compiled extraction plans vs per-selector queries')
+    selectors_cmd.add_argument('--counts', nargs='+', type=int, default=[5, 20, 50],
+                               help='Selector set sizes (default: 5 20 50)')
+    selectors_cmd.add_argument('--backends', nargs='+', choices=PARSER_BACKENDS,
+                               default=list(PARSER_BACKENDS), help='Backends to compare (default: all)')
+    selectors_cmd.add_argument('--size', type=int, default=200000,
+                               help='Synthetic page size in bytes (default: 200000)')
+    selectors_cmd.add_argument('--repeat', type=int, default=10,
+                               help='Iterations per backend and count (default: 10)')
+    selectors_cmd.add_argument('-o', '--output', help='Write machine-readable results to this JSON file')
+
+    # Options shared by everything that talks to the mock site
+    site_options = argparse.ArgumentParser(add_help=False)
+    site_options.add_argument('--page-bytes', type=int, default=50000,
+                              help='Size of each synthetic page (default: 50000)')
+    site_options.add_argument('--latency-ms', type=float, default=0,
+                              help='Server delay before each response (default: 0)')
+    site_options.add_argument('--error-rate', type=float, default=0.0,
+                              help='Share of URLs answering 503 (default: 0)')
+
+    load_options = argparse.ArgumentParser(add_help=False, parents=[site_options])
+    load_options.add_argument('--requests', type=int, default=200,
+                              help='Pages per run (default: 200)')
+    load_options.add_argument('--concurrency', type=int, default=10,
+                              help='Requests in flight (default: 10)')
+    load_options.add_argument('--backends', nargs='+', choices=PARSER_BACKENDS, default=['lxml'],
+                              help='Parser backends to run with (default: lxml)')
+    load_options.add_argument('-o', '--output', help='Write machine-readable results to this JSON file')
+
+    crawl_options = argparse.ArgumentParser(add_help=False)
+    crawl_options.add_argument('--modes', nargs='+', choices=['sync', 'async'], default=['sync', 'async'],
+                               help='crawl_url in threads and/or async_crawl_url (default: both)')
+    cli_options = argparse.ArgumentParser(add_help=False)
+    cli_options.add_argument('--workers', nargs='+', type=int, default=[1],
+                             help='CLI worker process counts to try (default: 1)')
+    api_options = argparse.ArgumentParser(add_help=False)
+    api_options.add_argument('--endpoints', nargs='+', choices=['/stealth-scrape', '/batch-scrape'],
+                             default=['/stealth-scrape', '/batch-scrape'],
+                             help='Endpoints to load (default: both)')
+    api_options.add_argument('--batch-size', type=int, default=10,
+                             help='URLs per /batch-scrape request (default: 10)')
+    api_options.add_argument('--parse-workers', type=int, default=0,
+                             help='PARSE_WORKERS for the server; 0 parses in threads (default: 0)')
+
+    subparsers.add_parser('crawl', parents=[load_options, crawl_options],
+                          help='StealthCrawler.crawl_url / async_crawl_url against the mock site')
+    subparsers.add_parser('cli', parents=[load_options, cli_options],
+                          help='scraper_cli.py end to end against the mock site')
+    subparsers.add_parser('api', parents=[load_options, api_options],
+                          help='/stealth-scrape and /batch-scrape on a local uvicorn server')
+    subparsers.add_parser('suite', parents=[load_options, crawl_options, cli_options, api_options],
+                          help='crawl, cli and api benchmarks in one run')
+
+    serve_cmd = subparsers.add_parser('serve', parents=[site_options],
+                                      help='Run the mock site in the foreground')
+    serve_cmd.add_argument('--port', type=int, default=8000, help='Port to listen on (default: 8000)')
+
+    compare_cmd = subparsers.add_parser('compare', help='Compare two result files')
+    compare_cmd.add_argument('baseline', help='Results of the reference version')
+    compare_cmd.add_argument('current', help='Results to check')
+    compare_cmd.add_argument('--threshold', type=float, default=10.0,
+                             help='Percent worse that counts as a regression (default: 10)')
+
+    args = parser.parse_args()
+
+    consistent = True
+    if args.command == 'serve':
+        print(f"Serving synthetic pages at http://127.0.0.1:{args.port}/page/<n>")
+        _serve_mock_site(args.port, args.page_bytes, args.latency_ms, args.error_rate, variants=8)
+        return
+    if args.command == 'compare':
+        changes = compare_results(load_results(args.baseline), load_results(args.current), args.threshold)
+        print_comparison(changes, args.threshold)
+        if any(change['regression'] for change in changes):
+            sys.exit(1)
+        return
+
+    if args.command == 'parsers':
+        results = benchmark_parsers(args.sizes, args.backends, args.repeat)
+        print_table(results)
+        consistent = all(row['identical_to_html_parser'] for row in results)
+    elif args.command == 'selectors':
+        results = benchmark_selectors(args.counts, args.backends, args.size, args.repeat)
+        print_selector_table(results)
+        consistent = all(row['identical'] for row in results)
+    else:
+        results = run_load_command(args)
+
+    if args.output:
+        write_results(args.output, ' '.join(sys.argv[1:]), results)
+
+    if not consistent:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
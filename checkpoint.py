@@ -0,0 +1,98 @@
+import json
+import os
+import tempfile
+import time
+from typing import Dict, Optional
+
+
+class Checkpoint:
+    """Resumable progress of a crawl over an ordered URL source.
+
+    URLs are identified by their position in the source. Progress is a
+    watermark (every URL before ``next_index`` is finished) plus the few
+    finished URLs beyond it that completed out of order, so the file
+    stays small however long the run is.
+
+    Each save also records how long the output file was at that point.
+    A resumed run cuts the output back to that length, so results
+    written after the last save are crawled again but never duplicated.
+    """
+
+    def __init__(self, path: str, source: Optional[str] = None,
+                 save_every: int = 100, save_interval: float = 5.0):
+        self.path = path
+        self.source = source
+        self.save_every = save_every
+        self.save_interval = save_interval
+        self.next_index = 0
+        self.completed = 0
+        self.output_bytes: Optional[int] = None
+        self._done = set()
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+        self.resumed = self._load()
+
+    def _load(self) -> bool:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return False
+        except ValueError as e:
+            raise ValueError(f"Corrupt checkpoint {self.path}: {e}")
+
+        if self.source is not None and state.get('source') not in (None, self.source):
+            raise ValueError(
+                f"Checkpoint {self.path} belongs to {state['source']}, not {self.source}"
+            )
+        self.next_index = state['next_index']
+        self.completed = state.get('completed', 0)
+        self.output_bytes = state.get('output_bytes')
+        self._done = set(state.get('done', []))
+        return True
+
+    def is_done(self, index: int) -> bool:
+        return index < self.next_index or index in self._done
+
+    def mark_done(self, index: int):
+        self._done.add(index)
+        while self.next_index in self._done:
+            self._done.remove(self.next_index)
+            self.next_index += 1
+        self.completed += 1
+        self._unsaved += 1
+
+    def due(self) -> bool:
+        """Whether enough has changed since the last save"""
+        return self._unsaved > 0 and (
+            self._unsaved >= self.save_every
+            or time.monotonic() - self._saved_at >= self.save_interval
+        )
+
+    def state(self) -> Dict:
+        return {
+            'source': self.source,
+            'next_index': self.next_index,
+            'done': sorted(self._done),
+            'completed': self.completed,
+            'output_bytes': self.output_bytes
+        }
+
+    def save(self, output_bytes: Optional[int] = None):
+        """Persist progress; call only once the output is flushed"""
+        if output_bytes is not None:
+            self.output_bytes = output_bytes
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.state(), f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
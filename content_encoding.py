@@ -0,0 +1,69 @@
+"""
+Response compression negotiated from ``Accept-Encoding``.
+
+gzip is always available; brotli and zstd are used when the optional
+``brotli`` and ``zstandard`` packages are installed.
+"""
+
+import gzip
+from typing import Dict, Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Bodies smaller than this aren't worth compressing
+MIN_COMPRESS_BYTES = 1024
+
+_COMPRESSORS = {'gzip': lambda body: gzip.compress(body, compresslevel=6)}
+if brotli is not None:
+    _COMPRESSORS['br'] = lambda body: brotli.compress(body, quality=5)
+if zstandard is not None:
+    _COMPRESSORS['zstd'] = lambda body: zstandard.ZstdCompressor(level=3).compress(body)
+
+# Preferred first when the client rates several encodings the same
+PREFERENCE = ('zstd', 'br', 'gzip')
+AVAILABLE_ENCODINGS = tuple(name for name in PREFERENCE if name in _COMPRESSORS)
+
+
+def _parse_accept_encoding(header: str) -> Dict[str, float]:
+    accepted = {}
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """The best encoding the client accepts and we support, or None for identity"""
+    if not accept_encoding:
+        return None
+    accepted = _parse_accept_encoding(accept_encoding)
+    wildcard = accepted.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for name in AVAILABLE_ENCODINGS:
+        quality = accepted.get(name, wildcard)
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    return _COMPRESSORS[encoding](body)
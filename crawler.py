@@ -1,46 +1,211 @@
 import asyncio
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
+from datetime import timedelta
 from typing import TypedDict, Dict, Any
+import os
 import threading
-from concurrent.futures import ThreadPoolExecutor
 
 from fastapi import FastAPI
 
-from crawlee.crawlers import ParselCrawler, ParselCrawlingContext
+from crawlee import ConcurrencySettings
+from crawlee.crawlers import BasicCrawlingContext, ParselCrawler, ParselCrawlingContext
+from health import HealthTracker
+from jobs import JobRunner, JobStore
+from logging_setup import load_logging_config, setup_logging, shutdown_logging
+from metrics import REGISTRY
+from parse_pool import ParsePool
+from response_cache import create_response_cache
+from result_map import ResultMap
+from retry_policy import RetryBudget, RetryPolicy
+from singleflight import SingleFlight
 from stealth_crawler import StealthCrawler
 
 
+class SlotSemaphore(asyncio.Semaphore):
+    """A semaphore that counts the slots taken, for /metrics"""
+
+    def __init__(self, value: int = 1):
+        super().__init__(value)
+        self.in_use = 0
+
+    async def acquire(self) -> bool:
+        await super().acquire()
+        self.in_use += 1
+        return True
+
+    def release(self):
+        self.in_use -= 1
+        super().release()
+
+
 class State(TypedDict):
     """State available in the app."""
 
     crawler: ParselCrawler
     stealth_crawler: StealthCrawler
-    executor: ThreadPoolExecutor
-    requests_to_results: dict[str, asyncio.Future[dict[str, str]]]
+    parse_pool: ParsePool
+    batch_semaphore: SlotSemaphore
+    max_concurrency: int
+    singleflight: SingleFlight
+    job_store: JobStore
+    job_runner: JobRunner
+    requests_to_results: ResultMap
+    scrape_timeout: float
+
+
+def register_metrics(stealth_crawler: StealthCrawler, parse_pool: ParsePool,
+                     batch_semaphore: SlotSemaphore, requests_to_results: ResultMap,
+                     singleflight: SingleFlight):
+    """Expose the app's existing counters and queue depths on /metrics"""
+    cache = stealth_crawler.cache
+    if cache is not None:
+        REGISTRY.callback(
+            'scraper_cache_lookups_total', 'Response cache lookups by result',
+            lambda: {('hit',): cache.hits, ('miss',): cache.misses},
+            kind='counter', labelnames=['result']
+        )
+        REGISTRY.callback(
+            'scraper_cache_not_modified_total', 'Stale cache entries revalidated with a 304',
+            lambda: cache.not_modified, kind='counter'
+        )
+    REGISTRY.callback(
+        'scraper_parse_queue_depth', 'Parse jobs queued or running',
+        lambda: parse_pool.pending
+    )
+    REGISTRY.callback(
+        'scraper_parse_rejected_total', 'Parse jobs refused because the pool was saturated',
+        lambda: parse_pool.rejected, kind='counter'
+    )
+    REGISTRY.callback(
+        'scraper_batch_slots_in_use', 'Batch and job URLs being processed',
+        lambda: batch_semaphore.in_use
+    )
+    REGISTRY.callback(
+        'scraper_requests_coalesced_total', 'Scrape requests served by an identical one already in flight',
+        lambda: singleflight.coalesced, kind='counter'
+    )
+    REGISTRY.callback(
+        'scraper_scrape_results_pending', '/scrape requests waiting for the crawlee crawler',
+        lambda: len(requests_to_results)
+    )
+    budget = stealth_crawler.retry_policy.budget
+    if budget is not None:
+        REGISTRY.callback(
+            'scraper_retry_budget_exhausted_total', 'Retries skipped because the retry budget was used up',
+            lambda: budget.exhausted, kind='counter'
+        )
+    REGISTRY.callback(
+        'scraper_circuits_open', 'Hosts and proxies whose circuit breaker is open or half-open',
+        lambda: {('host',): stealth_crawler.host_health.open_count(),
+                 ('proxy',): stealth_crawler.proxy_health.open_count()},
+        labelnames=['target']
+    )
+    REGISTRY.callback(
+        'scraper_visited_urls', 'URLs in the visited set',
+        lambda: len(stealth_crawler.visited_urls)
+    )
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[State]:
     # Start up code that runs once when the app starts
 
-    # Results will be stored in this dictionary
-    requests_to_results = dict[str, asyncio.Future[dict[str, str]]]()
+    # Log records are queued and written by a background thread
+    setup_logging(load_logging_config(os.getenv('LOG_CONFIG', 'config.json')))
+
+    # Futures for /scrape requests waiting on the crawlee crawler. Bounded,
+    # and entries nobody collected are failed and dropped after a while
+    scrape_timeout = float(os.getenv('SCRAPE_TIMEOUT', '60'))
+    requests_to_results = ResultMap(
+        max_size=int(os.getenv('SCRAPE_MAX_PENDING', '1000')),
+        max_age=scrape_timeout * 2
+    )
 
     # Initialize stealth crawler with production-optimized settings
     stealth_crawler = StealthCrawler(
-        delay_range=(0.5, 2.0),  # Faster for production
-        max_retries=2,           # Reduced retries for performance
-        timeout=20               # Shorter timeout for Render
+        # Faster for production; per-host politeness delay in seconds
+        delay_range=(float(os.getenv('CRAWL_DELAY_MIN', '0.5')), float(os.getenv('CRAWL_DELAY_MAX', '2.0'))),
+        timeout=20,              # Shorter timeout for Render
+        # Backs off on timeouts, 429 and 5xx (honouring Retry-After); 4xx
+        # other than 429 fail at once. Retries stay under a share of traffic
+        retry_policy=RetryPolicy(
+            max_attempts=int(os.getenv('RETRY_MAX_ATTEMPTS', '2')),
+            base_delay=float(os.getenv('RETRY_BASE_DELAY', '0.5')),
+            max_delay=float(os.getenv('RETRY_MAX_DELAY', '10')),
+            deadline=float(os.getenv('RETRY_DEADLINE', '45')) or None,
+            budget=RetryBudget(ratio=float(os.getenv('RETRY_BUDGET_RATIO', '0.2')))
+        ),
+        # Hosts that keep failing are skipped until a probe succeeds
+        host_health=HealthTracker(
+            failure_threshold=int(os.getenv('BREAKER_FAILURES', '5')),
+            cooldown=float(os.getenv('BREAKER_COOLDOWN', '30'))
+        ),
+        connector_limit=int(os.getenv('HTTP_CONNECTOR_LIMIT', '100')),
+        connector_limit_per_host=int(os.getenv('HTTP_CONNECTOR_LIMIT_PER_HOST', '10')),
+        pool_connections=int(os.getenv('HTTP_POOL_CONNECTIONS', '100')),
+        pool_maxsize=int(os.getenv('HTTP_POOL_MAXSIZE', '10')),
+        visited_mode=os.getenv('VISITED_MODE', 'lru'),
+        visited_capacity=int(os.getenv('VISITED_CAPACITY', '100000')),
+        visited_ttl=float(os.getenv('VISITED_TTL', '3600')),
+        # Bloom mode only: share of new URLs wrongly reported as seen
+        visited_false_positive_rate=float(os.getenv('VISITED_FALSE_POSITIVE_RATE', '0.001')),
+        cache=create_response_cache(
+            backend=os.getenv('RESPONSE_CACHE', 'memory'),
+            max_bytes=int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(64 * 1024 * 1024))),
+            directory=os.getenv('RESPONSE_CACHE_DIR'),
+            default_ttl=float(os.getenv('RESPONSE_CACHE_DEFAULT_TTL', '0'))
+        ),
+        parser=os.getenv('HTML_PARSER', 'lxml'),
+        # Bounds memory per response; requests may only lower it
+        max_bytes=int(os.getenv('MAX_RESPONSE_BYTES', str(10 * 1024 * 1024))) or None
     )
     
-    # Thread pool for running sync stealth crawler
-    executor = ThreadPoolExecutor(max_workers=10)
+    # Parsing runs in worker processes, away from the event loop and its GIL;
+    # PARSE_WORKERS=0 parses in threads instead (less memory per instance)
+    parse_workers = int(os.getenv('PARSE_WORKERS', str(min(os.cpu_count() or 1, 4))))
+    parse_pool = ParsePool(
+        workers=parse_workers,
+        max_pending=int(os.getenv('PARSE_QUEUE_DEPTH', '0')) or None
+    )
+
+    # Global cap on URLs processed concurrently across all batch requests
+    max_concurrency = int(os.getenv('MAX_CONCURRENCY', '10'))
+    batch_semaphore = SlotSemaphore(max_concurrency)
+
+    # Shares one fetch among concurrent identical scrape requests
+    singleflight = SingleFlight()
+
+    # Durable queue for /jobs; its workers share the batch concurrency cap
+    job_store = JobStore(
+        path=os.getenv('JOBS_DB', 'jobs.db'),
+        lease_seconds=float(os.getenv('JOB_LEASE_SECONDS', '600'))
+    )
+    job_runner = JobRunner(
+        job_store,
+        stealth_crawler,
+        parse_pool=parse_pool,
+        workers=int(os.getenv('JOB_WORKERS', '4')),
+        semaphore=batch_semaphore,
+        # Finished jobs and their results are deleted after this long; 0 keeps them
+        retention=float(os.getenv('JOB_RETENTION_SECONDS', str(7 * 24 * 3600))) or None
+    )
+    job_runner.start()
+
+    register_metrics(stealth_crawler, parse_pool, batch_semaphore, requests_to_results, singleflight)
 
     crawler = ParselCrawler(
         # Keep the crawler alive even when there are no more requests to process now.
         # This makes the crawler wait for more requests to be added later.
-        keep_alive=True
+        keep_alive=True,
+        concurrency_settings=ConcurrencySettings(
+            min_concurrency=int(os.getenv('SCRAPE_MIN_CONCURRENCY', '1')),
+            max_concurrency=int(os.getenv('SCRAPE_MAX_CONCURRENCY', '20')),
+            desired_concurrency=int(os.getenv('SCRAPE_DESIRED_CONCURRENCY', '5')),
+            max_tasks_per_minute=float(os.getenv('SCRAPE_MAX_TASKS_PER_MINUTE', 'inf'))
+        ),
+        max_request_retries=int(os.getenv('SCRAPE_MAX_RETRIES', '2')),
+        request_handler_timeout=timedelta(seconds=scrape_timeout)
     )
 
     # Define the default request handler, which will be called for every request.
@@ -49,28 +214,48 @@ async def lifespan(app: FastAPI) -> AsyncIterator[State]:
         context.log.info(f'Processing {context.request.url} ...')
         title = context.selector.xpath('//title/text()').get() or ''
 
-        # Extract data from the page and save it to the result dictionary.
-        requests_to_results[context.request.unique_key].set_result(
+        # Extract data from the page and hand it to the waiting request;
+        # it may have timed out already, in which case this is a no-op
+        requests_to_results.resolve(
+            context.request.unique_key,
             {
                 'title': title,
             }
         )
 
+    # Called once retries are exhausted, so the waiting request fails fast
+    @crawler.failed_request_handler
+    async def failed_request_handler(context: BasicCrawlingContext, error: Exception) -> None:
+        requests_to_results.fail(context.request.unique_key, error)
+
     # Start the crawler without awaiting it to finish
     crawler.log.info(f'Starting crawler for the {app.title}')
     run_task = asyncio.create_task(crawler.run([]))
+    sweep_task = asyncio.create_task(requests_to_results.sweep_periodically())
 
     # Make the crawler and the result dictionary available in the app state
     yield {
         'crawler': crawler, 
         'stealth_crawler': stealth_crawler,
-        'executor': executor,
-        'requests_to_results': requests_to_results
+        'parse_pool': parse_pool,
+        'batch_semaphore': batch_semaphore,
+        'max_concurrency': max_concurrency,
+        'singleflight': singleflight,
+        'job_store': job_store,
+        'job_runner': job_runner,
+        'requests_to_results': requests_to_results,
+        'scrape_timeout': scrape_timeout
     }
 
     # Cleanup code that runs once when the app shuts down
+    sweep_task.cancel()
     crawler.stop()
+    # Unfinished job items go back to the queue for the next start
+    await job_runner.stop()
+    job_store.close()
     stealth_crawler.close()
-    executor.shutdown(wait=True)
+    await stealth_crawler.aclose()
+    parse_pool.shutdown(wait=True)
     # Wait for the crawler to finish
-    await run_task
\ No newline at end of file
+    await run_task
+    shutdown_logging()
\ No newline at end of file
@@ -14,7 +14,7 @@ def example_usage():
         custom_selectors = {
             'title': 'title',
             'heading': 'h1',
-            'description': 'meta[name="description"]',
+            'description': 'meta[name="description"]::attr(content)',
             'paragraphs': 'p'
         }
         
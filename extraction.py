@@ -0,0 +1,105 @@
+"""
+Compiled extraction plans.
+
+A plan turns a selector dict into backend-specific compiled selectors
+once and reuses them for every document it is applied to. Plans are
+cached by selector set, so a batch applying the same selectors to many
+pages compiles them a single time.
+
+Selector values use the field-spec syntax described in ``parsers``.
+Fields a backend cannot evaluate (XPath without lxml) are left out of
+the result.
+"""
+
+import json
+import logging
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Tuple, Union
+
+from parsers import UnsupportedSelector, parse_field_spec
+
+logger = logging.getLogger(__name__)
+
+SelectorSpec = Union[str, Dict[str, Any]]
+
+
+class ExtractionPlan:
+    def __init__(self, selectors: Dict[str, SelectorSpec]):
+        self.selectors = dict(selectors)
+        self.specs = {}
+        self._invalid = {}
+        for key, selector in self.selectors.items():
+            try:
+                self.specs[key] = parse_field_spec(selector)
+            except ValueError as e:
+                self._invalid[key] = e
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def _compiled_for(self, document_type) -> Tuple[Dict, Dict[str, Exception]]:
+        """Compiled selectors (and compile errors) for one document type"""
+        compiled = self._compiled.get(document_type)
+        if compiled is not None:
+            return compiled
+
+        with self._lock:
+            if document_type not in self._compiled:
+                selectors = {}
+                errors = dict(self._invalid)
+                for key, spec in self.specs.items():
+                    try:
+                        selectors[key] = document_type.compile_selector(spec)
+                    except UnsupportedSelector:
+                        continue
+                    except Exception as e:
+                        errors[key] = e
+                self._compiled[document_type] = (selectors, errors)
+            return self._compiled[document_type]
+
+    def extract(self, document) -> Dict[str, Any]:
+        compiled, errors = self._compiled_for(type(document))
+
+        try:
+            found = document.select_texts(compiled)
+        except Exception:
+            # Isolate the failing selector instead of losing every field
+            found = {}
+            for key, selector in compiled.items():
+                try:
+                    found.update(document.select_texts({key: selector}))
+                except Exception as e:
+                    errors = dict(errors, **{key: e})
+
+        data = {}
+        for key, selector in self.selectors.items():
+            spec = self.specs.get(key)
+            empty = [] if spec is not None and spec.all else ""
+            if key in errors:
+                logger.warning('Error extracting %s with selector %s: %s', key, selector, errors[key],
+                               extra={'event': 'extract.error', 'field': key, 'selector': selector})
+                data[key] = empty
+            elif key in compiled:
+                data[key] = found.get(key) or empty
+        return data
+
+
+@lru_cache(maxsize=256)
+def _cached_plan(selectors_key: str) -> ExtractionPlan:
+    return ExtractionPlan(json.loads(selectors_key))
+
+
+def get_extraction_plan(selectors: Dict[str, SelectorSpec]) -> ExtractionPlan:
+    """Return the (cached) plan for ``selectors``"""
+    # Dict specs aren't hashable; the JSON form keeps key order (and output order)
+    return _cached_plan(json.dumps(selectors))
+
+
+def plan_cache_stats() -> Dict[str, int]:
+    info = _cached_plan.cache_info()
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'size': info.currsize,
+        'max_size': info.maxsize
+    }
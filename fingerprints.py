@@ -0,0 +1,134 @@
+"""
+Per-URL fingerprints for incremental recrawls.
+
+For every URL crawled in incremental mode the store keeps the response
+validators (ETag, Last-Modified) and a hash of the body. The next run
+sends them as a conditional request; a 304, or a body whose hash is
+unchanged, means the page is skipped without parsing or output.
+
+Kept in SQLite, so fingerprints survive between runs and can be shared
+by the worker processes of one run.
+
+A resumable run opens the store ``deferred``: new fingerprints are held
+until ``commit`` is called for their URLs once the checkpoint covering
+their output is saved. Otherwise a crash would leave fingerprints for
+results the resumed run cuts from the output, and the resumed run would
+then skip those pages as unchanged.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    content_hash TEXT NOT NULL,
+    checked_at REAL NOT NULL,
+    changed_at REAL NOT NULL
+);
+"""
+
+UPSERT = (
+    'INSERT OR REPLACE INTO fingerprints '
+    '(url, etag, last_modified, content_hash, checked_at, changed_at) '
+    'VALUES (?, ?, ?, ?, ?, ?)'
+)
+
+
+def content_hash(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+class Fingerprint:
+    def __init__(self, url: str, etag: Optional[str], last_modified: Optional[str],
+                 content_hash: str, checked_at: float, changed_at: float):
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = content_hash
+        self.checked_at = checked_at
+        self.changed_at = changed_at
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class FingerprintStore:
+    """SQLite-backed fingerprints, one row per URL (thread-safe)"""
+
+    def __init__(self, path: str = 'fingerprints.db', deferred: bool = False):
+        self.path = path
+        self.deferred = deferred
+        self._pending: Dict[str, Tuple] = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self.unchanged = 0
+        self.changed = 0
+
+    def get(self, url: str) -> Optional[Fingerprint]:
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM fingerprints WHERE url = ?', (url,)).fetchone()
+        if row is None:
+            return None
+        return Fingerprint(row['url'], row['etag'], row['last_modified'], row['content_hash'],
+                           row['checked_at'], row['changed_at'])
+
+    def record(self, url: str, headers: Dict[str, str], digest: str,
+               previous: Optional[Fingerprint] = None) -> bool:
+        """Store the fingerprint of a fetched body; True if it differs from ``previous``"""
+        lowered = {k.lower(): v for k, v in headers.items()}
+        now = time.time()
+        changed = previous is None or previous.content_hash != digest
+        row = (url, lowered.get('etag'), lowered.get('last-modified'), digest, now,
+               now if changed else previous.changed_at)
+        with self._lock:
+            if self.deferred:
+                self._pending[url] = row
+            else:
+                self._conn.execute(UPSERT, row)
+            if changed:
+                self.changed += 1
+            else:
+                self.unchanged += 1
+        return changed
+
+    def not_modified(self, fingerprint: Fingerprint):
+        """The server answered 304: the page is as last seen"""
+        with self._lock:
+            self._conn.execute('UPDATE fingerprints SET checked_at = ? WHERE url = ?',
+                               (time.time(), fingerprint.url))
+            self.unchanged += 1
+
+    def commit(self, urls: Iterable[str]) -> int:
+        """Write the fingerprints held for ``urls``; returns how many"""
+        with self._lock:
+            rows = [self._pending.pop(url) for url in urls if url in self._pending]
+            if rows:
+                with self._conn:
+                    self._conn.execute('BEGIN')
+                    self._conn.executemany(UPSERT, rows)
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stored = self._conn.execute('SELECT COUNT(*) FROM fingerprints').fetchone()[0]
+        return {'stored': stored, 'held': len(self._pending),
+                'changed': self.changed, 'unchanged': self.unchanged}
@@ -0,0 +1,214 @@
+import random
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Hashable, Optional, Sequence
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class EndpointHealth:
+    """Rolling outcomes, latency and circuit state of one host or proxy"""
+
+    def __init__(self, window: int):
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.latency: Optional[float] = None
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.cooldown = 0.0
+        self.probe_started: Optional[float] = None
+        self.last_used = 0.0
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+
+class HealthTracker:
+    """Per-endpoint error rate, latency and circuit breakers.
+
+    An endpoint's breaker opens after ``failure_threshold`` failures in
+    a row, or once at least ``min_requests`` of the last ``window``
+    outcomes are known and ``error_rate_threshold`` of them failed.
+    While open, ``allow`` refuses it; after ``cooldown`` seconds one
+    probe is let through (half-open). A good probe closes the breaker,
+    a bad one reopens it for twice as long, up to ``max_cooldown``.
+
+    ``choose`` picks among endpoints weighted by success rate over
+    latency, so fast healthy proxies get most of the traffic.
+    Thread-safe; used from worker threads and the event loop.
+    """
+
+    # Forget idle closed endpoints once this many are tracked
+    PRUNE_THRESHOLD = 10000
+    # Open endpoints listed by stats()
+    MAX_LISTED = 100
+
+    def __init__(self,
+                 failure_threshold: int = 5,
+                 error_rate_threshold: float = 0.5,
+                 window: int = 20,
+                 min_requests: int = 10,
+                 cooldown: float = 30.0,
+                 max_cooldown: float = 300.0,
+                 latency_alpha: float = 0.2):
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.window = window
+        self.min_requests = min_requests
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.latency_alpha = latency_alpha
+        self._lock = threading.Lock()
+        self._endpoints: Dict[Hashable, EndpointHealth] = {}
+        self.opened = 0
+        self.rejected = 0
+
+    def _get(self, key: Hashable) -> EndpointHealth:
+        endpoint = self._endpoints.get(key)
+        if endpoint is None:
+            if len(self._endpoints) > self.PRUNE_THRESHOLD:
+                self._prune()
+            endpoint = self._endpoints[key] = EndpointHealth(self.window)
+        return endpoint
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.max_cooldown
+        idle = [key for key, endpoint in self._endpoints.items()
+                if endpoint.state == CLOSED and endpoint.last_used < cutoff]
+        for key in idle:
+            del self._endpoints[key]
+
+    def _available(self, endpoint: EndpointHealth, now: float) -> bool:
+        if endpoint.state == CLOSED:
+            return True
+        if endpoint.state == OPEN:
+            return now - endpoint.opened_at >= endpoint.cooldown
+        # Half-open: one probe at a time; a probe nobody reported on expires
+        return endpoint.probe_started is None or now - endpoint.probe_started >= endpoint.cooldown
+
+    def _take(self, endpoint: EndpointHealth, now: float):
+        if endpoint.state != CLOSED:
+            endpoint.state = HALF_OPEN
+            endpoint.probe_started = now
+        endpoint.last_used = now
+
+    def allow(self, key: Hashable) -> bool:
+        """Whether a request to ``key`` may go out now (claims the probe when half-open)"""
+        with self._lock:
+            now = time.monotonic()
+            endpoint = self._get(key)
+            if not self._available(endpoint, now):
+                self.rejected += 1
+                return False
+            self._take(endpoint, now)
+            return True
+
+    def is_open(self, key: Hashable) -> bool:
+        """Whether ``key``'s breaker would refuse a request now"""
+        with self._lock:
+            endpoint = self._endpoints.get(key)
+            return endpoint is not None and not self._available(endpoint, time.monotonic())
+
+    def choose(self, keys: Sequence[Hashable]) -> Optional[Hashable]:
+        """Pick one of ``keys`` by health; the least recently opened if all are open"""
+        if not keys:
+            return None
+        with self._lock:
+            now = time.monotonic()
+            endpoints = [(key, self._get(key)) for key in keys]
+            available = [(key, endpoint) for key, endpoint in endpoints if self._available(endpoint, now)]
+            if available:
+                # Endpoints without latency samples count as average, so they get tried
+                known = [endpoint.latency for _, endpoint in available if endpoint.latency is not None]
+                typical = sum(known) / len(known) if known else 1.0
+                weights = [
+                    max(0.05, 1 - endpoint.error_rate) / max(0.01, endpoint.latency or typical)
+                    for _, endpoint in available
+                ]
+                key, endpoint = random.choices(available, weights=weights)[0]
+            else:
+                self.rejected += 1
+                key, endpoint = min(endpoints, key=lambda item: item[1].opened_at + item[1].cooldown)
+            self._take(endpoint, now)
+            return key
+
+    def record_success(self, key: Hashable, latency: Optional[float] = None):
+        with self._lock:
+            endpoint = self._get(key)
+            endpoint.outcomes.append(True)
+            endpoint.consecutive_failures = 0
+            if latency is not None:
+                self._observe_latency(endpoint, latency)
+            if endpoint.state != CLOSED:
+                endpoint.state = CLOSED
+                endpoint.probe_started = None
+                endpoint.cooldown = 0.0
+
+    def record_failure(self, key: Hashable, latency: Optional[float] = None):
+        with self._lock:
+            now = time.monotonic()
+            endpoint = self._get(key)
+            endpoint.outcomes.append(False)
+            endpoint.consecutive_failures += 1
+            if latency is not None:
+                self._observe_latency(endpoint, latency)
+            if endpoint.state == HALF_OPEN:
+                self._open(endpoint, now, min(self.max_cooldown, endpoint.cooldown * 2))
+            elif endpoint.state == CLOSED and (
+                    endpoint.consecutive_failures >= self.failure_threshold
+                    or (len(endpoint.outcomes) >= self.min_requests
+                        and endpoint.error_rate >= self.error_rate_threshold)):
+                self._open(endpoint, now, self.base_cooldown)
+
+    def _observe_latency(self, endpoint: EndpointHealth, latency: float):
+        if endpoint.latency is None:
+            endpoint.latency = latency
+        else:
+            endpoint.latency += self.latency_alpha * (latency - endpoint.latency)
+
+    def _open(self, endpoint: EndpointHealth, now: float, cooldown: float):
+        endpoint.state = OPEN
+        endpoint.opened_at = now
+        endpoint.cooldown = cooldown
+        endpoint.probe_started = None
+        self.opened += 1
+
+    def open_count(self) -> int:
+        with self._lock:
+            return sum(1 for endpoint in self._endpoints.values() if endpoint.state != CLOSED)
+
+    def stats(self, detail: bool = False) -> Dict:
+        with self._lock:
+            now = time.monotonic()
+            unhealthy = [(key, endpoint) for key, endpoint in self._endpoints.items()
+                         if endpoint.state != CLOSED]
+            stats = {
+                'tracked': len(self._endpoints),
+                'open': len(unhealthy),
+                'opened': self.opened,
+                'rejected': self.rejected,
+                'unhealthy': {
+                    str(key): {
+                        'state': endpoint.state,
+                        'error_rate': round(endpoint.error_rate, 3),
+                        'retry_in': round(max(0.0, endpoint.opened_at + endpoint.cooldown - now), 1)
+                    }
+                    for key, endpoint in unhealthy[:self.MAX_LISTED]
+                }
+            }
+            if detail:
+                stats['endpoints'] = {
+                    str(key): {
+                        'state': endpoint.state,
+                        'error_rate': round(endpoint.error_rate, 3),
+                        'latency_ms': round(endpoint.latency * 1000, 1) if endpoint.latency is not None else None
+                    }
+                    for key, endpoint in self._endpoints.items()
+                }
+            return stats
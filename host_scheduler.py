@@ -0,0 +1,90 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Dict, Tuple
+from urllib.parse import urlparse
+
+
+class HostScheduler:
+    """Per-host politeness delays.
+
+    Every host keeps a next-allowed time. A request reserves the host's
+    next slot and then pushes it forward by a random delay drawn from
+    ``delay_range``, so consecutive requests to one host are spaced out
+    while requests to other hosts go through immediately. Works from
+    both worker threads and the event loop.
+    """
+
+    # Forget idle hosts once this many are tracked
+    PRUNE_THRESHOLD = 10000
+
+    def __init__(self, delay_range: Tuple[float, float] = (1, 3)):
+        self.delay_range = delay_range
+        self._lock = threading.Lock()
+        self._next_allowed: Dict[str, float] = {}
+        self._waiting: Dict[str, int] = {}
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        return urlparse(url).netloc.lower()
+
+    def _reserve(self, host: str) -> float:
+        """Claim the host's next slot and return how long to wait for it"""
+        with self._lock:
+            now = time.monotonic()
+            if len(self._next_allowed) > self.PRUNE_THRESHOLD:
+                self._prune(now)
+
+            slot = max(now, self._next_allowed.get(host, now))
+            self._next_allowed[host] = slot + random.uniform(*self.delay_range)
+            delay = slot - now
+            if delay > 0:
+                self._waiting[host] = self._waiting.get(host, 0) + 1
+            return delay
+
+    def _release(self, host: str):
+        with self._lock:
+            remaining = self._waiting.get(host, 0) - 1
+            if remaining > 0:
+                self._waiting[host] = remaining
+            else:
+                self._waiting.pop(host, None)
+
+    def _prune(self, now: float):
+        expired = [host for host, slot in self._next_allowed.items()
+                   if slot <= now and host not in self._waiting]
+        for host in expired:
+            del self._next_allowed[host]
+
+    def wait(self, url: str):
+        """Block the calling thread until ``url``'s host may be requested"""
+        host = self.host_of(url)
+        delay = self._reserve(host)
+        if delay <= 0:
+            return
+        try:
+            time.sleep(delay)
+        finally:
+            self._release(host)
+
+    async def async_wait(self, url: str):
+        """Event-loop counterpart of wait"""
+        host = self.host_of(url)
+        delay = self._reserve(host)
+        if delay <= 0:
+            return
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self._release(host)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            queue_depth = dict(self._waiting)
+            hosts_tracked = len(self._next_allowed)
+        return {
+            'hosts_tracked': hosts_tracked,
+            'waiting_requests': sum(queue_depth.values()),
+            'queue_depth': queue_depth
+        }
@@ -0,0 +1,382 @@
+"""
+Durable job queue for large scrape workloads.
+
+A job is a list of URLs plus crawl options. Jobs and their per-URL work
+items live in SQLite, so a restart loses nothing: items are claimed
+with a lease, and an item whose lease ran out (its worker died or the
+process restarted) is put back in the queue by a periodic sweep.
+Several API processes may share one database file.
+
+Results are appended to their own table as items finish. The row id
+is a cursor clients can page through while the job is still running.
+An item is deleted once its result is stored, and finished jobs are
+deleted with their results after a retention period.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from parse_pool import ParsePoolSaturated
+from stealth_crawler import StealthCrawler
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    status TEXT NOT NULL,
+    options TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    successful INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS items (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (job_id, seq)
+);
+-- claim: the next pending item of a job, in order
+CREATE INDEX IF NOT EXISTS items_pending ON items (status, job_id, seq);
+-- recover_expired: running items whose lease ran out
+CREATE INDEX IF NOT EXISTS items_by_status ON items (status, lease_until);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    result TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_by_job ON results (job_id, id);
+"""
+
+
+class JobStore:
+    """SQLite-backed jobs, work items and results (thread-safe)"""
+
+    def __init__(self, path: str = 'jobs.db', lease_seconds: float = 600):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+
+    def _transaction(self):
+        return _Transaction(self._conn, self._lock)
+
+    def create_job(self, urls: List[str], options: Dict[str, Any]) -> Dict:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, created_at, updated_at, status, options, total) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, now, now, 'queued' if urls else 'completed', json.dumps(options), len(urls))
+            )
+            conn.executemany(
+                'INSERT INTO items (job_id, seq, url) VALUES (?, ?, ?)',
+                ((job_id, seq, url) for seq, url in enumerate(urls))
+            )
+        return self.get_job(job_id)
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            'job_id': row['id'],
+            'status': row['status'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+            'total_urls': row['total'],
+            'completed': row['completed'],
+            'successful': row['successful'],
+            'failed': row['completed'] - row['successful'],
+            'pending': row['total'] - row['completed'],
+            'options': json.loads(row['options'])
+        }
+
+    def claim(self) -> Optional[Tuple[str, int, str, Dict[str, Any]]]:
+        """Lease the next pending item, oldest job first: ``(job_id, seq, url, options)``"""
+        now = time.time()
+        with self._transaction() as conn:
+            # One index lookup per unfinished job, rather than sorting every
+            # pending item; a job whose items are all leased has none
+            row = conn.execute(
+                "SELECT items.job_id, items.seq, items.url, jobs.options FROM jobs "
+                "JOIN items ON items.rowid = ("
+                "    SELECT rowid FROM items WHERE status = 'pending' AND job_id = jobs.id "
+                "    ORDER BY seq LIMIT 1"
+                ") "
+                "WHERE jobs.status IN ('queued', 'running') "
+                "ORDER BY jobs.created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE items SET status = 'running', lease_until = ?, attempts = attempts + 1 "
+                "WHERE job_id = ? AND seq = ?",
+                (now + self.lease_seconds, row['job_id'], row['seq'])
+            )
+            conn.execute(
+                "UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ? AND status = 'queued'",
+                (now, row['job_id'])
+            )
+        return row['job_id'], row['seq'], row['url'], json.loads(row['options'])
+
+    def complete(self, job_id: str, seq: int, result: Dict):
+        """Store an item's result and update its job's counters"""
+        now = time.time()
+        successful = 1 if result.get('status') == 'success' else 0
+        with self._transaction() as conn:
+            # The result is all that's kept of a finished item
+            deleted = conn.execute(
+                'DELETE FROM items WHERE job_id = ? AND seq = ?', (job_id, seq)
+            ).rowcount
+            if not deleted:
+                # Finished twice after a lease expired; keep the first result
+                return
+            conn.execute(
+                'INSERT INTO results (job_id, seq, result) VALUES (?, ?, ?)',
+                (job_id, seq, json.dumps(result, ensure_ascii=False))
+            )
+            conn.execute(
+                "UPDATE jobs SET completed = completed + 1, successful = successful + ?, updated_at = ?, "
+                "status = CASE WHEN completed + 1 >= total THEN 'completed' ELSE status END "
+                "WHERE id = ?",
+                (successful, now, job_id)
+            )
+
+    def release(self, job_id: str, seq: int):
+        """Give a claimed item back without a result (e.g. on shutdown)"""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE items SET status = 'pending', lease_until = NULL "
+                "WHERE job_id = ? AND seq = ? AND status = 'running'",
+                (job_id, seq)
+            )
+
+    def recover_expired(self) -> int:
+        """Put items whose lease ran out back in the queue; returns how many"""
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE items SET status = 'pending', lease_until = NULL "
+                "WHERE status = 'running' AND lease_until < ?",
+                (time.time(),)
+            ).rowcount
+
+    def prune(self, max_age: float) -> int:
+        """Delete jobs finished more than ``max_age`` seconds ago, with their results"""
+        cutoff = time.time() - max_age
+        with self._transaction() as conn:
+            job_ids = [row[0] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status = 'completed' AND updated_at < ?", (cutoff,)
+            )]
+            for job_id in job_ids:
+                conn.execute('DELETE FROM results WHERE job_id = ?', (job_id,))
+                conn.execute('DELETE FROM items WHERE job_id = ?', (job_id,))
+                conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+        return len(job_ids)
+
+    def results(self, job_id: str, cursor: int = 0, limit: int = 100) -> Tuple[List[Dict], int]:
+        """Results after ``cursor`` in completion order, and the next cursor"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id, seq, result FROM results WHERE job_id = ? AND id > ? ORDER BY id LIMIT ?',
+                (job_id, cursor, limit)
+            ).fetchall()
+        items = [{'index': row['seq'], 'result': json.loads(row['result'])} for row in rows]
+        return items, rows[-1]['id'] if rows else cursor
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            jobs = dict(self._conn.execute(
+                'SELECT status, COUNT(*) FROM jobs GROUP BY status'
+            ).fetchall())
+            items = dict(self._conn.execute(
+                'SELECT status, COUNT(*) FROM items GROUP BY status'
+            ).fetchall())
+        return {'jobs': jobs, 'items': items}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _Transaction:
+    """``BEGIN IMMEDIATE`` ... ``COMMIT`` under the store's lock.
+
+    IMMEDIATE takes SQLite's write lock up front, so claims made by
+    other processes sharing the file can't interleave.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.Lock):
+        self.conn = conn
+        self.lock = lock
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.lock.acquire()
+        try:
+            self.conn.execute('BEGIN IMMEDIATE')
+        except Exception:
+            self.lock.release()
+            raise
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        finally:
+            self.lock.release()
+
+
+class JobRunner:
+    """Background workers draining a JobStore through a StealthCrawler.
+
+    Every ``maintenance_interval`` seconds expired leases are recovered
+    and, with a ``retention``, jobs finished longer ago are deleted.
+    Items wait for room in ``parse_pool`` before their page is fetched.
+    """
+
+    def __init__(self,
+                 store: JobStore,
+                 crawler: StealthCrawler,
+                 parse_pool=None,
+                 workers: int = 4,
+                 semaphore: Optional[asyncio.Semaphore] = None,
+                 idle_interval: float = 1.0,
+                 maintenance_interval: float = 30.0,
+                 retention: Optional[float] = None,
+                 capacity_interval: float = 0.5):
+        self.store = store
+        self.crawler = crawler
+        self.parse_pool = parse_pool
+        self.workers = workers
+        self.semaphore = semaphore
+        self.idle_interval = idle_interval
+        self.maintenance_interval = maintenance_interval
+        self.retention = retention
+        self.capacity_interval = capacity_interval
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._maintenance: Optional[asyncio.Task] = None
+        self.active = 0
+        self.recovered = 0
+        self.pruned = 0
+        self.parse_retries = 0
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._maintenance = asyncio.create_task(self._maintain())
+
+    def notify(self):
+        """New items were queued"""
+        self._wakeup.set()
+
+    async def stop(self):
+        tasks = self._tasks + ([self._maintenance] if self._maintenance is not None else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._maintenance = None
+
+    async def _run_db(self, fn, *args):
+        # SQLite calls block; keep them off the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    async def _maintain(self):
+        # Runs at start too, so items leased before a restart are picked up at once
+        while True:
+            try:
+                recovered = await self._run_db(self.store.recover_expired)
+                if recovered:
+                    self.recovered += recovered
+                    self.notify()
+                if self.retention is not None:
+                    self.pruned += await self._run_db(self.store.prune, self.retention)
+            except sqlite3.Error as e:
+                logger.warning('Job store maintenance failed: %s', e, extra={'event': 'jobs.maintenance'})
+            await asyncio.sleep(self.maintenance_interval)
+
+    async def _work(self):
+        while True:
+            claimed = await self._run_db(self.store.claim)
+            if claimed is None:
+                # Woken early by notify(); the timeout also picks up
+                # items queued or recovered by other processes
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.idle_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job_id, seq, url, options = claimed
+            self.active += 1
+            try:
+                result = await self._crawl(url, options)
+            except asyncio.CancelledError:
+                await asyncio.shield(self._run_db(self.store.release, job_id, seq))
+                raise
+            finally:
+                self.active -= 1
+            await self._run_db(self.store.complete, job_id, seq, result)
+
+    async def _crawl(self, url: str, options: Dict[str, Any]) -> Dict:
+        dedup = options.get('dedup', False)
+        while True:
+            # Jobs aren't latency-sensitive: wait for the parse pool before
+            # fetching rather than download pages it would turn away
+            await self._parse_capacity()
+            try:
+                if self.semaphore is not None:
+                    async with self.semaphore:
+                        return await self._crawl_once(url, options, dedup)
+                return await self._crawl_once(url, options, dedup)
+            except ParsePoolSaturated:
+                # The pool filled up during the fetch. This item marked the
+                # URL visited itself, so dedup must not skip the retry
+                self.parse_retries += 1
+                dedup = False
+            except Exception as e:
+                return {'url': url, 'error': str(e)}
+
+    async def _parse_capacity(self):
+        while self.parse_pool is not None and self.parse_pool.saturated:
+            await asyncio.sleep(self.capacity_interval)
+
+    async def _crawl_once(self, url: str, options: Dict[str, Any], dedup: bool) -> Dict:
+        return await self.crawler.async_crawl_url(
+            url,
+            options.get('selectors'),
+            self.parse_pool,
+            dedup=dedup,
+            parser=options.get('parser'),
+            max_bytes=options.get('max_bytes'),
+            stop_early=options.get('stop_early', False)
+        )
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'workers': len(self._tasks),
+            'active': self.active,
+            'recovered': self.recovered,
+            'pruned': self.pruned,
+            'parse_retries': self.parse_retries
+        }
@@ -0,0 +1,167 @@
+"""
+Logging for the API and the CLI.
+
+Callers only put records on a queue (``QueueHandler``); a background
+``QueueListener`` thread formats them and does the console and file I/O,
+so a slow terminal or disk never stalls a fetch. Records can be written
+as JSON, one object per line, with the fields passed through ``extra``
+(url, host, attempt, latency_ms, status, ...) as top-level keys.
+
+High-volume events carry an ``event`` name in ``extra`` and can be
+sampled: with ``"sample_rates": {"fetch.response": 0.01}`` about 1% of
+them are kept. Dropped records are discarded before they are queued.
+
+Configured from the ``logging`` section of config.json::
+
+    "logging": {
+        "level": "INFO",
+        "levels": {"stealth_crawler": "DEBUG"},
+        "format": "json",
+        "file": "scraper.log",
+        "max_bytes": 10485760,
+        "backups": 5,
+        "console": true,
+        "sample_rates": {"fetch.response": 0.1}
+    }
+
+``format`` is "text" (the default) or "json". Without ``file`` records
+only go to the console; with it they are also written to that file,
+which is rotated once it reaches ``max_bytes``, keeping ``backups`` old
+files. The shipped config.json logs text to the console only.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, Optional
+
+LOG_FORMATS = ('text', 'json')
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Log file rotation defaults
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUPS = 5
+
+# Attributes every LogRecord has; anything else came from ``extra``
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with ``extra`` fields as top-level keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of records for events listed in ``rates``"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(getattr(record, 'event', None))
+        return rate is None or random.random() < rate
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener formats; only render exceptions here, since the
+        # traceback object can't outlive the caller's frame
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def load_logging_config(path: str = 'config.json') -> Dict[str, Any]:
+    """The ``logging`` section of a config file ({} if there is none)"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f).get('logging', {})
+    except FileNotFoundError:
+        return {}
+    except (ValueError, AttributeError) as e:
+        print(f"Ignoring logging config in {path}: {e}", file=sys.stderr)
+        return {}
+
+
+def setup_logging(config: Optional[Dict[str, Any]] = None, verbose: bool = False) -> QueueListener:
+    """Route all logging through a queue to the configured outputs.
+
+    Calling it again replaces the previous setup. ``verbose`` forces
+    DEBUG on the root logger and on every logger named in ``levels``.
+    """
+    global _listener, _queue_handler
+    config = config or {}
+    output_format = config.get('format', 'text')
+    if output_format not in LOG_FORMATS:
+        raise ValueError(f"Unknown log format: {output_format}")
+
+    formatter = JsonFormatter() if output_format == 'json' else logging.Formatter(TEXT_FORMAT)
+    handlers = []
+    if config.get('console', True):
+        handlers.append(logging.StreamHandler())
+    if config.get('file'):
+        handlers.append(RotatingFileHandler(
+            config['file'],
+            maxBytes=config.get('max_bytes', DEFAULT_MAX_BYTES),
+            backupCount=config.get('backups', DEFAULT_BACKUPS),
+            encoding='utf-8'
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    shutdown_logging()
+    root = logging.getLogger()
+    root.setLevel(logging.DEBUG if verbose else config.get('level', 'INFO'))
+    for name, level in config.get('levels', {}).items():
+        # Quieted loggers would otherwise still hide their DEBUG records
+        logging.getLogger(name).setLevel(logging.DEBUG if verbose else level)
+
+    log_queue = queue.SimpleQueue()
+    _queue_handler = _QueueHandler(log_queue)
+    if config.get('sample_rates'):
+        _queue_handler.addFilter(SamplingFilter(config['sample_rates']))
+    root.addHandler(_queue_handler)
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """Flush queued records and detach the handler installed by setup_logging"""
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
@@ -2,30 +2,62 @@ from __future__ import annotations
 
 import asyncio
 from uuid import uuid4
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
+from urllib.parse import quote
 import json
 import os
+import re
+import time
 
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from starlette.requests import Request
-from starlette.responses import HTMLResponse
+from starlette.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 
 import crawlee
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from content_encoding import MIN_COMPRESS_BYTES, compress, negotiate_encoding
 from crawler import lifespan
+from extraction import plan_cache_stats
+from metrics import CONTENT_TYPE, HTTP_REQUEST_SECONDS, HTTP_REQUESTS, REGISTRY
+from parse_pool import ParsePool, ParsePoolSaturated
+from parsers import PARSER_BACKENDS
+from result_map import ResultMapFull
+from site_crawl import CrawlScope, crawl_site
+
+
+class OrjsonResponse(JSONResponse):
+    """JSON rendered by orjson, several times faster than the stdlib encoder on large results"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+DefaultResponse = OrjsonResponse if orjson is not None else JSONResponse
 
 # Environment detection
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
 
+# Largest URL list accepted by POST /jobs
+MAX_JOB_URLS = int(os.getenv("MAX_JOB_URLS", "100000"))
+
+# Most pages one POST /crawl may fetch
+MAX_CRAWL_PAGES = int(os.getenv("MAX_CRAWL_PAGES", "1000"))
+
 app = FastAPI(
     lifespan=lifespan, 
     title='Stealth Crawler API',
     description="Production-ready stealth web scraper API",
     version="1.0.0",
     docs_url="/docs" if ENVIRONMENT != "production" else None,
-    redoc_url="/redoc" if ENVIRONMENT != "production" else None
+    redoc_url="/redoc" if ENVIRONMENT != "production" else None,
+    default_response_class=DefaultResponse
 )
 
 # CORS middleware for cross-origin requests
@@ -38,21 +70,73 @@ app.add_middleware(
 )
 
 
+@app.middleware('http')
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # The route template, so /jobs/{job_id} is one series, not one per job
+        route = request.scope.get('route')
+        path = route.path if route is not None else 'unmatched'
+        HTTP_REQUESTS.inc(route=path, method=request.method, status=status)
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, route=path)
+
+
 class ScrapeRequest(BaseModel):
     url: str
-    selectors: Optional[Dict[str, str]] = None
+    selectors: Optional[Dict[str, Union[str, Dict[str, Any]]]] = None
     delay_range: Optional[List[float]] = None
     max_retries: Optional[int] = None
     timeout: Optional[int] = None
     return_html: Optional[bool] = False
+    # The page bytes as the response body, metadata in headers (implies return_html)
+    raw: Optional[bool] = False
+    dedup: Optional[bool] = False
+    parser: Optional[str] = None
+    max_bytes: Optional[int] = None
+    stop_early: Optional[bool] = False
 
 
 class BatchScrapeRequest(BaseModel):
     urls: List[str]
-    selectors: Optional[Dict[str, str]] = None
+    selectors: Optional[Dict[str, Union[str, Dict[str, Any]]]] = None
     delay_range: Optional[List[float]] = None
     max_retries: Optional[int] = None
     timeout: Optional[int] = None
+    concurrency: Optional[int] = None
+    stream: Optional[bool] = False
+    dedup: Optional[bool] = False
+    parser: Optional[str] = None
+    max_bytes: Optional[int] = None
+    stop_early: Optional[bool] = False
+
+
+class JobRequest(BaseModel):
+    urls: List[str]
+    selectors: Optional[Dict[str, Union[str, Dict[str, Any]]]] = None
+    dedup: Optional[bool] = False
+    parser: Optional[str] = None
+    max_bytes: Optional[int] = None
+    stop_early: Optional[bool] = False
+
+
+class CrawlRequest(BaseModel):
+    urls: List[str]
+    selectors: Optional[Dict[str, Union[str, Dict[str, Any]]]] = None
+    max_depth: int = 2
+    max_pages: int = 100
+    allowed_domains: Optional[List[str]] = None
+    include: Optional[List[str]] = None
+    exclude: Optional[List[str]] = None
+    concurrency: Optional[int] = None
+    per_host: int = 2
+    stream: Optional[bool] = False
+    parser: Optional[str] = None
+    max_bytes: Optional[int] = None
 
 
 @app.get('/', response_class=HTMLResponse)
@@ -67,7 +151,10 @@ def index() -> str:
         <li><strong>GET /scrape</strong> - Basic scraping (legacy)</li>
         <li><strong>POST /stealth-scrape</strong> - Advanced stealth scraping</li>
         <li><strong>POST /batch-scrape</strong> - Batch URL processing</li>
+        <li><strong>POST /crawl</strong> - Follow links from seed URLs within depth, page and domain limits</li>
+        <li><strong>POST /jobs</strong> - Queue a large URL list, then poll GET /jobs/{id} and /jobs/{id}/results</li>
         <li><strong>GET /health</strong> - Health check</li>
+        <li><strong>GET /metrics</strong> - Prometheus metrics</li>
     </ul>
     
     <h3>Examples:</h3>
@@ -93,27 +180,47 @@ async def health_check():
 
 
 @app.get('/scrape')
-async def scrape_url(request: Request, url: str | None = None) -> dict:
+async def scrape_url(request: Request, url: str | None = None,
+                     timeout: Optional[float] = Query(None, gt=0)) -> dict:
     """Legacy basic scraping endpoint"""
     if not url:
         return {'url': 'missing', 'scrape result': 'no results'}
 
+    # Requests may shorten the server's timeout, not extend it
+    scrape_timeout = request.state.scrape_timeout
+    if timeout is not None:
+        scrape_timeout = min(timeout, scrape_timeout)
+
     # Generate random unique key for the request
     unique_key = str(uuid4())
+    requests_to_results = request.state.requests_to_results
 
-    # Set the result future in the result dictionary so that it can be awaited
-    request.state.requests_to_results[unique_key] = asyncio.Future[dict[str, str]]()
-
-    # Add the request to the crawler queue
-    await request.state.crawler.add_requests(
-        [crawlee.Request.from_url(url, unique_key=unique_key)]
-    )
+    # Register the result future so the crawler's handlers can settle it
+    try:
+        future = requests_to_results.create(unique_key)
+    except ResultMapFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many scrapes in progress, retry later",
+            headers={'Retry-After': '1'}
+        )
 
-    # Wait for the result future to be finished
-    result = await request.state.requests_to_results[unique_key]
+    try:
+        # Add the request to the crawler queue
+        await request.state.crawler.add_requests(
+            [crawlee.Request.from_url(url, unique_key=unique_key)]
+        )
 
-    # Clean the result from the result dictionary to free up memory
-    request.state.requests_to_results.pop(unique_key)
+        # Wait for the result future to be finished
+        result = await asyncio.wait_for(future, scrape_timeout)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"No result for {url} within {scrape_timeout:g}s")
+    except Exception as e:
+        # Set by the crawler's failed request handler
+        raise HTTPException(status_code=502, detail=f"Scraping failed: {str(e)}")
+    finally:
+        # Clean the result from the result dictionary to free up memory
+        requests_to_results.discard(unique_key)
 
     # Return the result
     return {'url': url, 'scrape result': result}
@@ -122,34 +229,36 @@ async def scrape_url(request: Request, url: str | None = None) -> dict:
 @app.post('/stealth-scrape')
 async def stealth_scrape(request: Request, scrape_req: ScrapeRequest) -> dict:
     """Advanced stealth scraping with customizable options"""
+    _validate_parser(scrape_req.parser)
+    _validate_max_bytes(scrape_req.max_bytes)
+    return_html = scrape_req.return_html or scrape_req.raw
+    if not return_html:
+        # Shed load up front rather than fetching a page nobody can parse
+        _check_parse_capacity(request.state.parse_pool)
+    
     try:
-        # Run stealth crawler in thread pool
-        loop = asyncio.get_event_loop()
-        
         # Create custom crawler instance if needed
         stealth_crawler = request.state.stealth_crawler
         
         # If return_html is True, return full HTML content
-        if scrape_req.return_html:
-            # Add random delay
-            await loop.run_in_executor(
-                request.state.executor,
-                stealth_crawler._random_delay
-            )
-            
-            # Fetch raw HTML
-            html_content = await loop.run_in_executor(
-                request.state.executor,
-                stealth_crawler.fetch_raw_html,
-                scrape_req.url
+        if return_html:
+            # Fetch raw HTML on the event loop, no worker thread needed;
+            # per-host politeness delays are applied inside the fetch
+            fetched = await request.state.singleflight.do(
+                _flight_key('html', scrape_req.url, max_bytes=scrape_req.max_bytes),
+                lambda: stealth_crawler.async_fetch(scrape_req.url, raw=True, max_bytes=scrape_req.max_bytes)
             )
+            if scrape_req.raw:
+                return await _raw_html_response(request, scrape_req.url, fetched)
+            html_content = fetched.text if fetched is not None else None
             
             if html_content:
                 return {
                     'success': True,
                     'url': scrape_req.url,
                     'html': html_content,
-                    'html_length': len(html_content)
+                    'html_length': len(html_content),
+                    'truncated': fetched.truncated
                 }
             else:
                 return {
@@ -161,17 +270,25 @@ async def stealth_scrape(request: Request, scrape_req: ScrapeRequest) -> dict:
         # Default behavior - structured data extraction
         selectors = scrape_req.selectors or {
             'title': 'title',
-            'description': 'meta[name="description"]',
+            'description': 'meta[name="description"]::attr(content)',
             'h1': 'h1',
             'content': 'p, div.content, main, article'
         }
         
-        # Run in executor to avoid blocking
-        result = await loop.run_in_executor(
-            request.state.executor,
-            stealth_crawler.crawl_url,
-            scrape_req.url,
-            selectors
+        # Fetch asynchronously; only parsing is offloaded to the parse pool.
+        # Identical concurrent requests share a single fetch and parse.
+        result = await request.state.singleflight.do(
+            _flight_key('crawl', scrape_req.url, selectors, scrape_req.parser, dedup=scrape_req.dedup,
+                        max_bytes=scrape_req.max_bytes, stop_early=scrape_req.stop_early),
+            lambda: stealth_crawler.async_crawl_url(
+                scrape_req.url,
+                selectors,
+                request.state.parse_pool,
+                dedup=scrape_req.dedup,
+                parser=scrape_req.parser,
+                max_bytes=scrape_req.max_bytes,
+                stop_early=scrape_req.stop_early
+            )
         )
         
         return {
@@ -179,37 +296,108 @@ async def stealth_scrape(request: Request, scrape_req: ScrapeRequest) -> dict:
             'data': result
         }
         
+    except ParsePoolSaturated:
+        raise _parse_pool_saturated()
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Scraping failed: {str(e)}")
 
 
+async def _raw_html_response(request: Request, url: str, fetched) -> Response:
+    """The fetched bytes as they are, compressed if the client accepts it.
+    
+    No decoding or JSON encoding; the page's metadata travels in headers.
+    """
+    if fetched is None:
+        raise HTTPException(status_code=502, detail="Failed to fetch HTML content")
+    
+    headers = {
+        # The upstream charset is kept as is; the bytes aren't re-encoded
+        'Content-Type': fetched.headers.get('Content-Type', 'text/html'),
+        'X-Source-URL': quote(url, safe=":/?#[]@!$&'()*+,;=%~"),
+        'X-Upstream-Status': str(fetched.status),
+        'X-Truncated': 'true' if fetched.truncated else 'false',
+        'X-Cache': 'HIT' if fetched.from_cache else 'MISS',
+        'Vary': 'Accept-Encoding'
+    }
+    body = fetched.body
+    encoding = negotiate_encoding(request.headers.get('accept-encoding'))
+    if encoding is not None and len(body) >= MIN_COMPRESS_BYTES:
+        # CPU-bound on multi-MB pages; keep it off the event loop
+        body = await asyncio.to_thread(compress, body, encoding)
+        headers['Content-Encoding'] = encoding
+    return Response(body, headers=headers)
+
+
 @app.post('/batch-scrape')
-async def batch_scrape(request: Request, batch_req: BatchScrapeRequest) -> dict:
+async def batch_scrape(request: Request, batch_req: BatchScrapeRequest):
     """Batch processing of multiple URLs"""
     if len(batch_req.urls) > 50:
         raise HTTPException(status_code=400, detail="Maximum 50 URLs allowed per batch")
+    if batch_req.concurrency is not None and batch_req.concurrency < 1:
+        raise HTTPException(status_code=400, detail="concurrency must be at least 1")
+    _validate_parser(batch_req.parser)
+    _validate_max_bytes(batch_req.max_bytes)
+    _check_parse_capacity(request.state.parse_pool)
     
     try:
-        loop = asyncio.get_event_loop()
         stealth_crawler = request.state.stealth_crawler
+        parse_pool = request.state.parse_pool
+        batch_semaphore = request.state.batch_semaphore
+        singleflight = request.state.singleflight
         
         # Default selectors
         selectors = batch_req.selectors or {
             'title': 'title',
-            'description': 'meta[name="description"]',
+            'description': 'meta[name="description"]::attr(content)',
             'h1': 'h1'
         }
         
-        # Process URLs in batches to avoid overwhelming
-        results = []
-        for url in batch_req.urls:
-            result = await loop.run_in_executor(
-                request.state.executor,
-                stealth_crawler.crawl_url,
-                url,
-                selectors
+        # Per-request limit, never above the global limit shared by all batches
+        concurrency = min(
+            batch_req.concurrency or request.state.max_concurrency,
+            request.state.max_concurrency
+        )
+        request_semaphore = asyncio.Semaphore(concurrency)
+        
+        async def limited_crawl(url: str) -> dict:
+            async with request_semaphore, batch_semaphore:
+                return await stealth_crawler.async_crawl_url(
+                    url, selectors, parse_pool, dedup=batch_req.dedup, parser=batch_req.parser,
+                    max_bytes=batch_req.max_bytes, stop_early=batch_req.stop_early
+                )
+        
+        async def crawl_one(url: str) -> dict:
+            try:
+                return await singleflight.do(
+                    _flight_key('crawl', url, selectors, batch_req.parser, dedup=batch_req.dedup,
+                                max_bytes=batch_req.max_bytes, stop_early=batch_req.stop_early),
+                    lambda: limited_crawl(url)
+                )
+            except ParsePoolSaturated as e:
+                if not batch_req.stream:
+                    raise
+                # The stream's 200 is already sent; only the URL's line can say so
+                return {'url': url, 'error': str(e)}
+            except Exception as e:
+                return {'url': url, 'error': str(e)}
+        
+        if batch_req.stream:
+            return StreamingResponse(
+                _stream_batch_results(batch_req.urls, crawl_one),
+                media_type='application/x-ndjson'
             )
-            results.append(result)
+        
+        # Results are gathered concurrently but returned in input order
+        tasks = [asyncio.ensure_future(crawl_one(url)) for url in batch_req.urls]
+        try:
+            results = await asyncio.gather(*tasks)
+        except ParsePoolSaturated:
+            # The whole batch gets a 503, so the rest of it is wasted work
+            for task in tasks:
+                task.cancel()
+            raise _parse_pool_saturated()
         
         successful = sum(1 for r in results if r.get('status') == 'success')
         
@@ -221,34 +409,264 @@ async def batch_scrape(request: Request, batch_req: BatchScrapeRequest) -> dict:
             'results': results
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Batch scraping failed: {str(e)}")
 
 
+@app.post('/crawl')
+async def recursive_crawl(request: Request, crawl_req: CrawlRequest):
+    """Crawl outward from seed URLs, breadth first, within the request's scope"""
+    if not crawl_req.urls:
+        raise HTTPException(status_code=400, detail="urls must not be empty")
+    if not 1 <= crawl_req.max_pages <= MAX_CRAWL_PAGES:
+        raise HTTPException(status_code=400, detail=f"max_pages must be between 1 and {MAX_CRAWL_PAGES}")
+    if crawl_req.max_depth < 0:
+        raise HTTPException(status_code=400, detail="max_depth must not be negative")
+    if crawl_req.per_host < 1 or (crawl_req.concurrency is not None and crawl_req.concurrency < 1):
+        raise HTTPException(status_code=400, detail="concurrency and per_host must be at least 1")
+    _validate_parser(crawl_req.parser)
+    _validate_max_bytes(crawl_req.max_bytes)
+    _check_parse_capacity(request.state.parse_pool)
+    
+    try:
+        scope = CrawlScope(crawl_req.urls, max_depth=crawl_req.max_depth,
+                           allowed_domains=crawl_req.allowed_domains,
+                           include=crawl_req.include, exclude=crawl_req.exclude)
+    except re.error as e:
+        raise HTTPException(status_code=400, detail=f"Bad include/exclude pattern: {e}")
+    
+    selectors = crawl_req.selectors or {
+        'title': 'title',
+        'description': 'meta[name="description"]::attr(content)',
+        'h1': 'h1'
+    }
+    # Pages share the global batch limit with /batch-scrape and /jobs
+    pages = crawl_site(
+        request.state.stealth_crawler, crawl_req.urls, selectors, scope,
+        max_pages=crawl_req.max_pages,
+        concurrency=min(crawl_req.concurrency or request.state.max_concurrency,
+                        request.state.max_concurrency),
+        per_host=crawl_req.per_host,
+        executor=request.state.parse_pool,
+        parser=crawl_req.parser,
+        max_bytes=crawl_req.max_bytes,
+        semaphore=request.state.batch_semaphore
+    )
+    
+    if crawl_req.stream:
+        return StreamingResponse(_stream_crawl_results(pages), media_type='application/x-ndjson')
+    
+    results = [result async for result in pages]
+    successful = sum(1 for r in results if r.get('status') == 'success')
+    return {
+        'success': True,
+        'pages': len(results),
+        'successful': successful,
+        'failed': len(results) - successful,
+        'results': results
+    }
+
+
+async def _stream_crawl_results(pages):
+    """One NDJSON line per crawled page, then a summary line"""
+    total = successful = 0
+    try:
+        async for result in pages:
+            total += 1
+            if result.get('status') == 'success':
+                successful += 1
+            yield json.dumps({'index': total - 1, 'result': result}, ensure_ascii=False) + '\n'
+        
+        yield json.dumps({
+            'summary': {'pages': total, 'successful': successful, 'failed': total - successful}
+        }) + '\n'
+    finally:
+        # Client disconnected early: stop crawling
+        await pages.aclose()
+
+
+def _validate_parser(parser: Optional[str]):
+    if parser is not None and parser not in PARSER_BACKENDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown parser '{parser}', expected one of {list(PARSER_BACKENDS)}"
+        )
+
+
+@app.post('/jobs', status_code=202)
+async def create_job(request: Request, job_req: JobRequest):
+    """Queue a large URL list; returns at once with a job id to poll"""
+    if not job_req.urls:
+        raise HTTPException(status_code=400, detail="urls must not be empty")
+    if len(job_req.urls) > MAX_JOB_URLS:
+        raise HTTPException(status_code=400, detail=f"Maximum {MAX_JOB_URLS} URLs allowed per job")
+    _validate_parser(job_req.parser)
+    _validate_max_bytes(job_req.max_bytes)
+    
+    options = {
+        'selectors': job_req.selectors or {
+            'title': 'title',
+            'description': 'meta[name="description"]::attr(content)',
+            'h1': 'h1'
+        },
+        'dedup': job_req.dedup,
+        'parser': job_req.parser,
+        'max_bytes': job_req.max_bytes,
+        'stop_early': job_req.stop_early
+    }
+    
+    # Inserting thousands of rows blocks; keep it off the event loop
+    loop = asyncio.get_running_loop()
+    job = await loop.run_in_executor(None, request.state.job_store.create_job, job_req.urls, options)
+    request.state.job_runner.notify()
+    return job
+
+
+@app.get('/jobs/{job_id}')
+async def get_job(request: Request, job_id: str):
+    """Progress of a queued job"""
+    # SQLite calls block, and wait for the store's lock; keep them off the event loop
+    job = await asyncio.to_thread(request.state.job_store.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get('/jobs/{job_id}/results')
+async def get_job_results(request: Request, job_id: str,
+                          cursor: int = Query(0, ge=0),
+                          limit: int = Query(100, ge=1, le=1000)):
+    """Page through a job's results in completion order.
+    
+    Pass the returned ``next_cursor`` to get the following page; it is
+    valid while the job is still running, so clients can poll with it.
+    """
+    job_store = request.state.job_store
+    job = await asyncio.to_thread(job_store.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    results, next_cursor = await asyncio.to_thread(job_store.results, job_id, cursor, limit)
+    return {
+        'job_id': job_id,
+        'status': job['status'],
+        'results': results,
+        'next_cursor': next_cursor,
+        'has_more': len(results) == limit or job['status'] != 'completed'
+    }
+
+
+def _parse_pool_saturated() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Parser pool is saturated, retry later",
+        headers={'Retry-After': '1'}
+    )
+
+
+def _check_parse_capacity(parse_pool: ParsePool):
+    if parse_pool.saturated:
+        raise _parse_pool_saturated()
+
+
+def _validate_max_bytes(max_bytes: Optional[int]):
+    if max_bytes is not None and max_bytes < 1:
+        raise HTTPException(status_code=400, detail="max_bytes must be at least 1")
+
+
+def _flight_key(kind: str, url: str, selectors: Optional[dict] = None,
+                parser: Optional[str] = None, **options) -> tuple:
+    """Key under which identical in-flight requests are coalesced"""
+    return kind, url, json.dumps(selectors, sort_keys=True), parser, tuple(sorted(options.items()))
+
+
+async def _stream_batch_results(urls: List[str], crawl_one):
+    """Yield one NDJSON line per URL as soon as its result is ready.
+    
+    Each line carries the URL's position in the request so clients can
+    restore input order; a final summary line closes the stream.
+    """
+    async def indexed(index: int, url: str):
+        return index, await crawl_one(url)
+    
+    tasks = [asyncio.create_task(indexed(i, url)) for i, url in enumerate(urls)]
+    successful = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, result = await next_done
+            if result.get('status') == 'success':
+                successful += 1
+            yield json.dumps({'index': index, 'result': result}, ensure_ascii=False) + '\n'
+        
+        yield json.dumps({
+            'summary': {
+                'total_urls': len(urls),
+                'successful': successful,
+                'failed': len(urls) - successful
+            }
+        }) + '\n'
+    finally:
+        # Client disconnected early: don't leave fetches running for nobody.
+        # SingleFlight cancels a shared fetch once none of its callers is left
+        for task in tasks:
+            task.cancel()
+
+
 @app.get('/config')
-async def get_config():
+async def get_config(request: Request):
     """Get current crawler configuration"""
     return {
         'delay_range': [1, 3],
         'max_retries': 3,
         'timeout': 30,
         'max_batch_size': 50,
+        'max_crawl_pages': MAX_CRAWL_PAGES,
+        'max_concurrency': request.state.max_concurrency,
+        'parser': request.state.stealth_crawler.parser,
+        'parser_backends': list(PARSER_BACKENDS),
+        'max_response_bytes': request.state.stealth_crawler.max_bytes,
         'default_selectors': {
             'title': 'title',
-            'description': 'meta[name="description"]',
+            'description': 'meta[name="description"]::attr(content)',
             'h1': 'h1'
         }
     }
 
 
+@app.get('/metrics')
+async def get_metrics():
+    """Metrics in the Prometheus text format (this worker process only)"""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
 @app.get('/status')
 async def get_status(request: Request):
     """Get crawler status and statistics"""
     stealth_crawler = request.state.stealth_crawler
+    parse_pool = request.state.parse_pool
+    job_stats = await asyncio.to_thread(request.state.job_store.stats)
     
     return {
         'status': 'running',
         'visited_urls_count': len(stealth_crawler.visited_urls),
+        'visited_urls': stealth_crawler.visited_urls.stats(),
+        'connection_pools': stealth_crawler.pool_stats(),
+        'host_scheduler': stealth_crawler.scheduler.stats(),
+        'retry_policy': stealth_crawler.retry_policy.stats(),
+        'health': {
+            'hosts': stealth_crawler.host_health.stats(),
+            'proxies': stealth_crawler.proxy_health.stats(detail=True)
+        },
+        'response_cache': stealth_crawler.cache.stats() if stealth_crawler.cache else None,
+        'request_coalescing': request.state.singleflight.stats(),
+        # Worker processes keep their own plan caches; this process's
+        # cache is only used when parsing runs in threads
+        'extraction_plans': plan_cache_stats() if parse_pool.mode == 'thread' else None,
+        'parse_pool': parse_pool.stats(),
+        'scrape_results': request.state.requests_to_results.stats(),
+        'jobs': dict(job_stats, runner=request.state.job_runner.stats()),
         'service': 'stealth-crawler-api',
         'version': '1.0.0'
     }
\ No newline at end of file
@@ -0,0 +1,240 @@
+"""
+Process-local metrics in the Prometheus text exposition format.
+
+Counters and histograms are module-level objects updated where the work
+happens (fetch stages in StealthCrawler, request handling in main);
+values that already live elsewhere, such as cache hit counts or parse
+queue depth, are read through callbacks when ``/metrics`` is scraped.
+
+Every process keeps its own values. Behind gunicorn each worker serves
+its own ``/metrics``, so scrape them per worker (or run one worker).
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Label values beyond a metric's ``max_series`` are folded into this one
+OVERFLOW_LABEL = 'other'
+
+CallbackValue = Union[float, Dict[Tuple[str, ...], float]]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 max_series: Optional[int] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Caps label cardinality for labels fed from input, e.g. hosts
+        self.max_series = max_series
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        if (self.max_series is not None and key not in self._series
+                and len(self._series) >= self.max_series):
+            key = tuple(OVERFLOW_LABEL for _ in self.labelnames)
+        return key
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, value in series:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key: Tuple[str, ...], value) -> List[str]:
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        with self._lock:
+            key = self._key(labels)
+            self._series[key] = self._series.get(key, 0) + amount
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, max_series: Optional[int] = None):
+        super().__init__(name, documentation, labelnames, max_series)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        with self._lock:
+            key = self._key(labels)
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (last one is +Inf), then sum
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the duration of the ``with`` block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_series(self, key: Tuple[str, ...], value) -> List[str]:
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            le = 'le="' + _format_value(bound) + '"'
+            lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class _Callback:
+    """A metric whose values are read from ``fn`` at render time"""
+
+    def __init__(self, name: str, documentation: str, kind: str,
+                 fn: Callable[[], CallbackValue], labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        values = self.fn()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            if value is not None:
+                lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, object] = {}
+
+    def _add(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = (), **kwargs) -> Counter:
+        return self._add(Counter(name, documentation, labelnames, **kwargs))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), **kwargs) -> Histogram:
+        return self._add(Histogram(name, documentation, labelnames, **kwargs))
+
+    def callback(self, name: str, documentation: str, fn: Callable[[], CallbackValue],
+                 kind: str = 'gauge', labelnames: Sequence[str] = ()):
+        """Register (or replace) a metric read from ``fn`` on each scrape.
+
+        ``fn`` returns a number, or a dict of label-value tuples to numbers.
+        """
+        self._add(_Callback(name, documentation, kind, fn, labelnames))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # One broken callback shouldn't take the endpoint down
+                lines.append(f'# {metric.name} unavailable: {_escape(str(e))}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'scraper_stage_seconds',
+    'Time spent per crawl stage (dns, connect, ttfb, download, parse_wait, parse, extract)',
+    ['stage']
+)
+FETCHES = REGISTRY.counter(
+    'scraper_fetches_total',
+    'Page fetches by outcome (fetched, cached, revalidated, failed)',
+    ['outcome']
+)
+RESPONSES = REGISTRY.counter(
+    'scraper_responses_total',
+    'Upstream HTTP responses by status code',
+    ['code']
+)
+RETRIES = REGISTRY.counter(
+    'scraper_retries_total',
+    'Failed fetch attempts that were retried, by failure kind',
+    ['kind']
+)
+HOST_ERRORS = REGISTRY.counter(
+    'scraper_host_errors_total',
+    'Failed fetch attempts by host and reason',
+    ['host', 'reason'],
+    max_series=1000
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    'scraper_http_requests_total',
+    'API requests by route, method and status',
+    ['route', 'method', 'status']
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'scraper_http_request_seconds',
+    'API request latency by route',
+    ['route']
+)
+
+REGISTRY.callback(
+    'scraper_threads_active',
+    'Threads alive in this process',
+    threading.active_count
+)
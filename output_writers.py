@@ -0,0 +1,267 @@
+"""
+Incremental result writers for the CLI.
+
+Text writers take one crawl result at a time and flush it straight
+away, so a long run keeps nothing in memory and a crash loses at most
+the result being written. Compressed JSONL is flushed by the
+compressor in blocks instead.
+
+Parquet and Arrow IPC writers buffer ``batch_size`` rows and write
+them as one row group (record batch). Their column types follow the
+selector set: a string column per field, or a list of strings for
+``"all": true`` fields. They need the optional ``pyarrow`` package
+(requirements-parquet.txt), imported only when one is opened.
+"""
+
+import abc
+import csv
+import gzip
+import json
+import os
+import sys
+from typing import Any, Dict, Iterable, List, Optional, TextIO
+
+from parsers import parse_field_spec
+
+OUTPUT_FORMATS = ('json', 'jsonl', 'jsonl.gz', 'csv', 'parquet', 'arrow')
+# Formats that can be appended to when a run is resumed
+APPENDABLE_FORMATS = ('jsonl', 'csv')
+# Formats written to a binary file that can't go to stdout
+FILE_ONLY_FORMATS = ('jsonl.gz', 'csv', 'parquet', 'arrow')
+COLUMNAR_FORMATS = ('parquet', 'arrow')
+# Columns taken from the result itself rather than its data
+RESULT_COLUMNS = ('url', 'status', 'change', 'links', 'error')
+
+DEFAULT_BATCH_SIZE = 10000
+
+
+def csv_fieldnames(selector_keys: Iterable[str]) -> List[str]:
+    fieldnames = ['url', 'status', 'change']
+    fieldnames.extend(key for key in selector_keys if key not in ('url', 'status', 'change', 'error'))
+    fieldnames.append('error')
+    return fieldnames
+
+
+def flatten_result(result: Dict) -> Dict:
+    """One CSV row per result: url, status, change, every data field and the error"""
+    row = {'url': result['url'], 'status': result.get('status', 'error')}
+    for key, value in result.get('data', {}).items():
+        row[key] = json.dumps(value, ensure_ascii=False) if isinstance(value, list) else value
+    row['change'] = result.get('change', '')
+    row['error'] = result.get('error', '')
+    return row
+
+
+class _StreamWriter(abc.ABC):
+    def __init__(self, stream: TextIO, owns_stream: bool):
+        self.stream = stream
+        self.owns_stream = owns_stream
+        self.written = 0
+
+    def write(self, result: Dict):
+        self._write(result)
+        self.written += 1
+        self.stream.flush()
+
+    @abc.abstractmethod
+    def _write(self, result: Dict):
+        """Write one result to the stream"""
+
+    def flush(self):
+        self.stream.flush()
+
+    def tell(self) -> Optional[int]:
+        """Bytes written to the output file so far (None for stdout)"""
+        return self.stream.tell() if self.owns_stream else None
+
+    def close(self):
+        self.flush()
+        if self.owns_stream:
+            self.stream.close()
+
+
+class JsonlWriter(_StreamWriter):
+    """One JSON object per line"""
+
+    def _write(self, result: Dict):
+        self.stream.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+
+class JsonArrayWriter(_StreamWriter):
+    """A single JSON array, written element by element"""
+
+    def _write(self, result: Dict):
+        self.stream.write('[\n' if self.written == 0 else ',\n')
+        self.stream.write(json.dumps(result, indent=2, ensure_ascii=False))
+
+    def close(self):
+        self.stream.write('[]\n' if self.written == 0 else '\n]\n')
+        super().close()
+
+
+class CompressedJsonlWriter(JsonlWriter):
+    """JSON lines through gzip; flushed per block rather than per result"""
+
+    def write(self, result: Dict):
+        self._write(result)
+        self.written += 1
+
+
+class CsvWriter(_StreamWriter):
+    def __init__(self, stream: TextIO, owns_stream: bool, fieldnames: List[str], write_header: bool = True):
+        super().__init__(stream, owns_stream)
+        self.writer = csv.DictWriter(stream, fieldnames=fieldnames, extrasaction='ignore')
+        if write_header:
+            self.writer.writeheader()
+
+    def _write(self, result: Dict):
+        self.writer.writerow(flatten_result(result))
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ValueError(
+            "Parquet and Arrow output require the optional 'pyarrow' package "
+            "(pip install -r requirements-parquet.txt)"
+        ) from e
+    return pyarrow
+
+
+def result_schema(selectors: Dict[str, Any]):
+    """Arrow schema for crawl results with the fields of ``selectors``"""
+    pa = _import_pyarrow()
+    fields = [pa.field('url', pa.string()), pa.field('status', pa.string()),
+              pa.field('change', pa.string())]
+    for key, selector in selectors.items():
+        if key in RESULT_COLUMNS:
+            continue
+        try:
+            select_all = parse_field_spec(selector).all
+        except ValueError:
+            select_all = False
+        fields.append(pa.field(key, pa.list_(pa.string()) if select_all else pa.string()))
+    fields.append(pa.field('links', pa.list_(pa.string())))
+    fields.append(pa.field('error', pa.string()))
+    return pa.schema(fields)
+
+
+def _column_value(value, is_list: bool):
+    if value is None or value == '':
+        return [] if is_list else None
+    if is_list:
+        return [str(item) for item in value] if isinstance(value, list) else [str(value)]
+    return json.dumps(value, ensure_ascii=False) if isinstance(value, list) else str(value)
+
+
+class ColumnarWriter:
+    """Parquet or Arrow IPC output, written ``batch_size`` rows at a time.
+
+    Rows are buffered column by column; each full buffer becomes one
+    row group (Parquet) or record batch (Arrow), as does whatever is
+    buffered when ``flush`` or ``close`` is called. Columns are zstd
+    compressed.
+    """
+
+    def __init__(self, output_format: str, path: str, selectors: Dict[str, Any],
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        pa = _import_pyarrow()
+        self._pa = pa
+        self.schema = result_schema(selectors)
+        self.batch_size = batch_size
+        self._list_columns = {field.name for field in self.schema
+                              if pa.types.is_list(field.type)}
+        self._columns: Dict[str, List] = {name: [] for name in self.schema.names}
+        self._buffered = 0
+        self.written = 0
+        self._parquet = output_format == 'parquet'
+        self._sink = None
+        if self._parquet:
+            self._writer = pa.parquet.ParquetWriter(path, self.schema, compression='zstd')
+        else:
+            self._sink = pa.OSFile(path, 'wb')
+            self._writer = pa.ipc.new_file(
+                self._sink, self.schema, options=pa.ipc.IpcWriteOptions(compression='zstd')
+            )
+
+    def write(self, result: Dict):
+        data = result.get('data', {})
+        for name, column in self._columns.items():
+            value = result.get(name) if name in RESULT_COLUMNS else data.get(name)
+            if name == 'status' and value is None:
+                value = 'error'
+            column.append(_column_value(value, name in self._list_columns))
+        self._buffered += 1
+        self.written += 1
+        if self._buffered >= self.batch_size:
+            self._write_batch()
+
+    def _write_batch(self):
+        if not self._buffered:
+            return
+        batch = self._pa.RecordBatch.from_pydict(self._columns, schema=self.schema)
+        if self._parquet:
+            self._writer.write_batch(batch, row_group_size=self.batch_size)
+        else:
+            self._writer.write_batch(batch)
+        self._columns = {name: [] for name in self.schema.names}
+        self._buffered = 0
+
+    def flush(self):
+        self._write_batch()
+
+    def tell(self) -> Optional[int]:
+        return None
+
+    def close(self):
+        self._write_batch()
+        self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+
+
+def open_writer(output_format: str, path: Optional[str] = None,
+                fieldnames: Optional[List[str]] = None, append: bool = False,
+                truncate_to: Optional[int] = None, selectors: Optional[Dict[str, Any]] = None,
+                batch_size: int = DEFAULT_BATCH_SIZE):
+    """Open a writer for ``output_format`` on ``path`` (stdout if omitted).
+
+    With ``append`` an existing file is continued rather than replaced,
+    after cutting it back to ``truncate_to`` bytes if given; only
+    line-oriented formats support it. Columnar formats take their
+    schema from ``selectors`` and write ``batch_size`` rows at a time.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    if append and output_format not in APPENDABLE_FORMATS:
+        raise ValueError(f"Cannot append to {output_format} output, use jsonl or csv")
+    if path is None and output_format in FILE_ONLY_FORMATS:
+        raise ValueError(f"{output_format} output requires --output file")
+
+    if output_format in COLUMNAR_FORMATS:
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        return ColumnarWriter(output_format, path, selectors or {}, batch_size)
+    if output_format == 'jsonl.gz':
+        return CompressedJsonlWriter(gzip.open(path, 'wt', encoding='utf-8'), True)
+
+    if path is None:
+        stream, owns_stream, has_content = sys.stdout, False, False
+    else:
+        if append and truncate_to is not None and os.path.exists(path):
+            # Drop results written after the checkpoint they resume from
+            os.truncate(path, min(truncate_to, os.path.getsize(path)))
+        stream = open(path, 'a' if append else 'w', newline='' if output_format == 'csv' else None,
+                      encoding='utf-8')
+        owns_stream = True
+        has_content = append and stream.tell() > 0
+
+    if output_format == 'jsonl':
+        return JsonlWriter(stream, owns_stream)
+    if output_format == 'json':
+        return JsonArrayWriter(stream, owns_stream)
+    return CsvWriter(stream, owns_stream, fieldnames or ['url', 'status', 'error'],
+                     write_header=not has_content)
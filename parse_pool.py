@@ -0,0 +1,87 @@
+import multiprocessing
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional
+
+
+class ParsePoolSaturated(RuntimeError):
+    """More parse jobs are queued than the pool accepts"""
+
+
+class ParsePool(Executor):
+    """Bounded executor for CPU-bound parsing off the event loop.
+
+    With ``workers`` > 0 jobs run in a process pool, so parsing neither
+    holds the GIL of the API process nor slows its event loop; with 0
+    they run in a thread pool (less memory, no isolation). At most
+    ``max_pending`` jobs may be queued or running: ``submit`` raises
+    ParsePoolSaturated beyond that, and callers are expected to check
+    ``saturated`` before starting work that will end in a parse.
+
+    Submitted callables and their arguments must be picklable.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: Optional[int] = None, thread_workers: int = 10):
+        self.mode = 'process' if workers > 0 else 'thread'
+        self.workers = workers if workers > 0 else thread_workers
+        if workers > 0:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn')
+            )
+            self.max_pending = max_pending or workers * 4
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=thread_workers)
+            self.max_pending = max_pending or thread_workers * 4
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def saturated(self) -> bool:
+        return self.pending >= self.max_pending
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise ParsePoolSaturated(
+                    f"Parse queue is full ({self.pending}/{self.max_pending} jobs)"
+                )
+            self.pending += 1
+            self.submitted += 1
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            raise
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, future: Future):
+        with self._lock:
+            self.pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'workers': self.workers,
+                'pending': self.pending,
+                'max_pending': self.max_pending,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected
+            }
@@ -0,0 +1,412 @@
+"""
+HTML parser backends for StealthCrawler.
+
+Every backend parses a page into a document exposing the operations the
+crawler needs, with the same output semantics as BeautifulSoup's
+``select_one(...).get_text(strip=True)`` and ``find_all('a', href=True)``:
+
+    lxml         lxml.html queried through Parsel's selector engine:
+                 CSS (with ::text / ::attr(name)) and XPath (default)
+    html.parser  BeautifulSoup with the stdlib parser (CSS only, slowest)
+    selectolax   selectolax's lexbor engine (CSS only, optional dependency)
+
+A field selector is either a string -- XPath if it looks like one
+(``//title/text()``, ``(//a)[2]``, ``string(//h1)``), CSS otherwise -- or
+a dict ``{"css": ...}`` / ``{"xpath": ...}`` / ``{"selector": ...}`` with
+an optional ``"all": true`` to return every match as a list instead of
+the first one.
+"""
+
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+from urllib.parse import urljoin, urlparse
+
+from bs4 import BeautifulSoup, NavigableString
+
+
+PARSER_BACKENDS = ('lxml', 'html.parser', 'selectolax')
+DEFAULT_PARSER = 'lxml'
+
+# get_text() leaves out the contents of these when they are descendants
+NON_TEXT_TAGS = frozenset(('script', 'style', 'template'))
+
+# Namespaces Parsel registers for XPath queries (EXSLT regex and set functions)
+XPATH_NAMESPACES = {
+    're': 'http://exslt.org/regular-expressions',
+    'set': 'http://exslt.org/sets',
+}
+
+_XPATH_FUNCTION_CALL = re.compile(r'^[a-z][a-z-]*\(')
+_TRAILING_PSEUDO_ELEMENT = re.compile(r'::(text|attr\(\s*([^)\s]+)\s*\))\s*$')
+
+
+class UnsupportedSelector(ValueError):
+    """The selector kind is not available on this parser backend"""
+
+
+class FieldSpec(NamedTuple):
+    query: str
+    kind: str
+    all: bool = False
+
+
+def looks_like_xpath(selector: str) -> bool:
+    selector = selector.lstrip()
+    return selector.startswith(('/', './', '(')) or bool(_XPATH_FUNCTION_CALL.match(selector))
+
+
+def parse_field_spec(spec: Union[str, Dict[str, Any]]) -> FieldSpec:
+    """Normalize a selector string or dict into a FieldSpec"""
+    if isinstance(spec, str):
+        return FieldSpec(spec, 'xpath' if looks_like_xpath(spec) else 'css')
+    if isinstance(spec, dict):
+        select_all = bool(spec.get('all', False))
+        if spec.get('xpath'):
+            return FieldSpec(spec['xpath'], 'xpath', select_all)
+        if spec.get('css'):
+            return FieldSpec(spec['css'], 'css', select_all)
+        if spec.get('selector'):
+            return parse_field_spec(spec['selector'])._replace(all=select_all)
+    raise ValueError(f"Invalid selector spec: {spec!r}")
+
+
+def split_pseudo_element(css: str):
+    """Split a trailing ``::text`` / ``::attr(name)`` off a CSS selector.
+
+    Returns ``(css, pseudo)`` where ``pseudo`` is ``None``, ``('text', None)``
+    or ``('attr', name)``. For backends without Parsel's translator.
+    """
+    match = _TRAILING_PSEUDO_ELEMENT.search(css)
+    if match is None:
+        pseudo = None
+    elif match.group(2):
+        pseudo = ('attr', match.group(2).strip('\'"'))
+        css = css[:match.start()]
+    else:
+        pseudo = ('text', None)
+        css = css[:match.start()]
+    if '::' in css:
+        raise UnsupportedSelector(f"Pseudo-elements are only supported at the end of the selector: {css}")
+    return css, pseudo
+
+
+def sniff_encoding(content: bytes, encoding: Optional[str] = None) -> str:
+    """Encoding for an HTML body: the HTTP charset, a <meta> declaration or UTF-8"""
+    if encoding:
+        return encoding
+    from bs4.dammit import EncodingDetector
+    return EncodingDetector.find_declared_encoding(content, is_html=True) or 'utf-8'
+
+
+def _decode(content: bytes, encoding: str) -> str:
+    try:
+        return content.decode(encoding, errors='replace')
+    except LookupError:
+        return content.decode('utf-8', errors='replace')
+
+
+def _absolute_links(hrefs, base_url: str) -> List[str]:
+    links = []
+    for href in hrefs:
+        full_url = urljoin(base_url, href)
+        if urlparse(full_url).netloc:
+            links.append(full_url)
+    return links
+
+
+def _collect(values, select_all: bool, found: Dict[str, Any], key: str):
+    """Store the first value, or every value for ``all`` fields"""
+    if select_all:
+        found[key] = list(values)
+    else:
+        for value in values:
+            found[key] = value
+            break
+
+
+class _CompiledSelector(NamedTuple):
+    query: Any
+    pseudo: Any
+    all: bool
+
+
+class SoupDocument:
+    def __init__(self, soup: BeautifulSoup):
+        self.soup = soup
+
+    @classmethod
+    def parse(cls, content, encoding: Optional[str] = None) -> 'SoupDocument':
+        if isinstance(content, bytes) and encoding:
+            return cls(BeautifulSoup(content, 'html.parser', from_encoding=encoding))
+        return cls(BeautifulSoup(content, 'html.parser'))
+
+    def select_text(self, selector: str) -> Optional[str]:
+        return self.select_texts({'value': self.compile_selector(parse_field_spec(selector))}).get('value')
+
+    @staticmethod
+    def compile_selector(spec: FieldSpec) -> _CompiledSelector:
+        import soupsieve
+        if spec.kind == 'xpath':
+            raise UnsupportedSelector("XPath needs the lxml parser")
+        css, pseudo = split_pseudo_element(spec.query)
+        return _CompiledSelector(soupsieve.compile(css), pseudo, spec.all)
+
+    @staticmethod
+    def _values(elements, pseudo):
+        for element in elements:
+            if pseudo is None:
+                yield element.get_text(strip=True)
+            elif pseudo[0] == 'attr':
+                value = element.get(pseudo[1])
+                if value is not None:
+                    yield (' '.join(value) if isinstance(value, list) else value).strip()
+            else:
+                for child in element.children:
+                    if type(child) is NavigableString and child.strip():
+                        yield child.strip()
+
+    def select_texts(self, compiled: Dict[str, _CompiledSelector]) -> Dict[str, Any]:
+        found = {}
+        first_text = {}
+        for key, selector in compiled.items():
+            if selector.pseudo is None and not selector.all:
+                first_text[key] = selector.query
+            else:
+                _collect(self._values(selector.query.iselect(self.soup), selector.pseudo),
+                         selector.all, found, key)
+        found.update(self._first_texts(first_text))
+        return found
+
+    def _first_texts(self, compiled: Dict[str, Any]) -> Dict[str, str]:
+        """First match of every selector, found in a single walk of the tree"""
+        import soupsieve
+        if not compiled:
+            return {}
+
+        # Keys sharing a pattern share its first match
+        keys_by_pattern: Dict[str, List[str]] = {}
+        queries = {}
+        for key, query in compiled.items():
+            keys_by_pattern.setdefault(query.pattern, []).append(key)
+            queries[query.pattern] = query
+
+        # The union of all patterns yields their matches in document order,
+        # and only those elements are tested against each pattern.
+        # soupsieve.compile caches patterns, so later pages reuse the union.
+        union = soupsieve.compile(', '.join(queries))
+        found = {}
+        for element in union.iselect(self.soup):
+            for pattern, query in list(queries.items()):
+                if query.match(element):
+                    text = element.get_text(strip=True)
+                    for key in keys_by_pattern[pattern]:
+                        found[key] = text
+                    del queries[pattern]
+            if not queries:
+                break
+        return found
+
+    def links(self, base_url: str) -> List[str]:
+        return _absolute_links((a['href'] for a in self.soup.find_all('a', href=True)), base_url)
+
+
+class LxmlDocument:
+    def __init__(self, root):
+        self.root = root
+
+    @classmethod
+    def parse(cls, content, encoding: Optional[str] = None) -> 'LxmlDocument':
+        import lxml.etree
+        import lxml.html
+        parser = None
+        if isinstance(content, bytes):
+            # Without a hint libxml2 reads undeclared bodies as Latin-1
+            encoding = sniff_encoding(content, encoding)
+            try:
+                parser = lxml.html.HTMLParser(encoding=encoding)
+            except LookupError:
+                # A name libxml2 doesn't know (e.g. 'latin-1'); let Python decode
+                content = _decode(content, encoding)
+        try:
+            return cls(lxml.html.document_fromstring(content, parser=parser))
+        except lxml.etree.ParserError:
+            # Empty or whitespace-only body
+            return cls(lxml.html.document_fromstring('<html></html>'))
+
+    @staticmethod
+    def _text(element) -> str:
+        parts = []
+        stack = [(element, True)]
+        while stack:
+            node, is_root = stack.pop()
+            if not isinstance(node.tag, str):
+                # Comments and processing instructions: only their tail is text
+                if node.tail and not is_root:
+                    parts.append(node.tail.strip())
+                continue
+            if is_root or node.tag not in NON_TEXT_TAGS:
+                if node.text:
+                    parts.append(node.text.strip())
+                # Push the tail first so it is emitted after the children
+                if node.tail and not is_root:
+                    stack.append((_Tail(node.tail), False))
+                stack.extend((child, False) for child in reversed(node))
+            elif node.tail:
+                parts.append(node.tail.strip())
+        return ''.join(parts)
+
+    def select_text(self, selector: str) -> Optional[str]:
+        return self.select_texts({'value': self.compile_selector(parse_field_spec(selector))}).get('value')
+
+    @staticmethod
+    def compile_selector(spec: FieldSpec) -> _CompiledSelector:
+        import lxml.etree
+        import parsel  # noqa: F401 -- registers Parsel's XPath extension functions (has-class)
+        from parsel.csstranslator import HTMLTranslator
+
+        if spec.kind == 'xpath':
+            # Arbitrary XPath may not be a node-set, so it can't be limited to [1]
+            return _CompiledSelector(lxml.etree.XPath(spec.query, namespaces=XPATH_NAMESPACES), None, spec.all)
+
+        # Parsel's translator also understands ::text and ::attr(name)
+        xpath = HTMLTranslator().css_to_xpath(spec.query)
+        if not spec.all:
+            xpath = f"({xpath})[1]"
+        return _CompiledSelector(lxml.etree.XPath(xpath, namespaces=XPATH_NAMESPACES), None, spec.all)
+
+    def _values(self, result, select_all: bool):
+        if not isinstance(result, list):
+            # Scalar XPath results: string(), count(), boolean()
+            if isinstance(result, float) and result.is_integer():
+                result = int(result)
+            yield str(result).strip()
+            return
+        for item in result:
+            if isinstance(item, str):
+                value = item.strip()
+                # Whitespace-only text nodes are noise in lists
+                if value or not select_all:
+                    yield value
+            elif isinstance(item.tag, str):
+                yield self._text(item)
+
+    def select_texts(self, compiled: Dict[str, _CompiledSelector]) -> Dict[str, Any]:
+        found = {}
+        for key, selector in compiled.items():
+            _collect(self._values(selector.query(self.root), selector.all), selector.all, found, key)
+        return found
+
+    def links(self, base_url: str) -> List[str]:
+        hrefs = (a.get('href') for a in self.root.iter('a') if a.get('href') is not None)
+        return _absolute_links(hrefs, base_url)
+
+
+class _Tail:
+    """Stand-in node so an element's tail text is emitted after its children"""
+
+    tag = None
+
+    def __init__(self, text: str):
+        self.tail = text
+
+
+class SelectolaxDocument:
+    def __init__(self, tree):
+        self.tree = tree
+
+    @classmethod
+    def parse(cls, content, encoding: Optional[str] = None) -> 'SelectolaxDocument':
+        try:
+            from selectolax.lexbor import LexborHTMLParser
+        except ImportError as e:
+            raise ValueError("The selectolax parser requires the 'selectolax' package") from e
+        if isinstance(content, bytes):
+            # lexbor always reads bytes as UTF-8
+            content = _decode(content, sniff_encoding(content, encoding))
+        return cls(LexborHTMLParser(content))
+
+    @staticmethod
+    def _text(node) -> str:
+        parts = []
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if current.tag == '-text':
+                parts.append((current.text_content or '').strip())
+                continue
+            # Comments ('-comment' etc.) and non-text elements are skipped
+            children = [
+                child for child in current.iter(include_text=True)
+                if child.tag == '-text'
+                or (not child.tag.startswith('-') and child.tag not in NON_TEXT_TAGS)
+            ]
+            stack.extend(reversed(children))
+        return ''.join(parts)
+
+    def select_text(self, selector: str) -> Optional[str]:
+        return self.select_texts({'value': self.compile_selector(parse_field_spec(selector))}).get('value')
+
+    @staticmethod
+    def compile_selector(spec: FieldSpec) -> _CompiledSelector:
+        if spec.kind == 'xpath':
+            raise UnsupportedSelector("XPath needs the lxml parser")
+        # lexbor exposes no reusable compiled selector; it is parsed per query in C
+        css, pseudo = split_pseudo_element(spec.query)
+        return _CompiledSelector(css, pseudo, spec.all)
+
+    def _values(self, nodes, pseudo):
+        for node in nodes:
+            if pseudo is None:
+                yield self._text(node)
+            elif pseudo[0] == 'attr':
+                value = node.attributes.get(pseudo[1], False)
+                if value is not False:
+                    yield (value or '').strip()
+            else:
+                for child in node.iter(include_text=True):
+                    if child.tag == '-text' and (child.text_content or '').strip():
+                        yield child.text_content.strip()
+
+    def select_texts(self, compiled: Dict[str, _CompiledSelector]) -> Dict[str, Any]:
+        found = {}
+        for key, selector in compiled.items():
+            if selector.pseudo is None and not selector.all:
+                node = self.tree.css_first(selector.query)
+                if node is not None:
+                    found[key] = self._text(node)
+            else:
+                _collect(self._values(self.tree.css(selector.query), selector.pseudo),
+                         selector.all, found, key)
+        return found
+
+    def links(self, base_url: str) -> List[str]:
+        hrefs = (a.attributes.get('href') or '' for a in self.tree.css('a[href]'))
+        return _absolute_links(hrefs, base_url)
+
+
+_DOCUMENT_TYPES = {
+    'lxml': LxmlDocument,
+    'html.parser': SoupDocument,
+    'selectolax': SelectolaxDocument,
+}
+
+
+def parse_document(content, parser: Optional[str] = None, encoding: Optional[str] = None):
+    """Parse ``content`` (bytes or str) with the named backend.
+
+    ``encoding`` is the charset declared by the server, if any; it takes
+    precedence over one declared in the document.
+    """
+    parser = parser or DEFAULT_PARSER
+    try:
+        document_type = _DOCUMENT_TYPES[parser]
+    except KeyError:
+        raise ValueError(f"Unknown parser backend: {parser} (choose from {', '.join(PARSER_BACKENDS)})")
+    return document_type.parse(content, encoding)
+
+
+def as_document(document_or_soup):
+    """Accept either a parsed document or a BeautifulSoup object"""
+    if isinstance(document_or_soup, BeautifulSoup):
+        return SoupDocument(document_or_soup)
+    return document_or_soup
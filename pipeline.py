@@ -0,0 +1,132 @@
+"""
+Streaming crawl pipeline for the CLI.
+
+URLs are pulled lazily from an iterator, at most ``concurrency`` are in
+flight at a time, and every result is handed to the writer as soon as
+it completes. Memory use is bounded by the concurrency, not by the
+number of URLs.
+"""
+
+import asyncio
+from concurrent.futures import Executor
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from checkpoint import Checkpoint
+from stealth_crawler import StealthCrawler
+
+
+def iter_urls(file_path: str) -> Iterator[Tuple[int, str]]:
+    """Yield ``(index, url)`` for each URL in a file, one per line.
+
+    Blank lines and ``#`` comments are skipped and don't count towards
+    the index, which is what checkpoints record.
+    """
+    index = 0
+    with open(file_path, 'r') as f:
+        for line in f:
+            url = line.strip()
+            if url and not url.startswith('#'):
+                yield index, url
+                index += 1
+
+
+def new_stats() -> Dict[str, int]:
+    return {'processed': 0, 'successful': 0, 'skipped': 0, 'unchanged': 0, 'failed': 0}
+
+
+def is_output(result: Dict) -> bool:
+    """Whether ``result`` is written out; incremental runs drop unchanged pages"""
+    return result.get('status') != 'unchanged'
+
+
+def count_result(stats: Dict[str, int], result: Dict):
+    stats['processed'] += 1
+    status = result.get('status')
+    if status == 'success':
+        stats['successful'] += 1
+    elif status == 'skipped':
+        stats['skipped'] += 1
+    elif status == 'unchanged':
+        stats['unchanged'] += 1
+    else:
+        stats['failed'] += 1
+
+
+async def run_pipeline(crawler: StealthCrawler,
+                       urls: Iterable[Tuple[int, str]],
+                       selectors: Dict,
+                       writer,
+                       concurrency: int = 5,
+                       checkpoint: Optional[Checkpoint] = None,
+                       executor: Optional[Executor] = None,
+                       dedup: bool = False,
+                       stop_early: bool = False,
+                       on_result: Optional[Callable[[int, Dict], None]] = None) -> Dict[str, int]:
+    """Crawl ``urls`` and stream the results to ``writer``.
+
+    URLs already finished according to ``checkpoint`` are skipped, and
+    the checkpoint is advanced as results are written. The crawler's
+    held fingerprints are committed for the URLs each save covers.
+    """
+    stats = new_stats()
+    urls = iter(urls)
+    pending = set()
+    exhausted = False
+    # Finished since the last checkpoint save
+    finished = []
+
+    async def crawl(index: int, url: str) -> Tuple[int, str, Dict]:
+        try:
+            result = await crawler.async_crawl_url(
+                url, selectors, executor, dedup=dedup, stop_early=stop_early
+            )
+        except Exception as e:
+            result = {'url': url, 'error': str(e)}
+        return index, url, result
+
+    def save():
+        writer.flush()
+        checkpoint.save(writer.tell())
+        if crawler.fingerprints is not None:
+            crawler.fingerprints.commit(finished)
+        finished.clear()
+
+    try:
+        while True:
+            # Top up to the concurrency limit; the source is read only this far
+            while not exhausted and len(pending) < concurrency:
+                item = next(urls, None)
+                if item is None:
+                    exhausted = True
+                    break
+                index, url = item
+                if checkpoint is not None and checkpoint.is_done(index):
+                    continue
+                pending.add(asyncio.ensure_future(crawl(index, url)))
+
+            if not pending:
+                break
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index, url, result = task.result()
+                if is_output(result):
+                    writer.write(result)
+                count_result(stats, result)
+                if checkpoint is not None:
+                    checkpoint.mark_done(index)
+                    finished.append(url)
+                if on_result is not None:
+                    on_result(index, result)
+
+            if checkpoint is not None and checkpoint.due():
+                save()
+    finally:
+        # Interrupted: drop unfinished URLs, they are retried on resume
+        for task in pending:
+            task.cancel()
+        writer.flush()
+        if checkpoint is not None:
+            save()
+
+    return stats
@@ -0,0 +1,365 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_cache_key(url: str) -> str:
+    """Cache key for ``url``: lower-cased scheme/host, no default port or fragment"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    return urlunsplit((scheme, host, parts.path or '/', parts.query, ''))
+
+
+def _parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    directives = {}
+    for part in value.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, arg = part.partition('=')
+        directives[name.strip().lower()] = arg.strip().strip('"') or None
+    return directives
+
+
+def compute_freshness(headers: Dict[str, str], now: float,
+                      default_ttl: float = 0) -> Tuple[bool, Optional[float]]:
+    """Return ``(storable, expires_at)`` for a response with ``headers``.
+
+    Follows ``Cache-Control`` (``no-store``, ``no-cache``, ``max-age``)
+    and falls back to ``Expires``, then to ``default_ttl``. An
+    ``expires_at`` of ``None`` means the entry must be revalidated
+    before every use.
+    """
+    lowered = {k.lower(): v for k, v in headers.items()}
+    directives = _parse_cache_control(lowered.get('cache-control', ''))
+
+    if 'no-store' in directives or lowered.get('vary', '').strip() == '*':
+        return False, None
+    if 'no-cache' in directives:
+        return True, None
+
+    max_age = directives.get('max-age')
+    if max_age is not None:
+        try:
+            age = float(lowered.get('age', 0) or 0)
+            return True, now + float(max_age) - age
+        except ValueError:
+            return True, None
+
+    expires = lowered.get('expires')
+    if expires:
+        try:
+            return True, parsedate_to_datetime(expires).timestamp()
+        except (TypeError, ValueError):
+            return True, None
+
+    if default_ttl > 0:
+        return True, now + default_ttl
+    return True, None
+
+
+class CacheEntry:
+    def __init__(self,
+                 url: str,
+                 status: int,
+                 headers: Dict[str, str],
+                 body: bytes,
+                 stored_at: float,
+                 expires_at: Optional[float]):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+
+    def _header(self, name: str) -> Optional[str]:
+        for key, value in self.headers.items():
+            if key.lower() == name:
+                return value
+        return None
+
+    @property
+    def etag(self) -> Optional[str]:
+        return self._header('etag')
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        return self._header('last-modified')
+
+    @property
+    def size(self) -> int:
+        return len(self.body)
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return self.expires_at is not None and now < self.expires_at
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Validators to send when revalidating this entry"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        elif self.etag is None:
+            headers['If-Modified-Since'] = formatdate(self.stored_at, usegmt=True)
+        return headers
+
+    def to_metadata(self) -> Dict:
+        return {
+            'url': self.url,
+            'status': self.status,
+            'headers': self.headers,
+            'stored_at': self.stored_at,
+            'expires_at': self.expires_at
+        }
+
+    @classmethod
+    def from_metadata(cls, metadata: Dict, body: bytes) -> 'CacheEntry':
+        return cls(
+            url=metadata['url'],
+            status=metadata['status'],
+            headers=metadata['headers'],
+            body=body,
+            stored_at=metadata['stored_at'],
+            expires_at=metadata['expires_at']
+        )
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache bounded by total body bytes"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CacheEntry):
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry.size
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions
+            }
+
+
+class DiskCacheBackend:
+    """On-disk cache, one file per URL, shared across runs.
+
+    Each file holds a JSON metadata line followed by the raw body.
+    When ``max_bytes`` is set the least recently written files are
+    removed once the directory grows past it.
+    """
+
+    def __init__(self, directory: str, max_bytes: Optional[int] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._bytes = sum(size for _, _, size in self._scan())
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f"{digest}.cache")
+
+    def _scan(self):
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith('.cache'):
+                stat = entry.stat()
+                yield entry.path, stat.st_mtime, stat.st_size
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        try:
+            with open(self._path(key), 'rb') as f:
+                metadata = json.loads(f.readline())
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        return CacheEntry.from_metadata(metadata, body)
+
+    def set(self, key: str, entry: CacheEntry):
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(json.dumps(entry.to_metadata()).encode('utf-8') + b'\n')
+                f.write(entry.body)
+            new_size = os.path.getsize(tmp_path)
+            with self._lock:
+                old_size = os.path.getsize(path) if os.path.exists(path) else 0
+                os.replace(tmp_path, path)
+                self._bytes += new_size - old_size
+                if self.max_bytes is not None and self._bytes > self.max_bytes:
+                    self._evict()
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _evict(self):
+        for path, _, size in sorted(self._scan(), key=lambda item: item[1]):
+            if self._bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._bytes -= size
+            self.evictions += 1
+
+    def delete(self, key: str):
+        path = self._path(key)
+        with self._lock:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                self._bytes -= size
+            except OSError:
+                pass
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'backend': 'disk',
+                'directory': self.directory,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions
+            }
+
+
+class ResponseCache:
+    """HTTP response cache in front of StealthCrawler's fetches.
+
+    Fresh entries (per ``Cache-Control``/``Expires``) are served without
+    a request; stale ones are revalidated with ``If-None-Match`` /
+    ``If-Modified-Since`` and reused on ``304 Not Modified``.
+    """
+
+    def __init__(self, backend=None, default_ttl: float = 0):
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.not_modified = 0
+        self.stores = 0
+        self.bytes_served = 0
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        """Return the cached entry for ``url``, fresh or stale"""
+        entry = self.backend.get(normalize_cache_key(url))
+        if entry is None:
+            self._count(misses=1)
+        elif entry.is_fresh():
+            self._count(hits=1, bytes_served=entry.size)
+        else:
+            self._count(revalidations=1)
+        return entry
+
+    def store(self, url: str, status: int, headers: Dict[str, str], body: bytes) -> Optional[CacheEntry]:
+        if status != 200:
+            return None
+        now = time.time()
+        storable, expires_at = compute_freshness(headers, now, self.default_ttl)
+        if not storable:
+            return None
+        entry = CacheEntry(url, status, dict(headers), body, now, expires_at)
+        if expires_at is None and entry.etag is None and entry.last_modified is None:
+            # Neither fresh nor revalidatable: caching it would never pay off
+            return None
+        self.backend.set(normalize_cache_key(url), entry)
+        self._count(stores=1)
+        return entry
+
+    def revalidated(self, url: str, entry: CacheEntry, headers: Dict[str, str]) -> CacheEntry:
+        """Refresh ``entry`` after a ``304 Not Modified`` carrying ``headers``"""
+        updated = {key.lower() for key in headers}
+        merged = {k: v for k, v in entry.headers.items() if k.lower() not in updated}
+        merged.update(headers)
+        now = time.time()
+        _, expires_at = compute_freshness(merged, now, self.default_ttl)
+        refreshed = CacheEntry(entry.url, entry.status, merged, entry.body, now, expires_at)
+        self.backend.set(normalize_cache_key(url), refreshed)
+        self._count(not_modified=1, bytes_served=entry.size)
+        return refreshed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = {
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidations': self.revalidations,
+                'not_modified': self.not_modified,
+                'stores': self.stores,
+                'bytes_served': self.bytes_served
+            }
+        counters.update(self.backend.stats())
+        return counters
+
+
+def create_response_cache(backend: str = 'memory',
+                          max_bytes: Optional[int] = 64 * 1024 * 1024,
+                          directory: Optional[str] = None,
+                          default_ttl: float = 0) -> Optional[ResponseCache]:
+    """Build a ResponseCache for ``backend`` ('memory', 'disk' or 'off')"""
+    if backend == 'off':
+        return None
+    if backend == 'memory':
+        return ResponseCache(MemoryCacheBackend(max_bytes), default_ttl=default_ttl)
+    if backend == 'disk':
+        if not directory:
+            raise ValueError("Disk cache requires a directory")
+        return ResponseCache(DiskCacheBackend(directory, max_bytes), default_ttl=default_ttl)
+    raise ValueError(f"Unknown response cache backend: {backend}")
@@ -0,0 +1,99 @@
+import asyncio
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class ResultMapFull(RuntimeError):
+    """Too many requests are waiting for a result"""
+
+
+class ResultMap:
+    """Bounded map of futures awaiting results from a background crawler.
+
+    ``create`` registers a future for a key and raises ResultMapFull once
+    ``max_size`` are pending. The crawler's handlers settle futures with
+    ``resolve`` or ``fail``; keys nobody waits for any more are ignored.
+    Entries older than ``max_age`` seconds are failed with TimeoutError
+    and dropped by ``sweep``, so a request the crawler never reports on
+    can't leak. Event-loop only, not thread-safe.
+    """
+
+    def __init__(self, max_size: int = 1000, max_age: float = 300.0):
+        self.max_size = max_size
+        self.max_age = max_age
+        self._entries: Dict[Hashable, Tuple[float, asyncio.Future]] = {}
+        self.created = 0
+        self.resolved = 0
+        self.failed = 0
+        self.swept = 0
+        self.rejected = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def create(self, key: Hashable) -> asyncio.Future:
+        if len(self._entries) >= self.max_size:
+            self.sweep()
+        if len(self._entries) >= self.max_size:
+            self.rejected += 1
+            raise ResultMapFull(f"{len(self._entries)} requests are already waiting for results")
+        future = asyncio.get_running_loop().create_future()
+        self._entries[key] = (time.monotonic(), future)
+        self.created += 1
+        return future
+
+    def _pending(self, key: Hashable) -> Optional[asyncio.Future]:
+        entry = self._entries.get(key)
+        if entry is None or entry[1].done():
+            return None
+        return entry[1]
+
+    def resolve(self, key: Hashable, result: Any) -> bool:
+        """Set the result for ``key``; False if nobody is waiting for it"""
+        future = self._pending(key)
+        if future is None:
+            return False
+        future.set_result(result)
+        self.resolved += 1
+        return True
+
+    def fail(self, key: Hashable, error: BaseException) -> bool:
+        """Raise ``error`` in whoever waits for ``key``"""
+        future = self._pending(key)
+        if future is None:
+            return False
+        future.set_exception(error)
+        self.failed += 1
+        return True
+
+    def discard(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry[1].done() and not entry[1].cancelled():
+            # Settled after its waiter gave up; don't log "exception never retrieved"
+            entry[1].exception()
+
+    def sweep(self) -> int:
+        """Fail and drop entries older than ``max_age``; returns how many"""
+        cutoff = time.monotonic() - self.max_age
+        stale = [key for key, (created, _) in self._entries.items() if created < cutoff]
+        for key in stale:
+            self.fail(key, asyncio.TimeoutError(f"No result within {self.max_age:g}s"))
+            self.discard(key)
+        self.swept += len(stale)
+        return len(stale)
+
+    async def sweep_periodically(self, interval: float = 30.0):
+        while True:
+            await asyncio.sleep(interval)
+            self.sweep()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'pending': len(self._entries),
+            'max_size': self.max_size,
+            'created': self.created,
+            'resolved': self.resolved,
+            'failed': self.failed,
+            'swept': self.swept,
+            'rejected': self.rejected
+        }
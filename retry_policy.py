@@ -0,0 +1,214 @@
+"""
+Retry decisions for fetches.
+
+Failures are classified first: connection failures, timeouts, 429 and
+most 5xx responses are worth another attempt; other 4xx responses are
+not. Delays follow "decorrelated jitter" (each delay is drawn between
+the base delay and three times the previous one, capped), a server's
+``Retry-After`` is honoured, and no retry is started that would end
+past the request's overall deadline.
+
+A RetryBudget shared by all requests caps retries at a fraction of
+recent requests, so an outage doesn't turn into a retry storm.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Dict, Mapping, Optional
+
+import aiohttp
+import requests
+
+# Failure kinds
+CONNECT = 'connect'
+CONNECT_TIMEOUT = 'connect_timeout'
+READ_TIMEOUT = 'read_timeout'
+READ = 'read'
+THROTTLED = 'throttled'
+CLIENT_ERROR = 'client_error'
+SERVER_ERROR = 'server_error'
+OTHER = 'other'
+
+RETRYABLE_KINDS = frozenset({CONNECT, CONNECT_TIMEOUT, READ_TIMEOUT, READ, THROTTLED, SERVER_ERROR})
+
+
+def classify(error: BaseException, status: Optional[int] = None) -> str:
+    """The failure kind of a requests or aiohttp exception"""
+    if status is not None:
+        if status == 429:
+            return THROTTLED
+        if status == 408:
+            return READ_TIMEOUT
+        if 400 <= status < 500:
+            return CLIENT_ERROR
+        if status >= 500:
+            return SERVER_ERROR
+    if isinstance(error, (requests.exceptions.ConnectTimeout, aiohttp.ConnectionTimeoutError)):
+        return CONNECT_TIMEOUT
+    if isinstance(error, (requests.exceptions.Timeout, asyncio.TimeoutError)):
+        return READ_TIMEOUT
+    if isinstance(error, (requests.exceptions.ChunkedEncodingError, aiohttp.ServerDisconnectedError,
+                          aiohttp.ClientPayloadError)):
+        return READ
+    if isinstance(error, (requests.exceptions.ConnectionError, aiohttp.ClientConnectionError)):
+        return CONNECT
+    return OTHER
+
+
+def retry_after_seconds(headers: Optional[Mapping[str, str]], now: Optional[float] = None) -> Optional[float]:
+    """Seconds asked for by a ``Retry-After`` header (delta or HTTP date)"""
+    value = headers.get('Retry-After') if headers is not None else None
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at - (time.time() if now is None else now))
+
+
+class RetryBudget:
+    """Allow retries up to ``ratio`` of the requests made in the last ``window`` seconds.
+
+    ``min_per_second`` keeps a trickle of retries available when there
+    is little traffic. Thread-safe; share one budget across requests.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, window: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window = window
+        self._lock = threading.Lock()
+        self._requests = deque()
+        self._retries = deque()
+        self.exhausted = 0
+
+    def _expire(self, now: float):
+        cutoff = now - self.window
+        for events in (self._requests, self._retries):
+            while events and events[0] < cutoff:
+                events.popleft()
+
+    def record_request(self):
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            self._requests.append(now)
+
+    def try_retry(self) -> bool:
+        """Take a retry from the budget; False when it is used up"""
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            allowed = self.min_per_second * self.window + self.ratio * len(self._requests)
+            if len(self._retries) >= allowed:
+                self.exhausted += 1
+                return False
+            self._retries.append(now)
+            return True
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                'requests': len(self._requests),
+                'retries': len(self._retries),
+                'ratio': self.ratio,
+                'exhausted': self.exhausted
+            }
+
+
+class RetryPolicy:
+    """How often, how soon and for how long a fetch is retried.
+
+    ``max_attempts`` counts the first try. ``deadline`` bounds all
+    attempts and delays of one fetch, in seconds (None: no bound).
+    A ``Retry-After`` longer than ``max_retry_after`` ends the retries.
+    """
+
+    def __init__(self,
+                 max_attempts: int = 3,
+                 base_delay: float = 0.5,
+                 max_delay: float = 30.0,
+                 deadline: Optional[float] = None,
+                 max_retry_after: float = 60.0,
+                 budget: Optional[RetryBudget] = None):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.max_retry_after = max_retry_after
+        self.budget = budget
+
+    def begin(self) -> 'RetryState':
+        if self.budget is not None:
+            self.budget.record_request()
+        return RetryState(self)
+
+    def backoff(self, previous: float) -> float:
+        """Decorrelated jitter: uniform between the base and 3x the previous delay"""
+        return min(self.max_delay, random.uniform(self.base_delay, max(previous, self.base_delay) * 3))
+
+    def stats(self) -> Dict:
+        return {
+            'max_attempts': self.max_attempts,
+            'base_delay': self.base_delay,
+            'max_delay': self.max_delay,
+            'deadline': self.deadline,
+            'budget': self.budget.stats() if self.budget is not None else None
+        }
+
+
+class RetryState:
+    """Retry bookkeeping for one fetch"""
+
+    def __init__(self, policy: RetryPolicy):
+        self.policy = policy
+        self.attempt = 0
+        self.started = time.monotonic()
+        self.deadline = self.started + policy.deadline if policy.deadline else None
+        self.kind: Optional[str] = None
+        # Why retrying stopped: not_retryable, attempts, deadline, retry_after or budget
+        self.gave_up: Optional[str] = None
+        self._delay = policy.base_delay
+
+    def timeout(self, default: float) -> float:
+        """Timeout for the next attempt, never past the deadline"""
+        if self.deadline is None:
+            return default
+        return max(0.001, min(default, self.deadline - time.monotonic()))
+
+    def next_delay(self, error: BaseException, status: Optional[int] = None,
+                   headers: Optional[Mapping[str, str]] = None) -> Optional[float]:
+        """Seconds to wait before retrying after ``error``, or None to give up"""
+        self.attempt += 1
+        self.kind = classify(error, status)
+        if self.kind not in RETRYABLE_KINDS:
+            self.gave_up = 'not_retryable'
+            return None
+        if self.attempt >= self.policy.max_attempts:
+            self.gave_up = 'attempts'
+            return None
+
+        self._delay = delay = self.policy.backoff(self._delay)
+        retry_after = retry_after_seconds(headers)
+        if retry_after is not None:
+            if retry_after > self.policy.max_retry_after:
+                self.gave_up = 'retry_after'
+                return None
+            delay = max(delay, retry_after)
+        if self.deadline is not None and time.monotonic() + delay >= self.deadline:
+            self.gave_up = 'deadline'
+            return None
+        # Last, so a retry that wouldn't happen anyway doesn't use up budget
+        if self.policy.budget is not None and not self.policy.budget.try_retry():
+            self.gave_up = 'budget'
+            return None
+        return delay
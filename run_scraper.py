@@ -32,7 +32,8 @@ def quick_scrape(url: str, output_file: str = None):
     crawler = StealthCrawler(
         delay_range=tuple(crawler_settings.get('delay_range', [2, 5])),
         max_retries=crawler_settings.get('max_retries', 3),
-        timeout=crawler_settings.get('timeout', 30)
+        timeout=crawler_settings.get('timeout', 30),
+        parser=crawler_settings.get('parser', 'lxml')
     )
     
     try:
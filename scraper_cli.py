@@ -5,77 +5,38 @@ A professional stealth web scraper with BeautifulSoup
 """
 
 import argparse
+import asyncio
+import itertools
 import json
-import csv
 import logging
+import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 from typing import List, Dict, Any
 from urllib.parse import urlparse
 
+import logging_setup
+from checkpoint import Checkpoint
+from fingerprints import FingerprintStore
+from health import HealthTracker
+from output_writers import APPENDABLE_FORMATS, DEFAULT_BATCH_SIZE, OUTPUT_FORMATS, csv_fieldnames, open_writer
+from parsers import DEFAULT_PARSER, PARSER_BACKENDS
+from pipeline import iter_urls, run_pipeline
+from response_cache import create_response_cache
+from retry_policy import RetryBudget, RetryPolicy
+from site_crawl import CrawlScope, run_site_crawl
 from stealth_crawler import StealthCrawler
+from workers import SHARD_MODES, run_sharded
 
 
-def setup_logging(verbose: bool = False):
-    """Setup logging configuration"""
-    level = logging.DEBUG if verbose else logging.INFO
-    logging.basicConfig(
-        level=level,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler('scraper.log')
-        ]
-    )
-
-
-def load_urls_from_file(file_path: str) -> List[str]:
-    """Load URLs from a text file (one URL per line)"""
-    try:
-        with open(file_path, 'r') as f:
-            urls = [line.strip() for line in f if line.strip() and not line.startswith('#')]
-        return urls
-    except FileNotFoundError:
-        logging.error(f"File not found: {file_path}")
-        return []
-
-
-def save_results_json(results: List[Dict], output_file: str):
-    """Save results to JSON file"""
-    try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
-        logging.info(f"Results saved to {output_file}")
-    except Exception as e:
-        logging.error(f"Error saving JSON: {e}")
-
-
-def save_results_csv(results: List[Dict], output_file: str):
-    """Save results to CSV file"""
-    if not results:
-        logging.warning("No results to save")
-        return
-    
-    try:
-        with open(output_file, 'w', newline='', encoding='utf-8') as f:
-            if results and 'data' in results[0]:
-                # Flatten the data structure for CSV
-                flattened_results = []
-                for result in results:
-                    flat_result = {'url': result['url'], 'status': result.get('status', 'unknown')}
-                    if 'data' in result:
-                        flat_result.update(result['data'])
-                    flattened_results.append(flat_result)
-                
-                if flattened_results:
-                    fieldnames = flattened_results[0].keys()
-                    writer = csv.DictWriter(f, fieldnames=fieldnames)
-                    writer.writeheader()
-                    writer.writerows(flattened_results)
-        
-        logging.info(f"Results saved to {output_file}")
-    except Exception as e:
-        logging.error(f"Error saving CSV: {e}")
+def setup_logging(verbose: bool = False, config_path: str = 'config.json'):
+    """Setup logging from the config file's ``logging`` section"""
+    # The CLI also logs to scraper.log unless the config names another file
+    config = {'file': 'scraper.log'}
+    config.update(logging_setup.load_logging_config(config_path))
+    logging_setup.setup_logging(config, verbose)
 
 
 def validate_url(url: str) -> bool:
@@ -91,8 +52,8 @@ def create_default_selectors() -> Dict[str, str]:
     """Create default CSS selectors for common data extraction"""
     return {
         'title': 'title',
-        'description': 'meta[name="description"]',
-        'keywords': 'meta[name="keywords"]',
+        'description': 'meta[name="description"]::attr(content)',
+        'keywords': 'meta[name="keywords"]::attr(content)',
         'h1': 'h1',
         'h2': 'h2',
         'links_count': 'a[href]',
@@ -100,6 +61,120 @@ def create_default_selectors() -> Dict[str, str]:
     }
 
 
+def create_crawler(args: argparse.Namespace) -> StealthCrawler:
+    """Build a crawler from CLI options (called once per worker process too)"""
+    delay_range = (0, 0) if args.no_delay else tuple(args.delay)
+    proxy_list = args.proxy if args.proxy else []
+    
+    return StealthCrawler(
+        delay_range=delay_range,
+        max_retries=args.retries,
+        timeout=args.timeout,
+        retry_policy=RetryPolicy(
+            max_attempts=args.retries,
+            max_delay=args.retry_max_delay,
+            max_retry_after=args.retry_max_delay,
+            deadline=args.retry_deadline or None,
+            budget=RetryBudget()
+        ),
+        host_health=HealthTracker(
+            failure_threshold=args.breaker_failures,
+            cooldown=args.breaker_cooldown
+        ),
+        use_proxies=bool(proxy_list),
+        proxy_list=proxy_list,
+        connector_limit=max(args.concurrency, 10),
+        visited_mode=args.visited_mode,
+        visited_capacity=args.visited_capacity,
+        visited_ttl=None,
+        visited_false_positive_rate=args.visited_fp_rate,
+        cache=create_response_cache(
+            backend='disk' if args.cache_dir else 'memory',
+            directory=args.cache_dir,
+            max_bytes=None if args.cache_dir else 64 * 1024 * 1024,
+            default_ttl=args.cache_ttl
+        ),
+        parser=args.parser,
+        max_bytes=args.max_bytes or None,
+        # A resumable run commits fingerprints only with the checkpoint
+        fingerprints=(FingerprintStore(args.incremental, deferred=bool(args.checkpoint))
+                      if args.incremental else None)
+    )
+
+
+def log_crawl_result(max_bytes: int, index: int, result: Dict):
+    url = result['url']
+    status = result.get('status', 'error')
+    # One record per URL: lazy %-formatting, sampled as "crawl.result"
+    extra = {'event': 'crawl.result', 'url': url, 'index': index, 'status': status}
+    if status == 'success':
+        logging.info("✓ Successfully scraped #%d: %s", index + 1, url, extra=extra)
+        if result.get('truncated'):
+            logging.warning("  Response cut at %d bytes: %s", max_bytes, url,
+                            extra=dict(extra, event='crawl.truncated'))
+    elif status == 'skipped':
+        logging.info("- Skipped duplicate #%d: %s", index + 1, url, extra=extra)
+    elif status == 'unchanged':
+        logging.info("= Unchanged #%d: %s", index + 1, url, extra=extra)
+    else:
+        logging.warning("✗ Failed to scrape #%d: %s", index + 1, url,
+                        extra=dict(extra, error=result.get('error')))
+
+
+def log_summary(stats: Dict[str, int], output: str = None):
+    logging.info(f"Scraping completed: {stats['successful']}/{stats['processed']} successful"
+                 + (f", {stats['unchanged']} unchanged" if stats['unchanged'] else '')
+                 + (f", {stats['skipped']} skipped" if stats['skipped'] else ''))
+    if output:
+        logging.info(f"Results saved to {output}")
+
+
+def run_workers(args: argparse.Namespace, selectors: Dict, writer, checkpoint):
+    """Crawl ``args.file`` with ``args.workers`` processes, merging into ``writer``"""
+    try:
+        logging.info(f"Starting to scrape with {args.workers} workers "
+                     f"(concurrency {args.concurrency} each, sharded by {args.shard_by})...")
+        
+        stats, summaries = run_sharded(
+            args.file,
+            args.workers,
+            partial(create_crawler, args),
+            selectors,
+            writer,
+            checkpoint=checkpoint,
+            concurrency=args.concurrency,
+            dedup=args.dedup,
+            stop_early=args.stop_early,
+            shard_by=args.shard_by,
+            on_result=partial(log_crawl_result, args.max_bytes)
+        )
+        
+        # Summary
+        cache_totals = {}
+        for summary in summaries:
+            if 'error' in summary:
+                logging.error(f"Worker {summary['worker']} failed: {summary['error']}")
+                continue
+            worker_stats = summary['stats']
+            logging.info(f"Worker {summary['worker']}: {worker_stats['successful']}/"
+                         f"{worker_stats['processed']} successful")
+            for key, value in summary.get('cache', {}).items():
+                if isinstance(value, int) and key != 'max_bytes':
+                    cache_totals[key] = cache_totals.get(key, 0) + value
+        log_summary(stats, args.output)
+        if cache_totals:
+            logging.info(f"Response cache (all workers): {cache_totals}")
+        
+    except KeyboardInterrupt:
+        logging.info("Scraping interrupted by user"
+                     + (f"; rerun with --checkpoint {args.checkpoint} to resume" if checkpoint else ''))
+    except Exception as e:
+        logging.error(f"Unexpected error: {e}")
+        sys.exit(1)
+    finally:
+        writer.close()
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Professional Stealth Web Scraper",
@@ -110,6 +185,10 @@ Examples:
   %(prog)s -f urls.txt -o results.json
   %(prog)s -u https://example.com --delay 2 5 --retries 5
   %(prog)s -f urls.txt -o results.csv --format csv --verbose
+  %(prog)s -f urls.txt -o results.jsonl --format jsonl --concurrency 20 --checkpoint run.ckpt
+  %(prog)s -f urls.txt -o results.jsonl --format jsonl --workers 8
+  %(prog)s -f urls.txt -o results.parquet --format parquet --batch-size 50000
+  %(prog)s -u https://example.com --crawl --max-depth 3 --max-pages 500 --exclude '/tag/'
         """
     )
     
@@ -120,8 +199,13 @@ Examples:
     
     # Output options
     parser.add_argument('-o', '--output', help='Output file path')
-    parser.add_argument('--format', choices=['json', 'csv'], default='json',
-                       help='Output format (default: json)')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='json',
+                       help='Output format; parquet and arrow need pyarrow (default: json)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                       help=f'Rows per row group for parquet and arrow output (default: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--checkpoint',
+                       help='Progress file; rerunning with it resumes where the last run stopped '
+                            '(jsonl or csv output only)')
     
     # Crawler options
     parser.add_argument('--delay', nargs=2, type=float, default=[1, 3],
@@ -130,37 +214,134 @@ Examples:
                        help='Max retries per URL (default: 3)')
     parser.add_argument('--timeout', type=int, default=30,
                        help='Request timeout in seconds (default: 30)')
+    parser.add_argument('--retry-deadline', type=float, default=0,
+                       help='Give up on a URL after this many seconds of attempts and '
+                            'back-off (default: 0, no limit)')
+    parser.add_argument('--breaker-failures', type=int, default=5,
+                       help='Failures in a row after which a host is skipped for a while '
+                            '(default: 5)')
+    parser.add_argument('--breaker-cooldown', type=float, default=30,
+                       help='Seconds before a skipped host is tried again (default: 30)')
+    parser.add_argument('--retry-max-delay', type=float, default=30,
+                       help='Longest back-off between attempts in seconds, also the '
+                            'longest Retry-After honoured (default: 30)')
+    parser.add_argument('--concurrency', type=int, default=5,
+                       help='URLs crawled at the same time; requests to one host '
+                            'still respect --delay (default: 5)')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Processes to crawl a URL file with, each with its own '
+                            'crawler and --concurrency (default: 1)')
+    parser.add_argument('--shard-by', choices=SHARD_MODES, default='host',
+                       help='How URLs are split between workers; host keeps per-host '
+                            'delays and --dedup exact across workers (default: host)')
     
     # Proxy options
     parser.add_argument('--proxy', action='append',
                        help='Proxy server (can be used multiple times)')
     
     # Custom selectors
-    parser.add_argument('--selectors', help='JSON file with custom CSS selectors')
+    parser.add_argument('--selectors', help='JSON file with custom CSS/XPath selectors')
+    parser.add_argument('--parser', choices=PARSER_BACKENDS, default=DEFAULT_PARSER,
+                       help=f'HTML parser backend (default: {DEFAULT_PARSER})')
     
     # Other options
     parser.add_argument('--verbose', '-v', action='store_true',
                        help='Verbose logging')
+    parser.add_argument('--config', default='config.json',
+                       help='Config file whose "logging" section sets log levels, format, '
+                            'outputs and sampling (default: config.json)')
     parser.add_argument('--no-delay', action='store_true',
                        help='Disable random delays (not recommended)')
+    parser.add_argument('--dedup', action='store_true',
+                       help='Skip URLs that were already scraped in this run')
+    parser.add_argument('--visited-mode', choices=['lru', 'bloom'], default='lru',
+                       help='Seen-URL store used by --dedup; bloom is approximate '
+                            'but uses fixed memory for very large runs (default: lru)')
+    parser.add_argument('--visited-capacity', type=int, default=1000000,
+                       help='URLs remembered by --dedup (default: 1000000)')
+    parser.add_argument('--visited-fp-rate', type=float, default=0.001,
+                       help='False-positive rate of --visited-mode bloom: the share of new '
+                            'URLs wrongly skipped as seen (default: 0.001)')
+    parser.add_argument('--max-bytes', type=int, default=10 * 1024 * 1024,
+                       help='Stop reading a response after this many bytes; 0 for no limit (default: 10 MiB)')
+    parser.add_argument('--stop-early', action='store_true',
+                       help='Stop downloading at </head> when every selector targets the head')
+    
+    # Site crawl options
+    parser.add_argument('--crawl', action='store_true',
+                       help='Follow links from the given URLs, breadth first, within --max-depth, '
+                            '--max-pages and the domain/pattern rules')
+    parser.add_argument('--max-depth', type=int, default=2,
+                       help='Link depth followed by --crawl; the given URLs are depth 0 (default: 2)')
+    parser.add_argument('--max-pages', type=int, default=100,
+                       help='Pages fetched by --crawl (default: 100)')
+    parser.add_argument('--allow-domain', action='append',
+                       help='Domain (with subdomains) --crawl may enter; can be used multiple '
+                            'times (default: the hosts of the given URLs)')
+    parser.add_argument('--include', action='append',
+                       help='Regex a URL must match to be crawled; can be used multiple times')
+    parser.add_argument('--exclude', action='append',
+                       help='Regex of URLs not to crawl; can be used multiple times')
+    parser.add_argument('--per-host', type=int, default=2,
+                       help='Pages fetched at the same time per host by --crawl (default: 2)')
+    
+    # Incremental options
+    parser.add_argument('--incremental', metavar='DB',
+                       help='SQLite file of per-URL fingerprints; pages unchanged since the '
+                            'previous run with the same file are not parsed or written')
+    
+    # Cache options
+    parser.add_argument('--cache-dir',
+                       help='Directory for an on-disk HTTP response cache shared across runs')
+    parser.add_argument('--cache-ttl', type=float, default=0,
+                       help='Seconds to treat responses without cache headers as fresh (default: 0)')
     
     args = parser.parse_args()
     
     # Setup logging
-    setup_logging(args.verbose)
+    try:
+        setup_logging(args.verbose, args.config)
+    except (OSError, ValueError) as e:
+        parser.error(f"Bad logging config: {e}")
     
-    # Prepare URLs
-    urls = []
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if not 0 < args.visited_fp_rate < 1:
+        parser.error("--visited-fp-rate must be between 0 and 1")
+    if args.checkpoint and args.format not in APPENDABLE_FORMATS:
+        parser.error("--checkpoint needs --format jsonl or csv")
+    if args.checkpoint and not args.output:
+        parser.error("--checkpoint needs --output")
+    if args.crawl and (args.workers > 1 or args.checkpoint):
+        parser.error("--crawl can't be combined with --workers or --checkpoint")
+    if args.incremental and args.checkpoint and args.workers > 1:
+        # Workers would store fingerprints ahead of the parent's checkpoint
+        parser.error("--incremental with --checkpoint can't be combined with --workers")
+    if args.crawl and args.incremental:
+        # Unchanged pages aren't parsed, so their links couldn't be followed
+        parser.error("--crawl can't be combined with --incremental")
+    if args.crawl and (args.max_pages < 1 or args.per_host < 1):
+        parser.error("--max-pages and --per-host must be at least 1")
+    
+    # Prepare URLs; a file is read lazily as the crawl advances
     if args.url:
         if not validate_url(args.url):
             logging.error(f"Invalid URL: {args.url}")
             sys.exit(1)
-        urls = [args.url]
-    elif args.file:
-        urls = load_urls_from_file(args.file)
-        if not urls:
+        urls = iter([(0, args.url)])
+    else:
+        try:
+            urls = iter_urls(args.file)
+            first = next(urls, None)
+        except FileNotFoundError:
+            logging.error(f"File not found: {args.file}")
+            sys.exit(1)
+        if first is None:
             logging.error("No valid URLs found")
             sys.exit(1)
+        urls = itertools.chain([first], urls)
     
     # Load custom selectors if provided
     selectors = create_default_selectors()
@@ -173,56 +354,96 @@ Examples:
             logging.error(f"Error loading selectors: {e}")
             sys.exit(1)
     
+    checkpoint = None
+    if args.checkpoint:
+        try:
+            checkpoint = Checkpoint(args.checkpoint, source=args.file or args.url)
+        except ValueError as e:
+            logging.error(str(e))
+            sys.exit(1)
+        if checkpoint.resumed:
+            logging.info(f"Resuming from {args.checkpoint}: {checkpoint.completed} URLs already done")
+    
+    try:
+        writer = open_writer(
+            args.format,
+            args.output,
+            fieldnames=csv_fieldnames(selectors),
+            append=checkpoint is not None and checkpoint.resumed,
+            truncate_to=checkpoint.output_bytes if checkpoint is not None else None,
+            selectors=selectors,
+            batch_size=args.batch_size
+        )
+    except (OSError, ValueError) as e:
+        logging.error(str(e))
+        sys.exit(1)
+    
+    if args.workers > 1 and args.file:
+        run_workers(args, selectors, writer, checkpoint)
+        return
+    
+    scope = None
+    if args.crawl:
+        urls = [url for _, url in urls]
+        try:
+            scope = CrawlScope(urls, max_depth=args.max_depth, allowed_domains=args.allow_domain,
+                               include=args.include, exclude=args.exclude)
+        except re.error as e:
+            writer.close()
+            parser.error(f"Bad --include/--exclude pattern: {e}")
+    
     # Setup crawler
-    delay_range = (0, 0) if args.no_delay else tuple(args.delay)
-    proxy_list = args.proxy if args.proxy else []
+    crawler = create_crawler(args)
+    # Parsing is CPU-bound and runs off the event loop
+    executor = ThreadPoolExecutor(max_workers=min(args.concurrency, 8))
     
-    crawler = StealthCrawler(
-        delay_range=delay_range,
-        max_retries=args.retries,
-        timeout=args.timeout,
-        use_proxies=bool(proxy_list),
-        proxy_list=proxy_list
-    )
+    log_result = partial(log_crawl_result, args.max_bytes)
+    
+    async def crawl() -> Dict[str, int]:
+        try:
+            if scope is not None:
+                return await run_site_crawl(
+                    crawler, urls, selectors, writer, scope,
+                    on_result=log_result,
+                    max_pages=args.max_pages,
+                    concurrency=args.concurrency,
+                    per_host=args.per_host,
+                    executor=executor,
+                    max_bytes=args.max_bytes or None
+                )
+            return await run_pipeline(
+                crawler, urls, selectors, writer,
+                concurrency=args.concurrency,
+                checkpoint=checkpoint,
+                executor=executor,
+                dedup=args.dedup,
+                stop_early=args.stop_early,
+                on_result=log_result
+            )
+        finally:
+            await crawler.aclose()
     
     try:
-        logging.info(f"Starting to scrape {len(urls)} URLs...")
-        
-        results = []
-        for i, url in enumerate(urls, 1):
-            logging.info(f"Processing {i}/{len(urls)}: {url}")
-            
-            result = crawler.crawl_url(url, selectors)
-            results.append(result)
-            
-            if result.get('status') == 'success':
-                logging.info(f"✓ Successfully scraped: {url}")
-            else:
-                logging.warning(f"✗ Failed to scrape: {url}")
+        logging.info(f"Starting to scrape with concurrency {args.concurrency}...")
         
-        # Output results
-        if args.output:
-            if args.format == 'csv':
-                save_results_csv(results, args.output)
-            else:
-                save_results_json(results, args.output)
-        else:
-            # Print to stdout
-            if args.format == 'csv':
-                logging.info("CSV output requires --output file")
-            else:
-                print(json.dumps(results, indent=2, ensure_ascii=False))
+        stats = asyncio.run(crawl())
         
         # Summary
-        successful = sum(1 for r in results if r.get('status') == 'success')
-        logging.info(f"Scraping completed: {successful}/{len(urls)} successful")
+        log_summary(stats, args.output)
+        if stats.get('unvisited'):
+            logging.info(f"Stopped at --max-pages with {stats['unvisited']} URLs left to crawl")
+        if crawler.cache is not None:
+            logging.info(f"Response cache: {crawler.cache.stats()}")
         
     except KeyboardInterrupt:
-        logging.info("Scraping interrupted by user")
+        logging.info("Scraping interrupted by user"
+                     + (f"; rerun with --checkpoint {args.checkpoint} to resume" if checkpoint else ''))
     except Exception as e:
         logging.error(f"Unexpected error: {e}")
         sys.exit(1)
     finally:
+        writer.close()
+        executor.shutdown(wait=False, cancel_futures=True)
         crawler.close()
 
 
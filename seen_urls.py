@@ -0,0 +1,175 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class SeenURLs:
+    """Memory-bounded set of recently seen URLs.
+
+    Entries expire ``ttl`` seconds after they were last added and the
+    least recently added ones are evicted once ``capacity`` is reached,
+    so the set stays flat in a long-running process. Supports the
+    ``in`` / ``add`` / ``len`` subset of the ``set`` API.
+    """
+
+    def __init__(self, capacity: int = 100000, ttl: Optional[float] = 3600):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._entries: 'OrderedDict[str, float]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _expired(self, added_at: float, now: float) -> bool:
+        return self.ttl is not None and now - added_at > self.ttl
+
+    def add(self, url: str):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[url] = now
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._expire_oldest(now)
+
+    def _expire_oldest(self, now: float):
+        # Entries are ordered by insertion time, so expired ones sit at the front
+        while self._entries:
+            oldest_url, added_at = next(iter(self._entries.items()))
+            if not self._expired(added_at, now):
+                break
+            del self._entries[oldest_url]
+            self.evictions += 1
+
+    def __contains__(self, url: str) -> bool:
+        with self._lock:
+            added_at = self._entries.get(url)
+            if added_at is None:
+                return False
+            if self._expired(added_at, time.monotonic()):
+                del self._entries[url]
+                self.evictions += 1
+                return False
+            return True
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._expire_oldest(time.monotonic())
+            return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        return {
+            'mode': 'lru',
+            'size': len(self),
+            'capacity': self.capacity,
+            'ttl': self.ttl,
+            'evictions': self.evictions
+        }
+
+
+class _BloomFilter:
+    def __init__(self, capacity: int, false_positive_rate: float):
+        self.num_bits = max(8, int(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+        self.created_at = time.monotonic()
+
+    def _positions(self, url: str):
+        digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, url: str):
+        for pos in self._positions(url):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, url: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(url))
+
+
+class BloomSeenURLs:
+    """Approximate seen-URL set for very large crawls.
+
+    Uses two generations of Bloom filters sized for ``capacity`` URLs at
+    ``false_positive_rate``. When the current generation is full or older
+    than ``ttl`` it becomes the previous one and a fresh filter is started,
+    so memory is fixed at two filters and old URLs eventually age out.
+    A URL may be reported as seen when it was not (at roughly the
+    configured rate), never the other way round while it is remembered.
+    """
+
+    def __init__(self,
+                 capacity: int = 1000000,
+                 ttl: Optional[float] = None,
+                 false_positive_rate: float = 0.001):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.false_positive_rate = false_positive_rate
+        self._lock = threading.Lock()
+        self._current = _BloomFilter(capacity, false_positive_rate)
+        self._previous: Optional[_BloomFilter] = None
+        self.rotations = 0
+
+    def _maybe_rotate(self):
+        full = self._current.count >= self.capacity
+        stale = self.ttl is not None and time.monotonic() - self._current.created_at > self.ttl
+        if full or stale:
+            self._previous = self._current
+            self._current = _BloomFilter(self.capacity, self.false_positive_rate)
+            self.rotations += 1
+
+    def add(self, url: str):
+        with self._lock:
+            self._maybe_rotate()
+            if url not in self._current:
+                self._current.add(url)
+
+    def __contains__(self, url: str) -> bool:
+        with self._lock:
+            self._maybe_rotate()
+            return url in self._current or (self._previous is not None and url in self._previous)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._current.count + (self._previous.count if self._previous else 0)
+
+    def clear(self):
+        with self._lock:
+            self._current = _BloomFilter(self.capacity, self.false_positive_rate)
+            self._previous = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            memory_bytes = len(self._current.bits) + (len(self._previous.bits) if self._previous else 0)
+        return {
+            'mode': 'bloom',
+            'size': len(self),
+            'capacity': self.capacity,
+            'ttl': self.ttl,
+            'false_positive_rate': self.false_positive_rate,
+            'memory_bytes': memory_bytes,
+            'rotations': self.rotations
+        }
+
+
+def create_seen_urls(mode: str = 'lru',
+                     capacity: int = 100000,
+                     ttl: Optional[float] = 3600,
+                     false_positive_rate: float = 0.001):
+    """Build the seen-URL store for ``mode`` ('lru' or 'bloom')"""
+    if mode == 'lru':
+        return SeenURLs(capacity=capacity, ttl=ttl)
+    if mode == 'bloom':
+        return BloomSeenURLs(capacity=capacity, ttl=ttl, false_positive_rate=false_positive_rate)
+    raise ValueError(f"Unknown visited URL mode: {mode}")
@@ -0,0 +1,92 @@
+import threading
+from typing import Dict, List
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class SessionPool:
+    """Hands each worker thread its own ``requests.Session``.
+
+    ``requests.Session`` is not safe to share between threads, so every
+    thread gets a private session with its own sized ``HTTPAdapter``
+    connection pools. Sessions only carry the static base headers;
+    anything that varies per request must be passed to the call.
+    """
+
+    def __init__(self,
+                 base_headers: Dict[str, str],
+                 pool_connections: int = 100,
+                 pool_maxsize: int = 10):
+        self.base_headers = dict(base_headers)
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sessions: List[requests.Session] = []
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        # Retries are handled by StealthCrawler, not urllib3
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=0
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update(self.base_headers)
+        return session
+
+    def get(self) -> requests.Session:
+        """Return the calling thread's session, creating it on first use"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._create_session()
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            sessions = list(self._sessions)
+
+        host_pools = 0
+        connections_opened = 0
+        idle_connections = 0
+        requests_sent = 0
+        for session in sessions:
+            for adapter in set(session.adapters.values()):
+                pool_manager = getattr(adapter, 'poolmanager', None)
+                if pool_manager is None:
+                    continue
+                for key in list(pool_manager.pools.keys()):
+                    pool = pool_manager.pools.get(key)
+                    if pool is None:
+                        continue
+                    host_pools += 1
+                    connections_opened += pool.num_connections
+                    requests_sent += pool.num_requests
+                    if pool.pool is not None:
+                        # The queue is pre-filled with None placeholders
+                        idle_connections += sum(
+                            1 for conn in list(pool.pool.queue) if conn is not None
+                        )
+
+        return {
+            'sessions': len(sessions),
+            'pool_connections': self.pool_connections,
+            'pool_maxsize': self.pool_maxsize,
+            'host_pools': host_pools,
+            'connections_opened': connections_opened,
+            'idle_connections': idle_connections,
+            'requests_sent': requests_sent
+        }
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
+        self._local = threading.local()
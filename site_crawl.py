@@ -0,0 +1,258 @@
+"""
+Recursive site crawling from a set of seed URLs.
+
+Links found on each page feed a frontier ordered by depth (breadth
+first). URLs are canonicalized before they are queued (lowercase
+scheme and host, no default port or fragment, sorted query), so the
+same page reached through different spellings is fetched once. A
+CrawlScope decides which links are followed: depth, domains and
+include/exclude patterns. Pages are fetched concurrently, with a
+limit per host on top of the crawler's per-host politeness delays.
+"""
+
+import asyncio
+import heapq
+import itertools
+import re
+from collections import Counter
+from concurrent.futures import Executor
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from pipeline import count_result, new_stats
+from response_cache import DEFAULT_PORTS
+from stealth_crawler import StealthCrawler
+
+# Links kept in each emitted result, as for single-URL crawls
+RESULT_LINKS = 20
+
+_PERCENT_ESCAPE = re.compile(r'%[0-9a-fA-F]{2}')
+
+
+def canonicalize_url(url: str) -> Optional[str]:
+    """The form of ``url`` used for dedup and fetching; None if it isn't http(s)"""
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if scheme not in DEFAULT_PORTS or not host:
+        return None
+    if ':' in host:
+        host = f'[{host}]'
+    netloc = host if port is None or port == DEFAULT_PORTS[scheme] else f'{host}:{port}'
+    path = _PERCENT_ESCAPE.sub(lambda m: m.group().upper(), parts.path) or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+def host_of(url: str) -> str:
+    return (urlsplit(url).hostname or '').lower()
+
+
+class CrawlScope:
+    """Which discovered links a crawl follows.
+
+    ``allowed_domains`` defaults to the seeds' hosts; a domain also
+    covers its subdomains. A URL must match one of ``include`` (if
+    any) and none of ``exclude``; both are regular expressions
+    searched in the canonical URL. Links deeper than ``max_depth``
+    (seeds are depth 0) are not followed. Raises ``re.error`` for a
+    bad pattern.
+    """
+
+    def __init__(self, seeds: Iterable[str], max_depth: int = 2,
+                 allowed_domains: Optional[Iterable[str]] = None,
+                 include: Optional[Iterable[str]] = None,
+                 exclude: Optional[Iterable[str]] = None):
+        self.max_depth = max_depth
+        if allowed_domains:
+            domains = allowed_domains
+        else:
+            domains = (host_of(seed) for seed in seeds)
+        self.allowed_domains = {domain.lower().lstrip('.') for domain in domains if domain}
+        self.include = [re.compile(pattern) for pattern in include or ()]
+        self.exclude = [re.compile(pattern) for pattern in exclude or ()]
+
+    def in_domain(self, host: str) -> bool:
+        return any(host == domain or host.endswith('.' + domain) for domain in self.allowed_domains)
+
+    def allows(self, url: str, depth: int) -> bool:
+        """Whether canonical ``url``, found at ``depth``, should be crawled"""
+        if depth > self.max_depth or not self.in_domain(host_of(url)):
+            return False
+        if self.include and not any(pattern.search(url) for pattern in self.include):
+            return False
+        return not any(pattern.search(url) for pattern in self.exclude)
+
+
+class Frontier:
+    """URLs waiting to be crawled, shallowest first, each queued at most once.
+
+    URLs are queued per host, and a heap of hosts ordered by their
+    shallowest URL picks the next one, so skipping hosts that are busy
+    costs one step per busy host rather than a pass over every URL.
+    Holds at most ``max_size`` URLs; links found beyond that are
+    dropped (and counted), which bounds memory on huge sites.
+    """
+
+    def __init__(self, max_size: int = 100000):
+        self.max_size = max_size
+        self._queues: Dict[str, List[Tuple[int, int, str]]] = {}
+        # (depth, seq, host) of each host's first URL; entries left behind
+        # when a host's first URL changes are skipped when popped
+        self._hosts: List[Tuple[int, int, str]] = []
+        self._seen: Set[str] = set()
+        self._order = itertools.count()
+        self._size = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def push(self, url: str, depth: int) -> bool:
+        """Queue canonical ``url``; False if it was seen before or the frontier is full"""
+        if url in self._seen:
+            return False
+        if self._size >= self.max_size:
+            self.dropped += 1
+            return False
+        self._seen.add(url)
+        host = host_of(url)
+        queue = self._queues.setdefault(host, [])
+        item = (depth, next(self._order), url)
+        heapq.heappush(queue, item)
+        self._size += 1
+        if queue[0] is item:
+            heapq.heappush(self._hosts, (depth, item[1], host))
+        return True
+
+    def pop(self, busy: Callable[[str], bool] = lambda host: False) -> Optional[Tuple[str, int]]:
+        """The shallowest ``(url, depth)`` whose host isn't ``busy``, or None"""
+        skipped = []
+        try:
+            while self._hosts:
+                entry = heapq.heappop(self._hosts)
+                depth, order, host = entry
+                queue = self._queues.get(host)
+                if not queue or queue[0][:2] != (depth, order):
+                    continue
+                if busy(host):
+                    skipped.append(entry)
+                    continue
+                _, _, url = heapq.heappop(queue)
+                self._size -= 1
+                if queue:
+                    heapq.heappush(self._hosts, (queue[0][0], queue[0][1], host))
+                else:
+                    del self._queues[host]
+                return url, depth
+            return None
+        finally:
+            for entry in skipped:
+                heapq.heappush(self._hosts, entry)
+
+    def stats(self) -> Dict[str, int]:
+        return {'queued': self._size, 'hosts': len(self._queues), 'seen': len(self._seen),
+                'dropped': self.dropped}
+
+
+async def crawl_site(crawler: StealthCrawler,
+                     seeds: Iterable[str],
+                     selectors: Dict,
+                     scope: CrawlScope,
+                     max_pages: int = 100,
+                     concurrency: int = 5,
+                     per_host: int = 2,
+                     executor: Optional[Executor] = None,
+                     parser: Optional[str] = None,
+                     max_bytes: Optional[int] = None,
+                     semaphore: Optional[asyncio.Semaphore] = None,
+                     frontier: Optional[Frontier] = None) -> AsyncIterator[Dict]:
+    """Crawl outward from ``seeds``, yielding each page's result as it completes.
+
+    At most ``max_pages`` pages are fetched, ``concurrency`` at a time
+    and ``per_host`` at a time per host. Results carry their ``depth``.
+    ``semaphore`` is an extra limit shared with other work.
+    """
+    frontier = frontier if frontier is not None else Frontier()
+    for seed in seeds:
+        url = canonicalize_url(seed)
+        if url is not None:
+            frontier.push(url, 0)
+
+    pending: Dict[asyncio.Future, Tuple[str, int]] = {}
+    in_flight: Counter = Counter()
+    started = 0
+
+    async def crawl(url: str) -> Dict:
+        try:
+            if semaphore is None:
+                return await crawler.async_crawl_url(url, selectors, executor, parser=parser,
+                                                     max_bytes=max_bytes, max_links=None)
+            async with semaphore:
+                return await crawler.async_crawl_url(url, selectors, executor, parser=parser,
+                                                     max_bytes=max_bytes, max_links=None)
+        except Exception as e:
+            return {'url': url, 'error': str(e)}
+
+    try:
+        while True:
+            while started < max_pages and len(pending) < concurrency:
+                item = frontier.pop(lambda host: in_flight[host] >= per_host)
+                if item is None:
+                    break
+                url, depth = item
+                in_flight[host_of(url)] += 1
+                pending[asyncio.ensure_future(crawl(url))] = (url, depth)
+                started += 1
+
+            if not pending:
+                break
+
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                url, depth = pending.pop(task)
+                in_flight[host_of(url)] -= 1
+                result = task.result()
+                result['depth'] = depth
+                links = result.get('links')
+                if links is not None:
+                    if depth < scope.max_depth:
+                        for link in links:
+                            link = canonicalize_url(link)
+                            if link is not None and scope.allows(link, depth + 1):
+                                frontier.push(link, depth + 1)
+                    result['links'] = links[:RESULT_LINKS]
+                yield result
+    finally:
+        # Stopped early by the consumer: don't leave fetches running
+        for task in pending:
+            task.cancel()
+
+
+async def run_site_crawl(crawler: StealthCrawler,
+                         seeds: Iterable[str],
+                         selectors: Dict,
+                         writer,
+                         scope: CrawlScope,
+                         on_result: Optional[Callable[[int, Dict], None]] = None,
+                         **options) -> Dict[str, int]:
+    """crawl_site, streaming results to ``writer``; returns the counts"""
+    stats = new_stats()
+    frontier = Frontier()
+    try:
+        index = 0
+        async for result in crawl_site(crawler, seeds, selectors, scope, frontier=frontier, **options):
+            writer.write(result)
+            count_result(stats, result)
+            if on_result is not None:
+                on_result(index, result)
+            index += 1
+    finally:
+        writer.flush()
+    # In scope but left over once max_pages was reached
+    stats['unvisited'] = len(frontier)
+    return stats
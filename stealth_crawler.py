@@ -1,12 +1,173 @@
 import asyncio
-import random
+import importlib.util
+import logging
+import re
 import time
-from typing import Optional, Dict, List
-from urllib.parse import urljoin, urlparse
+from concurrent.futures import Executor
+from types import SimpleNamespace
+from typing import Any, Optional, Dict, List, Tuple
+from urllib.parse import urlparse
 
+import aiohttp
 import requests
 from bs4 import BeautifulSoup
 from fake_useragent import UserAgent
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from extraction import SelectorSpec, get_extraction_plan
+from fingerprints import Fingerprint, FingerprintStore, content_hash
+from health import HealthTracker
+from host_scheduler import HostScheduler
+from metrics import FETCHES, HOST_ERRORS, RESPONSES, RETRIES, STAGE_SECONDS
+from parsers import DEFAULT_PARSER, as_document, parse_document
+from response_cache import CacheEntry, ResponseCache
+from retry_policy import RETRYABLE_KINDS, RetryBudget, RetryPolicy, RetryState, classify
+from seen_urls import create_seen_urls
+from session_pool import SessionPool
+from streaming import CHUNK_SIZE, BodyReader, selectors_in_head
+
+
+_CHARSET = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+
+logger = logging.getLogger(__name__)
+
+
+def _accept_encoding() -> str:
+    """Content codings both requests and aiohttp can decode here.
+    
+    Both decode br only with a Brotli package installed, and fail the
+    whole response otherwise, so it is advertised only then.
+    """
+    if any(importlib.util.find_spec(name) for name in ('brotli', 'brotlicffi')):
+        return 'gzip, deflate, br'
+    return 'gzip, deflate'
+
+
+ACCEPT_ENCODING = _accept_encoding()
+
+_BLOCK_HINTS = {
+    403: 'access forbidden, likely bot detection',
+    503: 'service unavailable, likely rate limited'
+}
+
+
+def _stage_trace_config() -> aiohttp.TraceConfig:
+    """Time the DNS, connect and TTFB stages of aiohttp requests.
+    
+    Stages don't overlap: connect excludes DNS, and TTFB runs from the
+    connection being ready (or the request starting, on a reused one)
+    to the response headers. Reused connections record no DNS/connect.
+    """
+    trace_config = aiohttp.TraceConfig()
+    
+    async def on_request_start(session, ctx: SimpleNamespace, params):
+        ctx.sent = time.perf_counter()
+        ctx.dns = 0.0
+    
+    async def on_dns_resolvehost_start(session, ctx: SimpleNamespace, params):
+        ctx.dns_start = time.perf_counter()
+    
+    async def on_dns_resolvehost_end(session, ctx: SimpleNamespace, params):
+        ctx.dns = time.perf_counter() - ctx.dns_start
+        STAGE_SECONDS.observe(ctx.dns, stage='dns')
+    
+    async def on_connection_create_start(session, ctx: SimpleNamespace, params):
+        ctx.connect_start = time.perf_counter()
+    
+    async def on_connection_create_end(session, ctx: SimpleNamespace, params):
+        ctx.sent = time.perf_counter()
+        STAGE_SECONDS.observe(ctx.sent - ctx.connect_start - ctx.dns, stage='connect')
+    
+    async def on_request_end(session, ctx: SimpleNamespace, params):
+        STAGE_SECONDS.observe(time.perf_counter() - ctx.sent, stage='ttfb')
+    
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_dns_resolvehost_start.append(on_dns_resolvehost_start)
+    trace_config.on_dns_resolvehost_end.append(on_dns_resolvehost_end)
+    trace_config.on_connection_create_start.append(on_connection_create_start)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_request_end.append(on_request_end)
+    return trace_config
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def _log_response(url: str, attempt: int, status: int, started: float, headers=None):
+    # Sampled and usually filtered out: skip building the record when disabled
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    extra = {
+        'event': 'fetch.response',
+        'url': url,
+        'host': urlparse(url).hostname,
+        'attempt': attempt + 1,
+        'status': status,
+        'latency_ms': _elapsed_ms(started)
+    }
+    if headers is not None:
+        extra['headers'] = dict(headers)
+    logger.debug('Response %s for %s', status, url, extra=extra)
+
+
+def _record_failure(url: str, attempt: int, e: Exception, status: Optional[int], started: float):
+    host = urlparse(url).hostname or ''
+    HOST_ERRORS.inc(host=host, reason=str(status) if status else type(e).__name__)
+    error = str(e) or type(e).__name__
+    hint = _BLOCK_HINTS.get(status)
+    logger.warning(
+        'Attempt %d failed for %s: %s%s', attempt + 1, url, error, f' ({hint})' if hint else '',
+        extra={
+            'event': 'fetch.retry',
+            'url': url,
+            'host': host,
+            'attempt': attempt + 1,
+            'status': status,
+            'latency_ms': _elapsed_ms(started),
+            'error': error
+        }
+    )
+
+
+def _log_gave_up(url: str, attempts: int, reason: Optional[str], kind: Optional[str]):
+    logger.error('Failed to fetch %s after %d attempts (%s)', url, attempts, reason, extra={
+        'event': 'fetch.failed', 'url': url, 'host': urlparse(url).hostname, 'attempt': attempts,
+        'reason': reason, 'kind': kind
+    })
+
+
+class FetchResult:
+    """A fetched (or cache-served) response body with its metadata"""
+    
+    def __init__(self, url: str, status: int, headers: Dict[str, str], body: bytes,
+                 from_cache: bool = False, truncated: bool = False, stopped_early: bool = False):
+        self.url = url
+        self.status = status
+        self.headers = CaseInsensitiveDict(headers)
+        self.body = body
+        self.from_cache = from_cache
+        # The body is partial: cut at max_bytes, or read only up to </head>
+        self.truncated = truncated
+        self.stopped_early = stopped_early
+    
+    @property
+    def encoding(self) -> str:
+        return get_encoding_from_headers(self.headers) or 'utf-8'
+    
+    @property
+    def declared_encoding(self) -> Optional[str]:
+        """Charset from Content-Type, without the HTTP/1.1 Latin-1 default"""
+        match = _CHARSET.search(self.headers.get('Content-Type', ''))
+        return match.group(1) if match else None
+    
+    @property
+    def text(self) -> str:
+        try:
+            return self.body.decode(self.encoding, errors='replace')
+        except LookupError:
+            return self.body.decode('utf-8', errors='replace')
 
 
 class StealthCrawler:
@@ -15,16 +176,57 @@ class StealthCrawler:
                  max_retries: int = 3,
                  timeout: int = 30,
                  use_proxies: bool = False,
-                 proxy_list: Optional[List[str]] = None):
+                 proxy_list: Optional[List[str]] = None,
+                 connector_limit: int = 100,
+                 connector_limit_per_host: int = 10,
+                 pool_connections: int = 100,
+                 pool_maxsize: int = 10,
+                 visited_mode: str = 'lru',
+                 visited_capacity: int = 100000,
+                 visited_ttl: Optional[float] = 3600,
+                 visited_false_positive_rate: float = 0.001,
+                 cache: Optional[ResponseCache] = None,
+                 parser: str = DEFAULT_PARSER,
+                 max_bytes: Optional[int] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 host_health: Optional[HealthTracker] = None,
+                 proxy_health: Optional[HealthTracker] = None,
+                 fingerprints: Optional[FingerprintStore] = None):
         
         self.ua = UserAgent()
-        self.session = requests.Session()
+        self.base_headers: Dict[str, str] = {}
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.connector_limit = connector_limit
+        self.connector_limit_per_host = connector_limit_per_host
+        self._async_session: Optional[aiohttp.ClientSession] = None
         self.delay_range = delay_range
-        self.max_retries = max_retries
+        self.scheduler = HostScheduler(delay_range)
+        self.cache = cache
+        self.parser = parser
+        # Per-response body cap; None reads bodies whole
+        self.max_bytes = max_bytes
+        # Which failures are retried and how long to back off; the
+        # budget is shared by every fetch of this crawler. max_retries
+        # only applies when no policy is given
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=max_retries, budget=RetryBudget())
+        self.max_retries = self.retry_policy.max_attempts
         self.timeout = timeout
         self.use_proxies = use_proxies
         self.proxy_list = proxy_list or []
-        self.visited_urls = set()
+        # Circuit breakers: hosts that keep failing are skipped for a while,
+        # proxies are picked by recent success rate and latency
+        self.host_health = host_health or HealthTracker()
+        self.proxy_health = proxy_health or HealthTracker()
+        # Incremental mode: pages unchanged since the last run are skipped
+        self.fingerprints = fingerprints
+        # Bounded so a long-running process doesn't grow without limit
+        self.visited_urls = create_seen_urls(
+            mode=visited_mode,
+            capacity=visited_capacity,
+            ttl=visited_ttl,
+            false_positive_rate=visited_false_positive_rate
+        )
         
         self._setup_headers()
     
@@ -32,7 +234,7 @@ class StealthCrawler:
         headers = {
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
             'Accept-Language': 'ko-KR,ko;q=0.9,en-US;q=0.8,en;q=0.7',
-            'Accept-Encoding': 'gzip, deflate, br',
+            'Accept-Encoding': ACCEPT_ENCODING,
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
             'Sec-Fetch-Dest': 'document',
@@ -44,179 +246,501 @@ class StealthCrawler:
             'sec-ch-ua-mobile': '?0',
             'sec-ch-ua-platform': '"macOS"',
         }
-        self.session.headers.update(headers)
+        self.base_headers = headers
+        self.session_pool = SessionPool(
+            headers,
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize
+        )
+    
+    @property
+    def session(self) -> requests.Session:
+        """The calling thread's own session"""
+        return self.session_pool.get()
+    
+    def _build_headers(self, url: str, raw: bool = False) -> Dict[str, str]:
+        """Build per-request headers without touching shared session state"""
+        headers = dict(self.base_headers)
+        headers['User-Agent'] = self._get_random_user_agent()
+        if raw:
+            headers['Referer'] = 'https://www.google.com/'
+            if 'skyscanner' in url:
+                headers['Origin'] = 'https://www.skyscanner.co.kr'
+        return headers
     
     def _get_random_user_agent(self) -> str:
         return self.ua.random
     
-    def _get_random_proxy(self) -> Optional[Dict[str, str]]:
+    def _choose_proxy(self) -> Optional[str]:
+        """A proxy weighted towards fast, healthy ones (None when not proxying)"""
         if not self.use_proxies or not self.proxy_list:
             return None
+        return self.proxy_health.choose(self.proxy_list)
+    
+    def _record_health(self, host: str, proxy: Optional[str], error: Optional[Exception],
+                       status: Optional[int], started: float):
+        # Only failures worth retrying count against an endpoint; a 404 means it's up
+        failed = error is not None and classify(error, status) in RETRYABLE_KINDS
+        latency = time.perf_counter() - started
+        for tracker, key in ((self.host_health, host), (self.proxy_health, proxy)):
+            if key is None:
+                continue
+            if failed:
+                tracker.record_failure(key, latency)
+            else:
+                tracker.record_success(key, latency)
+    
+    def _retry_delay(self, url: str, retry: RetryState, host: str, proxy: Optional[str],
+                     e: Exception, status: Optional[int], headers, started: float) -> Optional[float]:
+        """Record a failed attempt; seconds to wait before the next one, or None to give up"""
+        _record_failure(url, retry.attempt, e, status, started)
+        self._record_health(host, proxy, e, status, started)
         
-        proxy = random.choice(self.proxy_list)
-        return {
-            'http': proxy,
-            'https': proxy
-        }
+        delay = retry.next_delay(e, status, headers)
+        if delay is not None and self.host_health.is_open(host):
+            retry.gave_up = 'circuit_open'
+            delay = None
+        if delay is None:
+            _log_gave_up(url, retry.attempt, retry.gave_up, retry.kind)
+            FETCHES.inc(outcome='failed')
+            return None
+        RETRIES.inc(kind=retry.kind)
+        return delay
+    
+    def _circuit_open(self, url: str, host: str, retry: RetryState) -> bool:
+        """True (and the fetch counted as failed) if ``host``'s breaker is open"""
+        if self.host_health.allow(host):
+            return False
+        _log_gave_up(url, retry.attempt, 'circuit_open', retry.kind)
+        FETCHES.inc(outcome='failed')
+        return True
+    
+    def _get_async_session(self) -> aiohttp.ClientSession:
+        """Lazily create the pooled aiohttp session (must run inside the event loop)"""
+        if self._async_session is None or self._async_session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.connector_limit,
+                limit_per_host=self.connector_limit_per_host,
+                ttl_dns_cache=300
+            )
+            self._async_session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                trace_configs=[_stage_trace_config()]
+            )
+        return self._async_session
+    
+    def _resolve_max_bytes(self, max_bytes: Optional[int]) -> Optional[int]:
+        """The per-call cap, never above the crawler-wide one"""
+        if max_bytes is None:
+            return self.max_bytes
+        if self.max_bytes is None:
+            return max_bytes
+        return min(max_bytes, self.max_bytes)
+    
+    def _cached_result(self, url: str, entry: CacheEntry, max_bytes: Optional[int] = None) -> FetchResult:
+        self.visited_urls.add(url)
+        FETCHES.inc(outcome='cached')
+        return self._entry_result(url, entry, max_bytes)
+    
+    @staticmethod
+    def _entry_result(url: str, entry: CacheEntry, max_bytes: Optional[int]) -> FetchResult:
+        if max_bytes is not None and entry.size > max_bytes:
+            return FetchResult(url, entry.status, entry.headers, entry.body[:max_bytes],
+                               from_cache=True, truncated=True)
+        return FetchResult(url, entry.status, entry.headers, entry.body, from_cache=True)
     
-    def _random_delay(self):
-        delay = random.uniform(*self.delay_range)
-        time.sleep(delay)
+    def _body_reader(self, headers, max_bytes: Optional[int], head_only: bool) -> BodyReader:
+        return BodyReader(max_bytes, head_only, get_encoding_from_headers(CaseInsensitiveDict(headers)))
     
-    def fetch_page(self, url: str) -> Optional[BeautifulSoup]:
-        if url in self.visited_urls:
+    def _handle_response(self, url: str, cached: Optional[CacheEntry], status: int,
+                         headers: Dict[str, str], reader: BodyReader,
+                         max_bytes: Optional[int] = None) -> FetchResult:
+        """Turn a successful response into a FetchResult, updating the cache"""
+        self.visited_urls.add(url)
+        
+        if status == 304 and cached is not None:
+            FETCHES.inc(outcome='revalidated')
+            entry = self.cache.revalidated(url, cached, headers)
+            return self._entry_result(url, entry, max_bytes)
+        
+        FETCHES.inc(outcome='fetched')
+        body = reader.body
+        # Partial bodies would be served as if they were the whole page
+        if self.cache is not None and reader.complete:
+            self.cache.store(url, status, headers, body)
+        return FetchResult(url, status, headers, body,
+                           truncated=reader.truncated, stopped_early=reader.stopped_early)
+    
+    def _request_headers(self, url: str, raw: bool, cached: Optional[CacheEntry],
+                         validators: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        headers = self._build_headers(url, raw=raw)
+        if cached is not None:
+            headers.update(cached.conditional_headers())
+        elif validators:
+            headers.update(validators)
+        return headers
+    
+    def fetch(self, url: str, raw: bool = False, dedup: bool = False,
+              max_bytes: Optional[int] = None, head_only: bool = False,
+              validators: Optional[Dict[str, str]] = None) -> Optional[FetchResult]:
+        """Fetch ``url`` with retries, going through the response cache.
+        
+        ``raw`` selects the browser-like header set used by
+        fetch_raw_html. Failures are retried as ``retry_policy``
+        decides, within its deadline. The body is streamed and cut
+        at ``max_bytes`` (default: the crawler's cap); with ``head_only``
+        reading stops once the document head is complete.
+        ``validators`` are conditional headers to send when the cache
+        has none; a 304 then comes back as an empty result.
+        """
+        if dedup and url in self.visited_urls:
             return None
         
-        for attempt in range(self.max_retries):
+        max_bytes = self._resolve_max_bytes(max_bytes)
+        cached = self.cache.lookup(url) if self.cache is not None else None
+        if cached is not None and cached.is_fresh():
+            return self._cached_result(url, cached, max_bytes)
+        
+        host = self.scheduler.host_of(url)
+        retry = self.retry_policy.begin()
+        while True:
+            attempt = retry.attempt
+            if self._circuit_open(url, host, retry):
+                return None
+            proxy = self._choose_proxy()
             try:
-                self.session.headers['User-Agent'] = self._get_random_user_agent()
+                # Wait for this host's politeness slot before the request
+                if raw or attempt == 0:
+                    self.scheduler.wait(url)
                 
-                proxies = self._get_random_proxy()
-                
-                response = self.session.get(
+                # requests exposes no DNS/connect timings, so sync TTFB includes them
+                started = time.perf_counter()
+                with self.session.get(
                     url,
-                    proxies=proxies,
-                    timeout=self.timeout,
-                    allow_redirects=True
-                )
-                
-                response.raise_for_status()
-                
-                self.visited_urls.add(url)
+                    headers=self._request_headers(url, raw, cached, validators),
+                    proxies={'http': proxy, 'https': proxy} if proxy else None,
+                    timeout=retry.timeout(self.timeout),
+                    allow_redirects=True,
+                    stream=True
+                ) as response:
+                    received = time.perf_counter()
+                    STAGE_SECONDS.observe(received - started, stage='ttfb')
+                    RESPONSES.inc(code=response.status_code)
+                    _log_response(url, attempt, response.status_code, started,
+                                  response.headers if raw else None)
+                    
+                    response.raise_for_status()
+                    
+                    # Stopping mid-body closes the connection instead of
+                    # returning it to the pool; the rest is never downloaded
+                    reader = self._body_reader(response.headers, max_bytes, head_only)
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        if reader.feed(chunk):
+                            break
+                    STAGE_SECONDS.observe(time.perf_counter() - received, stage='download')
+                    # Only now: a body that fails mid-read counts against the endpoint
+                    self._record_health(host, proxy, None, response.status_code, started)
                 
-                soup = BeautifulSoup(response.content, 'html.parser')
-                return soup
+                return self._handle_response(
+                    url, cached, response.status_code, dict(response.headers), reader, max_bytes
+                )
                 
             except requests.exceptions.RequestException as e:
-                print(f"Attempt {attempt + 1} failed for {url}: {e}")
-                if attempt < self.max_retries - 1:
-                    self._random_delay()
-                    continue
-                else:
-                    print(f"Failed to fetch {url} after {self.max_retries} attempts")
+                delay = self._retry_delay(url, retry, host, proxy, e, getattr(e.response, 'status_code', None),
+                                          getattr(e.response, 'headers', None), started)
+                if delay is None:
                     return None
-        
-        return None
+                time.sleep(delay)
     
-    def fetch_raw_html(self, url: str) -> Optional[str]:
-        """Fetch raw HTML content without parsing"""        
-        for attempt in range(self.max_retries):
+    def fetch_page(self, url: str, dedup: bool = False) -> Optional[BeautifulSoup]:
+        result = self.fetch(url, dedup=dedup)
+        if result is None:
+            return None
+        return BeautifulSoup(result.body, 'html.parser')
+    
+    def fetch_document(self, url: str, dedup: bool = False, parser: Optional[str] = None,
+                       max_bytes: Optional[int] = None, head_only: bool = False):
+        """Fetch and parse ``url`` with the given (or the crawler's) parser backend"""
+        result = self.fetch(url, dedup=dedup, max_bytes=max_bytes, head_only=head_only)
+        if result is None:
+            return None
+        return parse_document(result.body, parser or self.parser, result.declared_encoding)
+    
+    def fetch_raw_html(self, url: str, max_bytes: Optional[int] = None) -> Optional[str]:
+        """Fetch raw HTML content without parsing"""
+        result = self.fetch(url, raw=True, max_bytes=max_bytes)
+        if result is None:
+            return None
+        return result.text
+    
+    async def async_fetch(self, url: str, raw: bool = False, dedup: bool = False,
+                          max_bytes: Optional[int] = None, head_only: bool = False,
+                          validators: Optional[Dict[str, str]] = None) -> Optional[FetchResult]:
+        """Async counterpart of fetch"""
+        if dedup and url in self.visited_urls:
+            return None
+        
+        max_bytes = self._resolve_max_bytes(max_bytes)
+        cached = self.cache.lookup(url) if self.cache is not None else None
+        if cached is not None and cached.is_fresh():
+            return self._cached_result(url, cached, max_bytes)
+        
+        session = self._get_async_session()
+        
+        host = self.scheduler.host_of(url)
+        retry = self.retry_policy.begin()
+        while True:
+            attempt = retry.attempt
+            if self._circuit_open(url, host, retry):
+                return None
+            proxy = self._choose_proxy()
             try:
-                # Update headers for each request
-                self.session.headers.update({
-                    'User-Agent': self._get_random_user_agent(),
-                    'Referer': 'https://www.google.com/',
-                    'Origin': 'https://www.skyscanner.co.kr' if 'skyscanner' in url else None
-                })
-                
-                # Remove None values
-                self.session.headers = {k: v for k, v in self.session.headers.items() if v is not None}
-                
-                proxies = self._get_random_proxy()
-                
-                # Add random delay before request
-                self._random_delay()
+                # Wait for this host's politeness slot before the request
+                if raw or attempt == 0:
+                    await self.scheduler.async_wait(url)
                 
-                response = self.session.get(
+                started = time.perf_counter()
+                async with session.get(
                     url,
-                    proxies=proxies,
-                    timeout=self.timeout,
+                    headers=self._request_headers(url, raw, cached, validators),
+                    proxy=proxy,
                     allow_redirects=True,
-                    verify=True
-                )
-                
-                print(f"Response status: {response.status_code}")
-                print(f"Response headers: {dict(response.headers)}")
-                
-                response.raise_for_status()
-                
-                self.visited_urls.add(url)
-                
-                return response.text
+                    timeout=aiohttp.ClientTimeout(total=retry.timeout(self.timeout))
+                ) as response:
+                    received = time.perf_counter()
+                    RESPONSES.inc(code=response.status)
+                    _log_response(url, attempt, response.status, started,
+                                  response.headers if raw else None)
+                    
+                    response.raise_for_status()
+                    
+                    reader = self._body_reader(response.headers, max_bytes, head_only)
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        if reader.feed(chunk):
+                            break
+                    STAGE_SECONDS.observe(time.perf_counter() - received, stage='download')
+                    self._record_health(host, proxy, None, response.status, started)
                 
-            except requests.exceptions.RequestException as e:
-                print(f"Attempt {attempt + 1} failed for {url}: {e}")
-                if hasattr(e.response, 'status_code'):
-                    print(f"Status code: {e.response.status_code}")
-                    if e.response.status_code == 403:
-                        print("Access forbidden - likely bot detection")
-                    elif e.response.status_code == 503:
-                        print("Service unavailable - rate limited")
+                return self._handle_response(
+                    url, cached, response.status, dict(response.headers), reader, max_bytes
+                )
                 
-                if attempt < self.max_retries - 1:
-                    # Longer delay on failure
-                    time.sleep(random.uniform(3, 8))
-                    continue
-                else:
-                    print(f"Failed to fetch {url} after {self.max_retries} attempts")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                delay = self._retry_delay(url, retry, host, proxy, e, getattr(e, 'status', None),
+                                          getattr(e, 'headers', None), started)
+                if delay is None:
                     return None
+                await asyncio.sleep(delay)
+    
+    async def async_fetch_content(self, url: str, dedup: bool = False,
+                                  max_bytes: Optional[int] = None) -> Optional[bytes]:
+        """Async counterpart of fetch_page that returns the undecoded body"""
+        result = await self.async_fetch(url, dedup=dedup, max_bytes=max_bytes)
+        if result is None:
+            return None
+        return result.body
+    
+    async def async_fetch_page(self, url: str, dedup: bool = False) -> Optional[BeautifulSoup]:
+        content = await self.async_fetch_content(url, dedup)
+        if content is None:
+            return None
+        return BeautifulSoup(content, 'html.parser')
+    
+    async def async_fetch_raw_html(self, url: str, max_bytes: Optional[int] = None) -> Optional[str]:
+        """Async counterpart of fetch_raw_html"""
+        result = await self.async_fetch(url, raw=True, max_bytes=max_bytes)
+        if result is None:
+            return None
+        return result.text
+    
+    def extract_data(self, soup, selectors: Dict[str, SelectorSpec]) -> Dict[str, Any]:
+        """Extract each field from ``soup`` with its CSS or XPath selector.
         
-        return None
+        ``soup`` may be a BeautifulSoup object or any parsers document.
+        Selectors are compiled once per selector set and reused; see
+        ``parsers`` for ``::attr(name)`` and multi-value (``"all"``) fields.
+        """
+        return get_extraction_plan(selectors).extract(as_document(soup))
     
-    def extract_data(self, soup: BeautifulSoup, selectors: Dict[str, str]) -> Dict[str, str]:
-        data = {}
+    def get_links(self, soup, base_url: str) -> List[str]:
+        return as_document(soup).links(base_url)
+    
+    def crawl_url(self, url: str, selectors: Dict[str, SelectorSpec] = None, dedup: bool = False,
+                  parser: Optional[str] = None, max_bytes: Optional[int] = None,
+                  stop_early: bool = False) -> Dict:
+        """Fetch and extract one URL.
         
-        for key, selector in selectors.items():
-            try:
-                if selector.startswith('//'):
-                    continue
-                
-                element = soup.select_one(selector)
-                if element:
-                    data[key] = element.get_text(strip=True)
-                else:
-                    data[key] = ""
-                    
-            except Exception as e:
-                print(f"Error extracting {key} with selector {selector}: {e}")
-                data[key] = ""
+        With ``dedup`` a URL fetched recently (see ``visited_urls``) is
+        skipped instead of being fetched again. With ``stop_early`` and
+        selectors that only match inside ``<head>``, the download stops
+        at ``</head>`` (links are then not collected). With
+        ``fingerprints`` set, a page unchanged since it was last crawled
+        is not parsed and comes back with status ``unchanged``.
+        """
+        if selectors is None:
+            selectors = {
+                'title': 'title',
+                'description': 'meta[name="description"]::attr(content)',
+                'h1': 'h1'
+            }
         
-        return data
-    
-    def get_links(self, soup: BeautifulSoup, base_url: str) -> List[str]:
-        links = []
+        if dedup and url in self.visited_urls:
+            return {'url': url, 'error': 'Already visited', 'status': 'skipped'}
         
-        for link in soup.find_all('a', href=True):
-            href = link['href']
-            full_url = urljoin(base_url, href)
-            
-            if urlparse(full_url).netloc:
-                links.append(full_url)
+        previous = self.fingerprints.get(url) if self.fingerprints is not None else None
+        result = self.fetch(url, max_bytes=max_bytes,
+                            head_only=stop_early and selectors_in_head(selectors),
+                            validators=previous.conditional_headers() if previous else None)
+        if result is None:
+            return {'url': url, 'error': 'Failed to fetch page'}
         
-        return links
+        digest = None
+        if self.fingerprints is not None:
+            digest = self._changed_digest(url, result, previous)
+            if digest is None:
+                return {'url': url, 'status': 'unchanged'}
+        
+        crawl_result = self._parse_and_build_result(url, result, selectors, parser)
+        if digest is not None:
+            self._record_change(url, result, digest, previous, crawl_result)
+        return crawl_result
     
-    def crawl_url(self, url: str, selectors: Dict[str, str] = None) -> Dict:
+    async def async_crawl_url(self, url: str, selectors: Dict[str, SelectorSpec] = None,
+                              executor: Optional[Executor] = None, dedup: bool = False,
+                              parser: Optional[str] = None, max_bytes: Optional[int] = None,
+                              stop_early: bool = False, max_links: Optional[int] = 20) -> Dict:
+        """Async counterpart of crawl_url.
+        
+        The fetch runs on the event loop; parsing is CPU-bound, so it is
+        handed to ``executor`` (the loop's default executor if omitted).
+        ``max_links`` caps the links returned (None: all of them).
+        """
         if selectors is None:
             selectors = {
                 'title': 'title',
-                'description': 'meta[name="description"]',
+                'description': 'meta[name="description"]::attr(content)',
                 'h1': 'h1'
             }
         
-        self._random_delay()
+        if dedup and url in self.visited_urls:
+            return {'url': url, 'error': 'Already visited', 'status': 'skipped'}
         
-        soup = self.fetch_page(url)
-        if not soup:
+        previous = self.fingerprints.get(url) if self.fingerprints is not None else None
+        result = await self.async_fetch(url, max_bytes=max_bytes,
+                                        head_only=stop_early and selectors_in_head(selectors),
+                                        validators=previous.conditional_headers() if previous else None)
+        if result is None:
             return {'url': url, 'error': 'Failed to fetch page'}
         
-        data = self.extract_data(soup, selectors)
-        links = self.get_links(soup, url)
+        digest = None
+        if self.fingerprints is not None:
+            digest = self._changed_digest(url, result, previous)
+            if digest is None:
+                return {'url': url, 'status': 'unchanged'}
         
-        return {
-            'url': url,
-            'data': data,
-            'links': links[:20],
-            'status': 'success'
-        }
+        # Only picklable arguments, so ``executor`` may be a process pool
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+        crawl_result, timings = await loop.run_in_executor(
+            executor, timed_parse_result, url, result.body, selectors, parser or self.parser,
+            result.declared_encoding, result.truncated, max_links
+        )
+        # Time spent queued for the executor (and pickling, for processes)
+        timings['parse_wait'] = time.perf_counter() - submitted - sum(timings.values())
+        _observe_parse(timings)
+        if digest is not None:
+            self._record_change(url, result, digest, previous, crawl_result)
+        return crawl_result
+    
+    def _changed_digest(self, url: str, fetched: FetchResult, previous: Optional[Fingerprint]) -> Optional[str]:
+        """The body's hash, or None if the page is as ``previous`` recorded it"""
+        if previous is not None and fetched.status == 304:
+            self.fingerprints.not_modified(previous)
+            return None
+        digest = content_hash(fetched.body)
+        if previous is not None and previous.content_hash == digest:
+            # Same body; keep the server's latest validators
+            self.fingerprints.record(url, fetched.headers, digest, previous)
+            return None
+        return digest
     
-    def crawl_multiple(self, urls: List[str], selectors: Dict[str, str] = None) -> List[Dict]:
+    def _record_change(self, url: str, fetched: FetchResult, digest: str,
+                       previous: Optional[Fingerprint], crawl_result: Dict):
+        # Only once parsed, so a page that failed to parse is retried next run
+        if crawl_result.get('status') == 'success':
+            self.fingerprints.record(url, fetched.headers, digest, previous)
+            crawl_result['change'] = 'modified' if previous is not None else 'new'
+    
+    def _parse_and_build_result(self, url: str, fetched: FetchResult, selectors: Dict[str, SelectorSpec],
+                                parser: Optional[str] = None) -> Dict:
+        crawl_result, timings = timed_parse_result(url, fetched.body, selectors, parser or self.parser,
+                                                   fetched.declared_encoding, fetched.truncated)
+        _observe_parse(timings)
+        return crawl_result
+    
+    def crawl_multiple(self, urls: List[str], selectors: Dict[str, SelectorSpec] = None,
+                       dedup: bool = False, parser: Optional[str] = None,
+                       max_bytes: Optional[int] = None, stop_early: bool = False) -> List[Dict]:
         results = []
         
         for url in urls:
-            result = self.crawl_url(url, selectors)
+            result = self.crawl_url(url, selectors, dedup, parser, max_bytes, stop_early)
             results.append(result)
             
         return results
     
+    def pool_stats(self) -> Dict[str, Dict]:
+        return {
+            'sync': self.session_pool.stats(),
+            'async': {
+                'limit': self.connector_limit,
+                'limit_per_host': self.connector_limit_per_host,
+                'open': self._async_session is not None and not self._async_session.closed
+            }
+        }
+    
     def close(self):
-        self.session.close()
\ No newline at end of file
+        self.session_pool.close()
+        if self.fingerprints is not None:
+            self.fingerprints.close()
+    
+    async def aclose(self):
+        if self._async_session is not None and not self._async_session.closed:
+            await self._async_session.close()
+
+
+def parse_result(url: str, body: bytes, selectors: Dict[str, SelectorSpec], parser: str,
+                 encoding: Optional[str] = None, truncated: bool = False) -> Dict:
+    """Parse a fetched page into a crawl result.
+    
+    Module-level and free of crawler state so it can run in a worker process.
+    """
+    return timed_parse_result(url, body, selectors, parser, encoding, truncated)[0]
+
+
+def timed_parse_result(url: str, body: bytes, selectors: Dict[str, SelectorSpec], parser: str,
+                       encoding: Optional[str] = None, truncated: bool = False,
+                       max_links: Optional[int] = 20) -> Tuple[Dict, Dict[str, float]]:
+    """parse_result plus the seconds spent parsing and extracting.
+    
+    Timings are returned rather than recorded, since a worker process's
+    metrics never reach the API process.
+    """
+    started = time.perf_counter()
+    document = parse_document(body, parser, encoding)
+    parsed = time.perf_counter()
+    result = {
+        'url': url,
+        'data': get_extraction_plan(selectors).extract(document),
+        'links': document.links(url)[:max_links],
+        'status': 'success'
+    }
+    if truncated:
+        result['truncated'] = True
+    return result, {'parse': parsed - started, 'extract': time.perf_counter() - parsed}
+
+
+def _observe_parse(timings: Dict[str, float]):
+    for stage, seconds in timings.items():
+        STAGE_SECONDS.observe(max(seconds, 0.0), stage=stage)
@@ -0,0 +1,113 @@
+"""
+Bounded, incremental reading of response bodies.
+
+Bodies are read chunk by chunk instead of being buffered whole, so a
+single huge (or endless) response can't take more than ``max_bytes`` of
+memory. When every requested field lives in ``<head>`` the read can
+also stop as soon as the head is closed.
+"""
+
+import codecs
+import re
+from typing import Any, Dict, Optional, Union
+
+from parsers import parse_field_spec
+
+CHUNK_SIZE = 64 * 1024
+
+# Elements that only appear inside <head>
+HEAD_ELEMENTS = frozenset(('head', 'title', 'meta', 'link', 'base'))
+
+_HEAD_END = re.compile(r'</head\s*>|<body[\s>]')
+_HEAD_XPATH = re.compile(r'^(?:/html)?(?:/|//)(?:head|title|meta|link|base)\b')
+# Longest tail that may hold the start of a split </head > or <body> tag
+_TAIL_CHARS = 32
+
+
+def _rightmost_element(tree) -> Optional[str]:
+    """Element name of the rightmost compound of a parsed cssselect tree"""
+    while tree is not None:
+        if hasattr(tree, 'subselector'):
+            tree = tree.subselector
+        elif hasattr(tree, 'element'):
+            return tree.element
+        else:
+            tree = getattr(tree, 'selector', None)
+    return None
+
+
+def selector_in_head(selector: Union[str, Dict[str, Any]]) -> bool:
+    """Whether ``selector`` can only match elements inside ``<head>``"""
+    spec = parse_field_spec(selector)
+    if spec.kind == 'xpath':
+        return bool(_HEAD_XPATH.match(spec.query.strip()))
+
+    from cssselect import SelectorError, parse
+    try:
+        parsed = parse(spec.query)
+    except SelectorError:
+        return False
+    return all(
+        (_rightmost_element(item.parsed_tree) or '').lower() in HEAD_ELEMENTS
+        for item in parsed
+    )
+
+
+def selectors_in_head(selectors: Dict[str, Union[str, Dict[str, Any]]]) -> bool:
+    """Whether every field of ``selectors`` is satisfied by the document head"""
+    try:
+        return bool(selectors) and all(selector_in_head(s) for s in selectors.values())
+    except ValueError:
+        return False
+
+
+class BodyReader:
+    """Accumulates a response body, enforcing a size cap.
+
+    ``feed`` returns True once reading should stop: the cap was reached
+    (``truncated``) or, with ``head_only``, ``</head>`` has been seen
+    (``stopped_early``). Chunks are decoded incrementally only to find
+    the end of the head, so multi-byte characters split across chunks
+    are handled.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, head_only: bool = False,
+                 encoding: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.truncated = False
+        self.stopped_early = False
+        self._chunks = []
+        self._tail = ''
+        self._decoder = None
+        if head_only:
+            try:
+                self._decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+            except LookupError:
+                self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    def feed(self, chunk: bytes) -> bool:
+        over_cap = self.max_bytes is not None and self.size + len(chunk) > self.max_bytes
+        if over_cap:
+            chunk = chunk[:self.max_bytes - self.size]
+        if chunk:
+            self._chunks.append(chunk)
+            self.size += len(chunk)
+
+        if self._decoder is not None and chunk:
+            text = self._tail + self._decoder.decode(chunk).lower()
+            if _HEAD_END.search(text):
+                self.stopped_early = True
+            self._tail = text[-_TAIL_CHARS:]
+
+        # A head that ended within the cap is all that was wanted
+        self.truncated = over_cap and not self.stopped_early
+        return over_cap or self.stopped_early
+
+    @property
+    def complete(self) -> bool:
+        return not (self.truncated or self.stopped_early)
+
+    @property
+    def body(self) -> bytes:
+        return b''.join(self._chunks)
@@ -0,0 +1,95 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from crawler import SlotSemaphore
+from main import BatchScrapeRequest, batch_scrape
+from parse_pool import ParsePool, ParsePoolSaturated
+from singleflight import SingleFlight
+
+
+class SaturatingCrawler:
+    """Fails the parse of ``saturated_url``; every other page takes ``delay``"""
+
+    def __init__(self, saturated_url, delay=0.05):
+        self.saturated_url = saturated_url
+        self.delay = delay
+        self.finished = []
+        self.cancelled = []
+
+    async def async_crawl_url(self, url, selectors, executor, **options):
+        if url == self.saturated_url:
+            raise ParsePoolSaturated("Parse queue is full (4/4 jobs)")
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(url)
+            raise
+        self.finished.append(url)
+        return {'url': url, 'status': 'success', 'data': {}}
+
+
+def _request(crawler, parse_pool):
+    return SimpleNamespace(state=SimpleNamespace(
+        stealth_crawler=crawler,
+        parse_pool=parse_pool,
+        batch_semaphore=SlotSemaphore(10),
+        singleflight=SingleFlight(),
+        max_concurrency=10
+    ))
+
+
+@pytest.fixture
+def parse_pool():
+    pool = ParsePool(workers=0, max_pending=4)
+    yield pool
+    pool.shutdown()
+
+
+def test_saturation_mid_batch_is_a_503(parse_pool):
+    crawler = SaturatingCrawler('http://b.test/')
+    batch = BatchScrapeRequest(urls=['http://a.test/', 'http://b.test/', 'http://c.test/'])
+
+    async def run():
+        with pytest.raises(HTTPException) as raised:
+            await batch_scrape(_request(crawler, parse_pool), batch)
+        await asyncio.sleep(0.1)
+        return raised.value
+
+    error = asyncio.run(run())
+
+    assert error.status_code == 503
+    assert error.headers == {'Retry-After': '1'}
+    # The rest of the batch is abandoned rather than crawled for nothing
+    assert sorted(crawler.cancelled) == ['http://a.test/', 'http://c.test/']
+    assert crawler.finished == []
+
+
+def test_saturation_mid_stream_is_reported_on_the_url_line(parse_pool):
+    crawler = SaturatingCrawler('http://b.test/', delay=0)
+    batch = BatchScrapeRequest(urls=['http://a.test/', 'http://b.test/'], stream=True)
+
+    async def run():
+        response = await batch_scrape(_request(crawler, parse_pool), batch)
+        return [json.loads(line) async for line in response.body_iterator]
+
+    lines = asyncio.run(run())
+
+    results = {line['index']: line['result'] for line in lines[:-1]}
+    assert results[0]['status'] == 'success'
+    assert results[1] == {'url': 'http://b.test/', 'error': 'Parse queue is full (4/4 jobs)'}
+    assert lines[-1]['summary'] == {'total_urls': 2, 'successful': 1, 'failed': 1}
+
+
+def test_a_saturated_pool_rejects_the_batch_up_front(parse_pool, monkeypatch):
+    monkeypatch.setattr(ParsePool, 'saturated', property(lambda self: True))
+    crawler = SaturatingCrawler(None)
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(batch_scrape(_request(crawler, parse_pool), BatchScrapeRequest(urls=['http://a.test/'])))
+
+    assert raised.value.status_code == 503
+    assert crawler.finished == []
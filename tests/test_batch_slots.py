@@ -0,0 +1,21 @@
+import asyncio
+
+from crawler import SlotSemaphore
+
+
+def test_in_use_counts_held_slots_only():
+    async def run():
+        slots = SlotSemaphore(1)
+        counts = []
+        async with slots:
+            counts.append(slots.in_use)
+            # A waiter that gives up never held a slot
+            waiter = asyncio.create_task(slots.acquire())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            counts.append(slots.in_use)
+        counts.append(slots.in_use)
+        return counts
+
+    assert asyncio.run(run()) == [1, 1, 0]
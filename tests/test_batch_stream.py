@@ -0,0 +1,56 @@
+import asyncio
+import json
+
+from main import _stream_batch_results
+from singleflight import SingleFlight
+
+
+async def _collect(stream):
+    return [json.loads(line) async for line in stream]
+
+
+def test_stream_yields_results_as_they_finish_with_their_index():
+    delays = {'a': 0.03, 'b': 0.0, 'c': 0.01}
+
+    async def crawl_one(url):
+        await asyncio.sleep(delays[url])
+        return {'url': url, 'status': 'success' if url != 'c' else 'error'}
+
+    lines = asyncio.run(_collect(_stream_batch_results(list(delays), crawl_one)))
+
+    assert [line['index'] for line in lines[:-1]] == [1, 2, 0]
+    assert [line['result']['url'] for line in lines[:-1]] == ['b', 'c', 'a']
+    assert lines[-1] == {'summary': {'total_urls': 3, 'successful': 2, 'failed': 1}}
+
+
+def test_closing_the_stream_cancels_shared_fetches():
+    async def run():
+        flight = SingleFlight()
+        started, cancelled = [], []
+
+        async def fetch(url):
+            started.append(url)
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(url)
+                raise
+
+        async def crawl_one(url):
+            return await flight.do(('crawl', url), lambda: fetch(url))
+
+        stream = _stream_batch_results(['a', 'b'], crawl_one)
+        # Client disconnects before any result arrives
+        first = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        await stream.aclose()
+        await asyncio.sleep(0.01)
+        # Copies: asyncio.run cancels leftover tasks on the way out
+        return list(started), list(cancelled), flight
+
+    started, cancelled, flight = asyncio.run(run())
+    assert sorted(started) == ['a', 'b']
+    assert sorted(cancelled) == ['a', 'b']
+    assert flight.stats()['in_flight'] == 0
@@ -0,0 +1,107 @@
+import asyncio
+import csv
+import json
+
+import pytest
+
+from checkpoint import Checkpoint
+from fingerprints import FingerprintStore
+from output_writers import csv_fieldnames, open_writer
+from pipeline import run_pipeline
+from stealth_crawler import StealthCrawler
+
+SELECTORS = {'title': 'title'}
+URL_COUNT = 12
+
+
+class Crash(Exception):
+    pass
+
+
+def _page(path, headers):
+    return 200, {'Content-Type': 'text/html'}, f'<title>{path}</title>'.encode()
+
+
+def _read_urls(path, output_format):
+    with open(path, newline='', encoding='utf-8') as f:
+        if output_format == 'jsonl':
+            return [json.loads(line)['url'] for line in f]
+        return [row['url'] for row in csv.DictReader(f)]
+
+
+def _crash_at(crash_index, monkeypatch):
+    """on_result that kills the run before it can save its checkpoint again"""
+    def crash(*args, **kwargs):
+        raise Crash()
+
+    def on_result(index, result):
+        if index == crash_index:
+            monkeypatch.setattr(Checkpoint, 'save', crash)
+            crash()
+
+    return on_result
+
+
+def _run(base, output_format, output, checkpoint_path, on_result=None, fingerprints_path=None):
+    checkpoint = Checkpoint(str(checkpoint_path), source='urls.txt', save_every=3, save_interval=3600)
+    writer = open_writer(output_format, str(output), fieldnames=csv_fieldnames(SELECTORS),
+                         append=checkpoint.resumed, truncate_to=checkpoint.output_bytes)
+    fingerprints = FingerprintStore(str(fingerprints_path), deferred=True) if fingerprints_path else None
+    crawler = StealthCrawler(delay_range=(0, 0), max_retries=1, timeout=5, fingerprints=fingerprints)
+    urls = [(index, f'{base}/page/{index}') for index in range(URL_COUNT)]
+
+    async def crawl():
+        try:
+            return await run_pipeline(crawler, urls, SELECTORS, writer, concurrency=1,
+                                      checkpoint=checkpoint, on_result=on_result)
+        finally:
+            await crawler.aclose()
+
+    try:
+        return asyncio.run(crawl())
+    finally:
+        writer.close()
+        crawler.close()
+
+
+@pytest.mark.parametrize('output_format', ['jsonl', 'csv'])
+def test_resume_after_crash_has_no_duplicate_or_missing_rows(serve, tmp_path, monkeypatch, output_format):
+    base = serve(_page)
+    output = tmp_path / f'results.{output_format}'
+    checkpoint_path = tmp_path / 'run.ckpt'
+
+    with pytest.raises(Crash):
+        _run(base, output_format, output, checkpoint_path, on_result=_crash_at(7, monkeypatch))
+    monkeypatch.undo()
+    # Eight rows written, but the last save only covers the first six
+    assert Checkpoint(str(checkpoint_path)).next_index == 6
+    assert len(_read_urls(output, output_format)) == 8
+
+    stats = _run(base, output_format, output, checkpoint_path)
+
+    assert stats['processed'] == URL_COUNT - 6
+    assert _read_urls(output, output_format) == [f'{base}/page/{index}' for index in range(URL_COUNT)]
+    assert Checkpoint(str(checkpoint_path)).next_index == URL_COUNT
+
+
+def test_resumed_incremental_run_keeps_the_rows_it_cut(serve, tmp_path, monkeypatch):
+    base = serve(_page)
+    output = tmp_path / 'results.jsonl'
+    checkpoint_path = tmp_path / 'run.ckpt'
+    fingerprints_path = tmp_path / 'fingerprints.db'
+
+    with pytest.raises(Crash):
+        _run(base, 'jsonl', output, checkpoint_path, on_result=_crash_at(7, monkeypatch),
+             fingerprints_path=fingerprints_path)
+    monkeypatch.undo()
+    # Only pages covered by the saved checkpoint count as seen
+    assert FingerprintStore(str(fingerprints_path)).stats()['stored'] == 6
+
+    stats = _run(base, 'jsonl', output, checkpoint_path, fingerprints_path=fingerprints_path)
+
+    assert (stats['processed'], stats['unchanged']) == (URL_COUNT - 6, 0)
+    with open(output, encoding='utf-8') as f:
+        rows = [json.loads(line) for line in f]
+    assert [row['url'] for row in rows] == [f'{base}/page/{index}' for index in range(URL_COUNT)]
+    assert {row['change'] for row in rows} == {'new'}
+    assert FingerprintStore(str(fingerprints_path)).stats()['stored'] == URL_COUNT
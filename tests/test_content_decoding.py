@@ -0,0 +1,60 @@
+import asyncio
+import gzip
+import importlib.util
+
+import stealth_crawler
+from stealth_crawler import StealthCrawler
+
+PAGE = b'<html><head><title>Encoded</title></head><body>' + b'x' * 2000 + b'</body></html>'
+
+
+def _cdn(path, headers):
+    """Serves br to clients that ask for it, like most CDNs; gzip otherwise"""
+    accepted = [coding.strip() for coding in headers.get('Accept-Encoding', '').split(',')]
+    if 'br' in accepted:
+        try:
+            import brotli
+            body = brotli.compress(PAGE)
+        except ImportError:
+            # Undecodable here, as for a client that advertised br without a decoder
+            body = b'not decodable without brotli'
+        return 200, {'Content-Type': 'text/html', 'Content-Encoding': 'br'}, body
+    return 200, {'Content-Type': 'text/html', 'Content-Encoding': 'gzip'}, gzip.compress(PAGE)
+
+
+def _crawler():
+    return StealthCrawler(delay_range=(0, 0), max_retries=1, timeout=5)
+
+
+def test_br_is_advertised_only_with_a_decoder(monkeypatch):
+    monkeypatch.setattr(importlib.util, 'find_spec', lambda name: None)
+    assert 'br' not in stealth_crawler._accept_encoding().split(', ')
+
+    installed = importlib.util.find_spec('brotli') or importlib.util.find_spec('brotlicffi')
+    monkeypatch.undo()
+    assert ('br' in stealth_crawler.ACCEPT_ENCODING) == bool(installed)
+
+
+def test_fetch_decodes_whatever_it_advertised(serve):
+    url = serve(_cdn) + '/page'
+    crawler = _crawler()
+    try:
+        result = crawler.fetch(url)
+        assert result is not None and result.body == PAGE
+    finally:
+        crawler.close()
+
+
+def test_async_fetch_decodes_whatever_it_advertised(serve):
+    url = serve(_cdn) + '/page'
+    crawler = _crawler()
+
+    async def fetch():
+        try:
+            return await crawler.async_fetch(url)
+        finally:
+            await crawler.aclose()
+
+    result = asyncio.run(fetch())
+    crawler.close()
+    assert result is not None and result.body == PAGE
@@ -0,0 +1,21 @@
+import gzip
+
+from content_encoding import AVAILABLE_ENCODINGS, compress, negotiate_encoding
+
+
+def test_negotiate_picks_the_best_supported_encoding():
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding('identity') is None
+    assert negotiate_encoding('gzip;q=0') is None
+    assert negotiate_encoding('deflate, gzip;q=0.5') == 'gzip'
+    assert negotiate_encoding('*') == AVAILABLE_ENCODINGS[0]
+
+
+def test_negotiate_ignores_unavailable_encodings():
+    # br and zstd when their packages are installed, gzip otherwise
+    assert negotiate_encoding('br;q=0.9, zstd;q=0.9, gzip;q=0.1') == AVAILABLE_ENCODINGS[0]
+
+
+def test_gzip_round_trips():
+    body = b'<html>' + b'x' * 5000 + b'</html>'
+    assert gzip.decompress(compress(body, 'gzip')) == body
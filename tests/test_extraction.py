@@ -0,0 +1,59 @@
+import pytest
+
+from extraction import get_extraction_plan
+from parsers import PARSER_BACKENDS, parse_document
+
+PAGE = b'''<html><head><title> Page title </title>
+<meta name="description" content="About the page"></head>
+<body><nav><a href="/a">A</a><a href="/b">B</a></nav>
+<main><h1>First <em>heading</em></h1><h1>Second</h1>
+<div class="content"><p>One</p><p>Two</p></div></main></body></html>'''
+
+SELECTORS = {
+    'title': 'title',
+    'description': 'meta[name="description"]::attr(content)',
+    'h1': 'h1',
+    'second_p': 'div.content p:nth-of-type(2)',
+    'any': '*',
+    'nav_links': {'css': 'nav a::attr(href)', 'all': True},
+    'missing': 'section.none'
+}
+
+EXPECTED = {
+    'title': 'Page title',
+    'description': 'About the page',
+    'h1': 'Firstheading',
+    'second_p': 'Two',
+    'nav_links': ['/a', '/b'],
+    'missing': ''
+}
+
+
+@pytest.mark.parametrize('parser', PARSER_BACKENDS)
+def test_backends_extract_the_same_fields(parser):
+    document = parse_document(PAGE, parser)
+    data = get_extraction_plan(SELECTORS).extract(document)
+
+    assert {key: data.get(key) for key in EXPECTED} == EXPECTED
+    # The first element in document order is <html>
+    assert data['any'].startswith('Page title')
+
+
+def test_single_walk_matches_select_one_per_selector():
+    document = parse_document(PAGE, 'html.parser')
+    selectors = {
+        'p': 'p',
+        'p_again': 'p',
+        'h1_or_p': 'p, h1',
+        'last_h1': 'h1:last-of-type',
+        'missing': 'section.none',
+        'title': 'title'
+    }
+
+    data = get_extraction_plan(selectors).extract(document)
+
+    for key, css in selectors.items():
+        element = document.soup.select_one(css)
+        assert data[key] == (element.get_text(strip=True) if element is not None else '')
+    assert data['h1_or_p'] == 'Firstheading'
+    assert data['p_again'] == 'One'
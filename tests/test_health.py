@@ -0,0 +1,156 @@
+import asyncio
+import random
+import socket
+import threading
+from collections import Counter
+
+import pytest
+
+import health
+from health import CLOSED, HALF_OPEN, OPEN, HealthTracker
+from stealth_crawler import StealthCrawler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(health.time, 'monotonic', clock.monotonic)
+    return clock
+
+
+def _state(tracker, key):
+    return tracker._endpoints[key].state
+
+
+def test_breaker_opens_half_opens_and_closes(clock):
+    tracker = HealthTracker(failure_threshold=3, cooldown=10, max_cooldown=100)
+    for _ in range(2):
+        assert tracker.allow('a')
+        tracker.record_failure('a')
+    assert _state(tracker, 'a') == CLOSED
+
+    tracker.record_failure('a')
+    assert _state(tracker, 'a') == OPEN
+    assert not tracker.allow('a') and tracker.is_open('a')
+
+    clock.now += 10
+    # One probe goes through, the next caller waits for its outcome
+    assert tracker.allow('a')
+    assert _state(tracker, 'a') == HALF_OPEN
+    assert not tracker.allow('a')
+
+    tracker.record_success('a')
+    assert _state(tracker, 'a') == CLOSED
+    assert tracker.allow('a')
+    assert tracker.stats()['opened'] == 1
+
+
+def test_failed_probe_reopens_for_twice_as_long(clock):
+    tracker = HealthTracker(failure_threshold=1, cooldown=10, max_cooldown=15)
+    tracker.record_failure('a')
+    clock.now += 10
+    assert tracker.allow('a')
+
+    tracker.record_failure('a')
+    assert _state(tracker, 'a') == OPEN
+    clock.now += 14
+    assert not tracker.allow('a')
+    clock.now += 1
+    assert tracker.allow('a')
+
+
+def test_error_rate_opens_the_breaker(clock):
+    tracker = HealthTracker(failure_threshold=100, error_rate_threshold=0.5, min_requests=4)
+    for ok in (True, False, True):
+        (tracker.record_success if ok else tracker.record_failure)('a')
+    assert _state(tracker, 'a') == CLOSED
+
+    tracker.record_failure('a')
+    assert _state(tracker, 'a') == OPEN
+
+
+def test_choose_favours_fast_healthy_proxies_and_skips_open_ones(clock):
+    random.seed(1)
+    tracker = HealthTracker(failure_threshold=1)
+    tracker.record_success('fast', 0.1)
+    tracker.record_success('slow', 1.0)
+    tracker.record_failure('dead')
+
+    picks = Counter(tracker.choose(['fast', 'slow', 'dead']) for _ in range(2000))
+
+    assert picks['dead'] == 0
+    # Weights are 1/0.1 and 1/1.0
+    assert 8 < picks['fast'] / picks['slow'] < 12
+
+
+def test_choose_falls_back_to_the_soonest_to_reopen(clock):
+    tracker = HealthTracker(failure_threshold=1, cooldown=10)
+    tracker.record_failure('a')
+    clock.now += 5
+    tracker.record_failure('b')
+
+    assert tracker.choose(['b', 'a']) == 'a'
+
+
+def _truncating_server():
+    """Sends headers promising more body than it delivers, then hangs up"""
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen()
+
+    def serve():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            with conn:
+                conn.recv(65536)
+                conn.sendall(b'HTTP/1.1 200 OK\r\nContent-Type: text/html\r\n'
+                             b'Content-Length: 100000\r\n\r\n<html>partial')
+
+    threading.Thread(target=serve, daemon=True).start()
+    return listener, f'http://127.0.0.1:{listener.getsockname()[1]}/'
+
+
+def test_a_body_cut_short_counts_as_a_failure():
+    listener, url = _truncating_server()
+    tracker = HealthTracker(failure_threshold=100)
+    crawler = StealthCrawler(delay_range=(0, 0), max_retries=1, timeout=5, host_health=tracker)
+    try:
+        assert crawler.fetch(url) is None
+    finally:
+        crawler.close()
+        listener.close()
+
+    endpoint = tracker._endpoints[crawler.scheduler.host_of(url)]
+    assert list(endpoint.outcomes) == [False]
+
+
+def test_an_async_body_cut_short_counts_as_a_failure():
+    listener, url = _truncating_server()
+    tracker = HealthTracker(failure_threshold=100)
+    crawler = StealthCrawler(delay_range=(0, 0), max_retries=1, timeout=5, host_health=tracker)
+
+    async def fetch():
+        try:
+            return await crawler.async_fetch(url)
+        finally:
+            await crawler.aclose()
+
+    try:
+        assert asyncio.run(fetch()) is None
+    finally:
+        crawler.close()
+        listener.close()
+
+    endpoint = tracker._endpoints[crawler.scheduler.host_of(url)]
+    assert list(endpoint.outcomes) == [False]
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+import time
+
+from host_scheduler import HostScheduler
+
+
+def test_concurrent_async_waiters_on_one_host_are_spaced_out():
+    scheduler = HostScheduler(delay_range=(0.05, 0.05))
+
+    async def run():
+        started = time.monotonic()
+        released = []
+
+        async def request(url):
+            await scheduler.async_wait(url)
+            released.append((url, time.monotonic() - started))
+
+        await asyncio.gather(*(request(f'http://a.test/{i}') for i in range(4)),
+                             request('http://b.test/'))
+        return released
+
+    released = dict(asyncio.run(run()))
+    times = sorted(at for url, at in released.items() if 'a.test' in url)
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    assert all(gap >= 0.04 for gap in gaps)
+    # Other hosts aren't held up behind a.test
+    assert released['http://b.test/'] < 0.03
+
+
+def test_concurrent_threads_on_one_host_are_spaced_out():
+    scheduler = HostScheduler(delay_range=(0.05, 0.05))
+    released = []
+    lock = threading.Lock()
+
+    def request(index):
+        scheduler.wait(f'http://a.test/{index}')
+        with lock:
+            released.append(time.monotonic())
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    times = sorted(released)
+    assert all(later - earlier >= 0.04 for earlier, later in zip(times, times[1:]))
+    assert time.monotonic() - times[0] < 1
+
+
+def test_waiting_requests_are_reported_per_host():
+    scheduler = HostScheduler(delay_range=(0.2, 0.2))
+
+    async def run():
+        waiters = [asyncio.create_task(scheduler.async_wait('http://a.test/')) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        during = scheduler.stats()
+        await asyncio.gather(*waiters)
+        return during, scheduler.stats()
+
+    during, after = asyncio.run(run())
+    # The first request goes at once; the other two wait for their slots
+    assert during['queue_depth'] == {'a.test': 2}
+    assert after['waiting_requests'] == 0
@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+import pytest
+
+from jobs import JobRunner, JobStore
+from parse_pool import ParsePoolSaturated
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.db'), lease_seconds=60)
+    yield store
+    store.close()
+
+
+def _claim_urls(store, count):
+    return [store.claim()[2] for _ in range(count)]
+
+
+def test_claims_follow_job_age_then_item_order(store):
+    first = store.create_job(['a0', 'a1'], {'n': 1})
+    store.create_job(['b0', 'b1'], {'n': 2})
+
+    assert _claim_urls(store, 4) == ['a0', 'a1', 'b0', 'b1']
+    assert store.claim() is None
+    assert store.get_job(first['job_id'])['status'] == 'running'
+
+
+def test_claim_returns_the_job_options(store):
+    job = store.create_job(['a0'], {'selectors': {'title': 'title'}})
+
+    assert store.claim() == (job['job_id'], 0, 'a0', {'selectors': {'title': 'title'}})
+
+
+def test_expired_leases_are_recovered_in_order(store):
+    store.create_job(['a0', 'a1', 'a2'], {})
+    store.claim()
+    store.claim()
+    # Only the unleased item is claimable until the sweep runs
+    assert store.recover_expired() == 0
+    assert store.claim()[2] == 'a2'
+
+    store._conn.execute("UPDATE items SET lease_until = ? WHERE seq = 1", (time.time() - 1,))
+    assert store.recover_expired() == 1
+    assert _claim_urls(store, 1) == ['a1']
+    assert store.claim() is None
+
+
+def test_released_items_are_claimed_again(store):
+    job = store.create_job(['a0', 'a1'], {})
+    job_id, seq, _, _ = store.claim()
+    store.release(job_id, seq)
+
+    assert _claim_urls(store, 2) == ['a0', 'a1']
+    assert store.get_job(job['job_id'])['pending'] == 2
+
+
+def test_completing_twice_keeps_the_first_result(store):
+    job = store.create_job(['a0'], {})
+    job_id, seq, url, _ = store.claim()
+    store.complete(job_id, seq, {'url': url, 'status': 'success'})
+    store.complete(job_id, seq, {'url': url, 'status': 'error'})
+
+    progress = store.get_job(job['job_id'])
+    assert (progress['status'], progress['completed'], progress['successful']) == ('completed', 1, 1)
+    results, cursor = store.results(job_id)
+    assert [result['result']['status'] for result in results] == ['success']
+    assert store.stats()['items'] == {}
+
+
+def test_prune_deletes_old_finished_jobs_with_their_results(store):
+    done = store.create_job(['a0'], {})
+    running = store.create_job(['b0', 'b1'], {})
+    for _ in range(2):
+        job_id, seq, url, _ = store.claim()
+        store.complete(job_id, seq, {'url': url, 'status': 'success'})
+
+    assert store.prune(3600) == 0
+    assert store.prune(0) == 1
+    assert store.get_job(done['job_id']) is None
+    assert store.results(done['job_id']) == ([], 0)
+    assert store.get_job(running['job_id'])['completed'] == 1
+
+
+class _Pool:
+    saturated = True
+
+
+class _Crawler:
+    def __init__(self, saturate_first=False):
+        self.calls = []
+        self.saturate_first = saturate_first
+
+    async def async_crawl_url(self, url, selectors, executor, dedup=False, **options):
+        self.calls.append((url, dedup))
+        if self.saturate_first and len(self.calls) == 1:
+            raise ParsePoolSaturated("Parse queue is full")
+        return {'url': url, 'status': 'success'}
+
+
+def test_runner_waits_for_parse_capacity_before_fetching(store):
+    pool, crawler = _Pool(), _Crawler()
+    runner = JobRunner(store, crawler, parse_pool=pool, capacity_interval=0.01)
+
+    async def run():
+        crawl = asyncio.create_task(runner._crawl('a0', {}))
+        await asyncio.sleep(0.05)
+        fetched_while_saturated = list(crawler.calls)
+        pool.saturated = False
+        return fetched_while_saturated, await crawl
+
+    fetched_while_saturated, result = asyncio.run(run())
+
+    assert fetched_while_saturated == []
+    assert result == {'url': 'a0', 'status': 'success'}
+    assert crawler.calls == [('a0', False)]
+
+
+def test_runner_retries_without_dedup_after_losing_the_pool(store):
+    pool, crawler = _Pool(), _Crawler(saturate_first=True)
+    pool.saturated = False
+    runner = JobRunner(store, crawler, parse_pool=pool, capacity_interval=0.01)
+
+    result = asyncio.run(runner._crawl('a0', {'dedup': True}))
+
+    assert result['status'] == 'success'
+    # Its own first attempt marked the URL visited; dedup would skip it
+    assert crawler.calls == [('a0', True), ('a0', False)]
+    assert runner.stats()['parse_retries'] == 1
@@ -0,0 +1,47 @@
+import json
+import logging
+from pathlib import Path
+
+from logging_setup import load_logging_config, setup_logging, shutdown_logging
+
+
+def test_shipped_config_logs_text_to_the_console_only():
+    config = load_logging_config(str(Path(__file__).resolve().parent.parent / 'config.json'))
+
+    assert config.get('format', 'text') == 'text'
+    assert not config.get('file')
+
+
+def test_json_file_output_is_rotated(tmp_path):
+    path = tmp_path / 'scraper.log'
+    setup_logging({'format': 'json', 'console': False, 'file': str(path),
+                   'max_bytes': 2000, 'backups': 2})
+    try:
+        for index in range(100):
+            logging.getLogger('test').info('record %d', index, extra={'event': 'test', 'index': index})
+    finally:
+        shutdown_logging()
+
+    files = sorted(tmp_path.iterdir())
+    assert [file.name for file in files] == ['scraper.log', 'scraper.log.1', 'scraper.log.2']
+    assert all(file.stat().st_size <= 2000 for file in files)
+    last = json.loads(path.read_text().splitlines()[-1])
+    assert (last['message'], last['event'], last['index']) == ('record 99', 'test', 99)
+
+
+def test_verbose_overrides_per_logger_levels(tmp_path):
+    path = tmp_path / 'scraper.log'
+    config = {'console': False, 'file': str(path), 'levels': {'test.noisy': 'WARNING'}}
+    noisy = logging.getLogger('test.noisy')
+    try:
+        setup_logging(config)
+        noisy.info('hidden')
+        setup_logging(config, verbose=True)
+        noisy.debug('shown')
+    finally:
+        shutdown_logging()
+        noisy.setLevel(logging.NOTSET)
+        logging.getLogger().setLevel(logging.WARNING)
+
+    lines = path.read_text().splitlines()
+    assert len(lines) == 1 and lines[0].endswith('shown')
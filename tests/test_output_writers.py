@@ -0,0 +1,67 @@
+import csv
+import gzip
+import json
+import sys
+
+import pytest
+
+from output_writers import csv_fieldnames, open_writer
+
+SELECTORS = {'title': 'title', 'tags': {'css': 'li', 'all': True}}
+RESULTS = [
+    {'url': 'http://a.test/', 'status': 'success', 'data': {'title': 'A', 'tags': ['x', 'y']},
+     'links': ['http://a.test/b'], 'change': 'new'},
+    {'url': 'http://a.test/b', 'status': 'error', 'error': 'timeout'}
+]
+
+
+def _write(writer):
+    for result in RESULTS:
+        writer.write(result)
+    writer.close()
+
+
+def test_jsonl_gz_round_trips(tmp_path):
+    path = tmp_path / 'results.jsonl.gz'
+    _write(open_writer('jsonl.gz', str(path)))
+
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        assert [json.loads(line)['url'] for line in f] == [result['url'] for result in RESULTS]
+
+
+def test_csv_has_the_change_column(tmp_path):
+    path = tmp_path / 'results.csv'
+    _write(open_writer('csv', str(path), fieldnames=csv_fieldnames(SELECTORS)))
+
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0]) == ['url', 'status', 'change', 'title', 'tags', 'error']
+    assert [row['change'] for row in rows] == ['new', '']
+    assert rows[0]['tags'] == '["x", "y"]'
+
+
+@pytest.mark.parametrize('output_format', ['parquet', 'arrow'])
+def test_columnar_formats_write_one_row_per_result(tmp_path, output_format):
+    pa = pytest.importorskip('pyarrow')
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    path = tmp_path / f'results.{output_format}'
+    _write(open_writer(output_format, str(path), selectors=SELECTORS, batch_size=1))
+
+    if output_format == 'parquet':
+        table = pyarrow.parquet.read_table(path)
+        assert pyarrow.parquet.ParquetFile(path).num_row_groups == 2
+    else:
+        table = pyarrow.ipc.open_file(pa.memory_map(str(path))).read_all()
+    assert table.column('url').to_pylist() == ['http://a.test/', 'http://a.test/b']
+    assert table.column('tags').to_pylist() == [['x', 'y'], []]
+    assert table.column('change').to_pylist() == ['new', None]
+    assert table.column('error').to_pylist() == [None, 'timeout']
+
+
+def test_columnar_formats_explain_a_missing_pyarrow(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)
+
+    with pytest.raises(ValueError, match='requirements-parquet.txt'):
+        open_writer('parquet', str(tmp_path / 'results.parquet'), selectors=SELECTORS)
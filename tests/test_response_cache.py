@@ -0,0 +1,126 @@
+import os
+import time
+from email.utils import formatdate
+
+from response_cache import (
+    CacheEntry, DiskCacheBackend, ResponseCache, compute_freshness
+)
+
+
+NOW = 1_700_000_000.0
+
+
+def test_no_store_is_not_storable():
+    assert compute_freshness({'Cache-Control': 'no-store, max-age=60'}, NOW) == (False, None)
+
+
+def test_no_cache_is_stored_but_always_revalidated():
+    assert compute_freshness({'Cache-Control': 'no-cache, max-age=60'}, NOW) == (True, None)
+
+
+def test_max_age_is_reduced_by_age():
+    headers = {'cache-control': 'public, max-age=300', 'Age': '100'}
+
+    assert compute_freshness(headers, NOW) == (True, NOW + 200)
+
+
+def test_max_age_wins_over_expires():
+    headers = {'Cache-Control': 'max-age=10', 'Expires': formatdate(NOW + 3600, usegmt=True)}
+
+    assert compute_freshness(headers, NOW) == (True, NOW + 10)
+
+
+def test_expires_is_used_without_max_age():
+    headers = {'Expires': formatdate(NOW + 3600, usegmt=True)}
+
+    assert compute_freshness(headers, NOW) == (True, NOW + 3600)
+
+
+def test_default_ttl_applies_without_freshness_headers():
+    assert compute_freshness({}, NOW) == (True, None)
+    assert compute_freshness({}, NOW, default_ttl=30) == (True, NOW + 30)
+
+
+def test_revalidated_merges_304_headers_into_the_entry():
+    cache = ResponseCache()
+    entry = cache.store('http://Example.com/page', 200, {
+        'Content-Type': 'text/html',
+        'ETag': '"v1"',
+        'Cache-Control': 'no-cache'
+    }, b'<html>cached</html>')
+    assert entry is not None and not entry.is_fresh()
+
+    refreshed = cache.revalidated('http://example.com/page', entry, {
+        'etag': '"v2"',
+        'cache-control': 'max-age=60'
+    })
+
+    assert refreshed.body == b'<html>cached</html>'
+    assert refreshed.headers == {
+        'Content-Type': 'text/html',
+        'etag': '"v2"',
+        'cache-control': 'max-age=60'
+    }
+    assert refreshed.etag == '"v2"'
+    assert refreshed.is_fresh()
+    stored = cache.lookup('http://example.com/page')
+    assert stored.headers == refreshed.headers
+    assert cache.stats()['not_modified'] == 1
+
+
+def _entry(url, body, expires_in=60):
+    now = time.time()
+    return CacheEntry(url, 200, {'ETag': '"x"'}, body, now, now + expires_in)
+
+
+def test_disk_backend_round_trip(tmp_path):
+    backend = DiskCacheBackend(str(tmp_path))
+    backend.set('http://example.com/', _entry('http://example.com/', b'\x00body\n'))
+
+    entry = DiskCacheBackend(str(tmp_path)).get('http://example.com/')
+
+    assert entry.url == 'http://example.com/'
+    assert entry.status == 200
+    assert entry.headers == {'ETag': '"x"'}
+    assert entry.body == b'\x00body\n'
+    assert entry.is_fresh()
+    assert backend.get('http://example.com/missing') is None
+
+
+def test_disk_backend_tracks_bytes_on_overwrite_and_delete(tmp_path):
+    backend = DiskCacheBackend(str(tmp_path))
+
+    def on_disk():
+        return sum(entry.stat().st_size for entry in os.scandir(tmp_path))
+
+    backend.set('a', _entry('a', b'x' * 100))
+    first = backend.stats()['bytes']
+    assert first == on_disk()
+
+    backend.set('a', _entry('a', b'x' * 10))
+    assert backend.stats()['bytes'] == on_disk() < first
+
+    backend.delete('a')
+    backend.delete('a')
+    assert backend.stats()['bytes'] == on_disk() == 0
+
+    backend.set('b', _entry('b', b'y' * 50))
+    assert DiskCacheBackend(str(tmp_path)).stats()['bytes'] == on_disk()
+
+
+def test_disk_backend_evicts_oldest_files_past_max_bytes(tmp_path):
+    backend = DiskCacheBackend(str(tmp_path))
+    backend.set('old', _entry('old', b'o' * 1000))
+    size = backend.stats()['bytes']
+    past = time.time() - 3600
+    os.utime(backend._path('old'), (past, past))
+
+    backend = DiskCacheBackend(str(tmp_path), max_bytes=size + 500)
+    backend.set('new', _entry('new', b'n' * 1000))
+
+    assert backend.get('old') is None
+    assert backend.get('new').body == b'n' * 1000
+    stats = backend.stats()
+    assert stats['evictions'] == 1
+    assert stats['bytes'] <= stats['max_bytes']
+    assert stats['bytes'] == sum(entry.stat().st_size for entry in os.scandir(tmp_path))
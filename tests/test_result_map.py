@@ -0,0 +1,90 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import result_map
+from main import scrape_url
+from result_map import ResultMap, ResultMapFull
+
+
+class NeverAnswers:
+    """Background crawler that accepts requests and never reports back"""
+
+    def __init__(self):
+        self.requests = []
+
+    async def add_requests(self, requests):
+        self.requests.extend(requests)
+
+
+def _request(requests_to_results, scrape_timeout=5.0):
+    return SimpleNamespace(state=SimpleNamespace(
+        crawler=NeverAnswers(),
+        requests_to_results=requests_to_results,
+        scrape_timeout=scrape_timeout
+    ))
+
+
+def test_create_rejects_past_max_size():
+    async def run():
+        results = ResultMap(max_size=2)
+        results.create('a')
+        results.create('b')
+        with pytest.raises(ResultMapFull):
+            results.create('c')
+        results.discard('a')
+        results.create('c')
+        return results.stats()
+
+    stats = asyncio.run(run())
+    assert (stats['pending'], stats['created'], stats['rejected']) == (2, 3, 1)
+
+
+def test_sweep_times_out_stale_entries_to_make_room(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_map.time, 'monotonic', lambda: now[0])
+
+    async def run():
+        results = ResultMap(max_size=1, max_age=60)
+        stale = results.create('a')
+        now[0] += 61
+        fresh = results.create('b')
+        # Settling a swept key is a no-op, not an error
+        assert not results.resolve('a', 'late')
+        return stale, fresh, results.stats()
+
+    stale, fresh, stats = asyncio.run(run())
+    assert isinstance(stale.exception(), asyncio.TimeoutError)
+    assert not fresh.done()
+    assert (stats['pending'], stats['swept'], stats['rejected']) == (1, 1, 0)
+
+
+def test_scrape_is_503_when_the_map_is_full():
+    async def run():
+        results = ResultMap(max_size=1)
+        results.create('someone-else')
+        with pytest.raises(HTTPException) as raised:
+            await scrape_url(_request(results), url='http://example.com/', timeout=None)
+        return raised.value, results
+
+    error, results = asyncio.run(run())
+    assert error.status_code == 503
+    assert error.headers == {'Retry-After': '1'}
+    assert results.stats()['rejected'] == 1
+
+
+def test_scrape_is_504_without_a_result_and_frees_its_entry():
+    async def run():
+        results = ResultMap()
+        request = _request(results, scrape_timeout=5.0)
+        with pytest.raises(HTTPException) as raised:
+            await scrape_url(request, url='http://example.com/', timeout=0.05)
+        return raised.value, results, request.state.crawler
+
+    error, results, crawler = asyncio.run(run())
+    assert error.status_code == 504
+    assert error.detail == 'No result for http://example.com/ within 0.05s'
+    assert len(crawler.requests) == 1
+    assert len(results) == 0
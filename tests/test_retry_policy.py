@@ -0,0 +1,62 @@
+import asyncio
+from email.utils import formatdate
+
+import requests
+
+from retry_policy import (CLIENT_ERROR, CONNECT_TIMEOUT, READ_TIMEOUT, SERVER_ERROR, THROTTLED,
+                          RetryBudget, RetryPolicy, classify, retry_after_seconds)
+
+
+def test_classify():
+    error = requests.exceptions.HTTPError()
+    assert classify(error, 429) == THROTTLED
+    assert classify(error, 404) == CLIENT_ERROR
+    assert classify(error, 503) == SERVER_ERROR
+    assert classify(requests.exceptions.ConnectTimeout()) == CONNECT_TIMEOUT
+    assert classify(asyncio.TimeoutError()) == READ_TIMEOUT
+
+
+def test_retry_after_accepts_seconds_and_dates():
+    assert retry_after_seconds({'Retry-After': '7'}) == 7
+    assert retry_after_seconds({'Retry-After': formatdate(1000, usegmt=True)}, now=990) == 10
+    assert retry_after_seconds({'Retry-After': 'soon'}) is None
+    assert retry_after_seconds(None) is None
+
+
+def test_client_errors_are_not_retried():
+    retry = RetryPolicy().begin()
+
+    assert retry.next_delay(requests.exceptions.HTTPError(), 404) is None
+    assert retry.gave_up == 'not_retryable'
+
+
+def test_attempts_and_retry_after():
+    retry = RetryPolicy(max_attempts=3, base_delay=0.1, max_delay=1).begin()
+    error = requests.exceptions.HTTPError()
+
+    assert retry.next_delay(error, 503, {'Retry-After': '2'}) == 2
+    assert 0.1 <= retry.next_delay(error, 500) <= 1
+    assert retry.next_delay(error, 500) is None
+    assert retry.gave_up == 'attempts'
+
+
+def test_long_retry_after_and_deadline_end_retries():
+    error = requests.exceptions.HTTPError()
+    retry = RetryPolicy(max_retry_after=5).begin()
+    assert retry.next_delay(error, 429, {'Retry-After': '60'}) is None
+    assert retry.gave_up == 'retry_after'
+
+    retry = RetryPolicy(deadline=1).begin()
+    assert retry.next_delay(error, 503, {'Retry-After': '2'}) is None
+    assert retry.gave_up == 'deadline'
+
+
+def test_budget_caps_retries():
+    budget = RetryBudget(ratio=0.5, min_per_second=0, window=60)
+    policy = RetryPolicy(max_attempts=5, base_delay=0, max_delay=0, budget=budget)
+    states = [policy.begin() for _ in range(4)]
+    error = requests.exceptions.ConnectionError()
+
+    delays = [state.next_delay(error) for state in states]
+    assert delays.count(None) == 2
+    assert budget.exhausted == 2
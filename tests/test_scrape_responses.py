@@ -0,0 +1,49 @@
+import asyncio
+import json
+import warnings
+from types import SimpleNamespace
+
+import pytest
+
+from main import DefaultResponse, ScrapeRequest, stealth_scrape
+from singleflight import SingleFlight
+from stealth_crawler import FetchResult
+
+PAGE = '<html><title>café</title></html>'.encode('utf-8')
+
+
+class FixedPage:
+    def __init__(self):
+        self.fetches = []
+
+    async def async_fetch(self, url, raw=False, max_bytes=None):
+        self.fetches.append((url, raw))
+        return FetchResult(url, 200, {'Content-Type': 'text/html; charset=utf-8'}, PAGE)
+
+
+def _request(crawler):
+    return SimpleNamespace(
+        headers={},
+        state=SimpleNamespace(stealth_crawler=crawler, singleflight=SingleFlight(), parse_pool=None)
+    )
+
+
+def test_default_response_renders_json_without_deprecation_warnings():
+    pytest.importorskip('orjson')
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        response = DefaultResponse({'title': 'café', 2: [1.5, None]})
+
+    assert response.media_type == 'application/json'
+    assert json.loads(response.body) == {'title': 'café', '2': [1.5, None]}
+
+
+def test_raw_implies_return_html():
+    crawler = FixedPage()
+
+    response = asyncio.run(stealth_scrape(_request(crawler), ScrapeRequest(url='http://a.test/', raw=True)))
+
+    assert response.body == PAGE
+    assert response.headers['content-type'] == 'text/html; charset=utf-8'
+    assert response.headers['x-upstream-status'] == '200'
+    assert crawler.fetches == [('http://a.test/', True)]
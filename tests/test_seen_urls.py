@@ -0,0 +1,86 @@
+import pytest
+
+import seen_urls
+from seen_urls import BloomSeenURLs, SeenURLs, create_seen_urls
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(seen_urls.time, 'monotonic', clock.monotonic)
+    return clock
+
+
+def test_lru_evicts_the_least_recently_added(clock):
+    seen = SeenURLs(capacity=2, ttl=None)
+    seen.add('a')
+    seen.add('b')
+    seen.add('a')
+    seen.add('c')
+
+    assert 'a' in seen and 'c' in seen
+    assert 'b' not in seen
+    assert len(seen) == 2 and seen.evictions == 1
+
+
+def test_lru_entries_expire_after_ttl(clock):
+    seen = SeenURLs(capacity=10, ttl=60)
+    seen.add('a')
+    clock.now += 30
+    seen.add('b')
+    clock.now += 31
+
+    assert 'a' not in seen
+    assert 'b' in seen
+    assert len(seen) == 1
+
+
+def test_bloom_remembers_everything_it_holds():
+    seen = BloomSeenURLs(capacity=1000, false_positive_rate=0.01)
+    urls = [f'http://a.test/{i}' for i in range(1000)]
+    for url in urls:
+        seen.add(url)
+
+    assert all(url in seen for url in urls)
+    false_positives = sum(f'http://b.test/{i}' in seen for i in range(10000))
+    assert false_positives < 300
+
+
+def test_bloom_rotates_generations_when_full(clock):
+    seen = BloomSeenURLs(capacity=2, false_positive_rate=0.001)
+    for url in ('a', 'b', 'c'):
+        seen.add(url)
+
+    # 'c' started a new generation; the previous one is still consulted
+    assert seen.rotations == 1
+    assert all(url in seen for url in ('a', 'b', 'c'))
+
+    seen.add('d')
+    seen.add('e')
+    assert seen.rotations == 2
+    assert 'a' not in seen and 'b' not in seen
+    assert all(url in seen for url in ('c', 'd', 'e'))
+
+
+def test_bloom_rotates_generations_after_ttl(clock):
+    seen = BloomSeenURLs(capacity=100, ttl=60)
+    seen.add('a')
+    clock.now += 61
+    assert 'a' in seen
+    clock.now += 61
+    assert 'a' not in seen
+    assert seen.rotations == 2
+
+
+def test_create_seen_urls_rejects_unknown_modes():
+    assert isinstance(create_seen_urls('bloom', false_positive_rate=0.01), BloomSeenURLs)
+    with pytest.raises(ValueError):
+        create_seen_urls('exact')
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    async def run():
+        flight = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 'done'
+
+        results = await asyncio.gather(*(flight.do('key', work) for _ in range(3)))
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(run())
+    assert results == ['done'] * 3
+    assert len(calls) == 1
+    assert flight.stats() == {'in_flight': 0, 'executed': 1, 'coalesced': 2, 'abandoned': 0}
+
+
+def test_work_continues_while_any_caller_waits():
+    async def run():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return 'done'
+
+        first = asyncio.create_task(flight.do('key', work))
+        second = asyncio.create_task(flight.do('key', work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return await second, first
+
+    result, first = asyncio.run(run())
+    assert result == 'done'
+    assert first.cancelled()
+
+
+def test_work_is_cancelled_when_every_caller_is_gone():
+    async def run():
+        flight = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        callers = [asyncio.create_task(flight.do('key', work)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+
+        # A new caller starts fresh work instead of joining the cancelled one
+        async def again():
+            return 'fresh'
+        return flight, await flight.do('key', again)
+
+    flight, result = asyncio.run(run())
+    assert result == 'fresh'
+    assert flight.abandoned == 1
+
+
+def test_errors_reach_every_caller():
+    async def run():
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ValueError('boom')
+
+        return await asyncio.gather(*(flight.do('key', work) for _ in range(2)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
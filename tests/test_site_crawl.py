@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+
+from site_crawl import CrawlScope, Frontier, canonicalize_url, crawl_site
+from stealth_crawler import StealthCrawler
+
+
+def test_canonicalize_url():
+    assert canonicalize_url('HTTP://Example.COM:80/a%2fb?z=1&a=2#frag') == 'http://example.com/a%2Fb?a=2&z=1'
+    assert canonicalize_url('https://example.com:443') == 'https://example.com/'
+    assert canonicalize_url('ftp://example.com/') is None
+
+
+def test_frontier_pops_shallowest_first_and_dedups():
+    frontier = Frontier()
+    assert frontier.push('http://a.test/2', 2)
+    assert frontier.push('http://b.test/1', 1)
+    assert frontier.push('http://a.test/0', 0)
+    assert not frontier.push('http://b.test/1', 1)
+
+    assert [frontier.pop() for _ in range(4)] == [
+        ('http://a.test/0', 0), ('http://b.test/1', 1), ('http://a.test/2', 2), None
+    ]
+
+
+def test_frontier_skips_busy_hosts_and_keeps_their_urls():
+    frontier = Frontier()
+    for url, depth in [('http://a.test/1', 1), ('http://a.test/2', 1), ('http://b.test/3', 2)]:
+        frontier.push(url, depth)
+
+    assert frontier.pop(lambda host: host == 'a.test') == ('http://b.test/3', 2)
+    assert frontier.pop(lambda host: True) is None
+    assert len(frontier) == 2
+    assert frontier.pop() == ('http://a.test/1', 1)
+    assert frontier.stats() == {'queued': 1, 'hosts': 1, 'seen': 3, 'dropped': 0}
+
+
+def test_frontier_drops_links_beyond_max_size():
+    frontier = Frontier(max_size=2)
+    for index in range(3):
+        frontier.push(f'http://a.test/{index}', 1)
+
+    assert len(frontier) == 2 and frontier.dropped == 1
+
+
+def test_pop_with_busy_hosts_does_not_scan_the_queue():
+    frontier = Frontier()
+    for index in range(50000):
+        frontier.push(f'http://hub.test/{index}', 1)
+
+    started = time.perf_counter()
+    for _ in range(100):
+        assert frontier.pop(lambda host: True) is None
+    assert time.perf_counter() - started < 0.5
+
+
+def test_crawl_respects_per_host_limit_and_max_pages(serve):
+    lock = threading.Lock()
+    in_flight, peak = Counter(), Counter()
+
+    def site(path, headers):
+        host = headers['Host'].split(':')[0]
+        with lock:
+            in_flight[host] += 1
+            peak[host] = max(peak[host], in_flight[host])
+        time.sleep(0.02)
+        with lock:
+            in_flight[host] -= 1
+        port = headers['Host'].split(':')[1]
+        page = int(path.rsplit('/', 1)[-1] or 0)
+        # Every page links to more pages on both hosts
+        links = ''.join(f'<a href="http://{other}:{port}/p/{page * 10 + n}">x</a>'
+                        for other in ('127.0.0.1', 'localhost') for n in range(1, 6))
+        body = f'<html><head><title>{page}</title></head><body>{links}</body></html>'
+        return 200, {'Content-Type': 'text/html'}, body.encode()
+
+    base = serve(site)
+    crawler = StealthCrawler(delay_range=(0, 0), max_retries=1, timeout=5)
+    scope = CrawlScope([base], max_depth=3, allowed_domains=['127.0.0.1', 'localhost'])
+
+    async def crawl():
+        try:
+            return [result async for result in crawl_site(
+                crawler, [base + '/p/0'], {'title': 'title'}, scope,
+                max_pages=30, concurrency=8, per_host=2)]
+        finally:
+            await crawler.aclose()
+
+    results = asyncio.run(crawl())
+    crawler.close()
+
+    assert len(results) == 30
+    assert all(result['status'] == 'success' for result in results)
+    assert max(peak.values()) <= 2
+    assert set(peak) == {'127.0.0.1', 'localhost'}
@@ -0,0 +1,64 @@
+from collections import Counter
+from functools import partial
+
+from stealth_crawler import StealthCrawler
+from workers import run_sharded, shard_of
+
+
+class _Collect:
+    def __init__(self):
+        self.results = []
+
+    def write(self, result):
+        self.results.append(result)
+
+    def flush(self):
+        pass
+
+    def tell(self):
+        return None
+
+
+def test_urls_on_one_host_share_a_shard():
+    urls = [f'http://example.com/page/{index}?q={index}' for index in range(50)]
+    urls += ['https://EXAMPLE.com:8443/other', 'http://example.com']
+
+    for workers in (2, 3, 8):
+        assert len({shard_of(url, workers) for url in urls}) == 1
+
+
+def test_shard_is_within_range_and_stable():
+    hosts = [f'http://host{index}.test/' for index in range(200)]
+
+    shards = [shard_of(url, 4) for url in hosts]
+
+    assert shards == [shard_of(url, 4) for url in hosts]
+    assert set(shards) == {0, 1, 2, 3}
+
+
+def test_url_sharding_spreads_one_host():
+    urls = [f'http://example.com/page/{index}' for index in range(200)]
+
+    assert set(shard_of(url, 4, 'url') for url in urls) == {0, 1, 2, 3}
+
+
+def test_run_sharded_crawls_each_host_in_one_worker(serve, tmp_path):
+    base = serve(lambda path, headers: (200, {'Content-Type': 'text/html'}, b'<title>t</title>'))
+    port = base.rsplit(':', 1)[1]
+    hosts = ['127.0.0.1', 'localhost']
+    urls = [f'http://{host}:{port}/page/{index}' for index in range(6) for host in hosts]
+    source = tmp_path / 'urls.txt'
+    source.write_text('\n'.join(urls) + '\n')
+    writer = _Collect()
+
+    stats, summaries = run_sharded(
+        str(source), 2, partial(StealthCrawler, delay_range=(0, 0), max_retries=1, timeout=5),
+        {'title': 'title'}, writer
+    )
+
+    assert stats['successful'] == len(urls)
+    assert Counter(result['url'] for result in writer.results) == Counter(urls)
+    expected = Counter(shard_of(url, 2) for url in urls)
+    assert {summary['worker']: summary['stats']['processed'] for summary in summaries} == {
+        worker: expected.get(worker, 0) for worker in range(2)
+    }
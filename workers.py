@@ -0,0 +1,164 @@
+"""
+Multi-process crawling for the CLI.
+
+Each worker process runs its own StealthCrawler (own sessions, host
+scheduler and caches) over one shard of the URL source and sends its
+results back to the parent, which is the single writer of the output
+and the checkpoint. Parsing then runs on as many cores as there are
+workers instead of contending for one GIL.
+
+URLs are sharded by host by default, so each host's politeness delay
+and ``dedup`` are enforced by exactly one process; ``url`` sharding
+spreads single-host crawls too, with delays enforced per process.
+"""
+
+import asyncio
+import multiprocessing
+import queue
+import signal
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from checkpoint import Checkpoint
+from pipeline import count_result, is_output, iter_urls, new_stats, run_pipeline
+
+SHARD_MODES = ('host', 'url')
+
+
+def shard_of(url: str, workers: int, shard_by: str = 'host') -> int:
+    """Stable worker number for ``url`` (the same in every process and run)"""
+    key = (urlparse(url).hostname or '') if shard_by == 'host' else url
+    return zlib.crc32(key.encode('utf-8')) % workers
+
+
+class _NoOutput:
+    """Workers don't write; results travel to the parent instead"""
+
+    def write(self, result: Dict):
+        pass
+
+    def flush(self):
+        pass
+
+    def tell(self) -> Optional[int]:
+        return None
+
+
+def _worker_main(worker_id: int, workers: int, shard_by: str, source: str,
+                 crawler_factory: Callable, selectors: Dict, concurrency: int,
+                 dedup: bool, stop_early: bool, skip: Tuple[int, List[int]], results):
+    # Ctrl-C reaches the whole process group; the parent shuts workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    next_index, done = skip[0], set(skip[1])
+    urls = (
+        (index, url) for index, url in iter_urls(source)
+        if index >= next_index and index not in done
+        and shard_of(url, workers, shard_by) == worker_id
+    )
+    crawler = crawler_factory()
+
+    async def crawl() -> Dict[str, int]:
+        try:
+            return await run_pipeline(
+                crawler, urls, selectors, _NoOutput(),
+                concurrency=concurrency,
+                dedup=dedup,
+                stop_early=stop_early,
+                on_result=lambda index, result: results.put((worker_id, index, result))
+            )
+        finally:
+            await crawler.aclose()
+
+    summary = {'worker': worker_id}
+    try:
+        summary['stats'] = asyncio.run(crawl())
+        if crawler.cache is not None:
+            summary['cache'] = crawler.cache.stats()
+    except Exception as e:
+        summary['error'] = str(e)
+    finally:
+        crawler.close()
+        results.put((worker_id, None, summary))
+
+
+def run_sharded(source: str,
+                workers: int,
+                crawler_factory: Callable,
+                selectors: Dict,
+                writer,
+                checkpoint: Optional[Checkpoint] = None,
+                concurrency: int = 5,
+                dedup: bool = False,
+                stop_early: bool = False,
+                shard_by: str = 'host',
+                on_result: Optional[Callable[[int, Dict], None]] = None) -> Tuple[Dict[str, int], List[Dict]]:
+    """Crawl the URL file ``source`` with ``workers`` processes.
+
+    ``crawler_factory`` must be picklable (a module-level function or a
+    ``functools.partial`` of one); each worker calls it once. Returns
+    the merged stats and one summary per worker.
+    """
+    if shard_by not in SHARD_MODES:
+        raise ValueError(f"Unknown shard mode: {shard_by}")
+
+    context = multiprocessing.get_context('spawn')
+    # Bounded, so slow output applies backpressure to the workers
+    results = context.Queue(maxsize=workers * concurrency * 4)
+    skip = (checkpoint.next_index, checkpoint.state()['done']) if checkpoint else (0, [])
+
+    processes = [
+        context.Process(
+            target=_worker_main,
+            args=(worker_id, workers, shard_by, source, crawler_factory, selectors,
+                  concurrency, dedup, stop_early, skip, results),
+            name=f'crawl-worker-{worker_id}',
+            daemon=True
+        )
+        for worker_id in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    stats = new_stats()
+    summaries: Dict[int, Dict] = {}
+    try:
+        while len(summaries) < workers:
+            try:
+                worker_id, index, payload = results.get(timeout=0.5)
+            except queue.Empty:
+                # A worker that died without reporting would otherwise hang us
+                for worker_id, process in enumerate(processes):
+                    if worker_id not in summaries and process.exitcode is not None and results.empty():
+                        summaries[worker_id] = {
+                            'worker': worker_id,
+                            'error': f'exited with code {process.exitcode}'
+                        }
+                continue
+
+            if index is None:
+                summaries[worker_id] = payload
+                continue
+
+            if is_output(payload):
+                writer.write(payload)
+            count_result(stats, payload)
+            if checkpoint is not None:
+                checkpoint.mark_done(index)
+                if checkpoint.due():
+                    writer.flush()
+                    checkpoint.save(writer.tell())
+            if on_result is not None:
+                on_result(index, payload)
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join(timeout=5)
+        writer.flush()
+        if checkpoint is not None:
+            checkpoint.save(writer.tell())
+
+    return stats, [summaries[worker_id] for worker_id in sorted(summaries)]